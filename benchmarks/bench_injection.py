@@ -0,0 +1,86 @@
+"""
+Measures the per-call cost of injecting resources into a request handler.
+
+Compares a handler looking up its resources by hand with ``require_resource()``, one
+decorated with ``asphalt.core.inject`` and one decorated with
+``asphalt.web.injection.inject_resources``. The resources live in the root context and
+the handler is called in a request context, as in the web components.
+
+Run with::
+
+    python benchmarks/bench_injection.py [-n ITERATIONS] [-r RESOURCES]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from typing import Any
+
+from asphalt.core import Context, inject, require_resource, resource
+
+from asphalt.web.injection import inject_resources
+
+NAMES = ("default", "another", "third", "fourth", "fifth")
+
+
+async def hand_written(request: object) -> None:
+    require_resource(str)
+    require_resource(str, "another")
+    require_resource(str, "third")
+
+
+@inject
+async def core_inject(
+    request: object,
+    value: str = resource(),
+    another: str = resource("another"),
+    third: str = resource("third"),
+) -> None:
+    pass
+
+
+@inject_resources
+async def web_inject(
+    request: object,
+    value: str = resource(),
+    another: str = resource("another"),
+    third: str = resource("third"),
+) -> None:
+    pass
+
+
+async def bench(handler: Callable[[object], Awaitable[Any]], iterations: int) -> float:
+    request = object()
+    async with Context() as root_ctx:
+        for name in NAMES:
+            root_ctx.add_resource(f"value of {name}", name)
+
+        async with Context():
+            await handler(request)  # resolve any forward references before measuring
+            start = perf_counter()
+            for _ in range(iterations):
+                await handler(request)
+
+            return (perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    results = {
+        "hand-written lookups": asyncio.run(bench(hand_written, args.iterations)),
+        "asphalt.core.inject": asyncio.run(bench(core_inject, args.iterations)),
+        "inject_resources": asyncio.run(bench(web_inject, args.iterations)),
+    }
+    baseline = results["hand-written lookups"]
+    for label, cost in results.items():
+        print(f"{label + ':':<22}{cost * 1e6:>7.2f} µs/call ({cost / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Measures the overhead asphalt-web adds on top of each supported web framework.
+
+Each integration serves two endpoints: one returning a fixed string (``plain``) and one
+returning a value injected from an Asphalt resource (``inject``; the bare frameworks
+return a module level constant instead). Both are benchmarked with and without the
+Asphalt component, both by calling the application directly (``inprocess``) and through
+a server listening on the loopback interface (``loopback``). Memory allocations are only
+measured in-process, as the loopback client shares the process with the server.
+
+With aiohttp, the in-process requests are created with
+:func:`aiohttp.test_utils.make_mocked_request`, whose cost is included in the results,
+so only compare those against each other.
+
+Run with::
+
+    python benchmarks/bench_integrations.py [-n REQUESTS] [-c CONCURRENCY] \\
+        [-i INTEGRATION ...] [-t TRANSPORT ...] [--json FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import platform
+import sys
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any
+
+from asphalt.core import Context, inject, resource
+from harness import (
+    Requester,
+    Result,
+    asgi_requester,
+    free_port,
+    loopback_requester,
+    measure_allocations,
+    print_results,
+    run_requests,
+    write_json,
+)
+
+HOST = "127.0.0.1"
+VALUE = "Hello World"
+urlpatterns: list[Any] = []  # filled in by build_django()
+
+
+@dataclass
+class Target:
+    """
+    An application to benchmark.
+
+    :ivar app: an ASGI application or an aiohttp application
+    :ivar paths: request paths of the ``plain`` and ``inject`` endpoints
+    :ivar component: the Asphalt component serving the application, if any
+    """
+
+    app: Any
+    paths: dict[str, str]
+    component: Any = None
+
+    @property
+    def is_aiohttp(self) -> bool:
+        return type(self.app).__module__.startswith("aiohttp")
+
+
+def build_asgi3(asphalt_enabled: bool) -> Target:
+    from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+    from asphalt.core import require_resource
+
+    from asphalt.web._utils import send_response
+    from asphalt.web.asgi3 import ASGIComponent
+
+    async def application(
+        scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["path"] == "/inject":
+            value = require_resource(str) if asphalt_enabled else VALUE
+            await send_response(send, 200, value.encode())
+        else:
+            await send_response(send, 200, VALUE.encode())
+
+    paths = {"plain": "/plain", "inject": "/inject"}
+    if asphalt_enabled:
+        return Target(application, paths, ASGIComponent(app=application))
+
+    return Target(application, paths)
+
+
+def build_starlette(asphalt_enabled: bool) -> Target:
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    from asphalt.web.starlette import StarletteComponent
+
+    async def plain(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(VALUE)
+
+    @inject
+    async def injected(request: Request, value: str = resource()) -> PlainTextResponse:
+        return PlainTextResponse(value)
+
+    async def bare_injected(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(VALUE)
+
+    application = Starlette(
+        routes=[
+            Route("/plain", plain),
+            Route("/inject", injected if asphalt_enabled else bare_injected),
+        ]
+    )
+    paths = {"plain": "/plain", "inject": "/inject"}
+    if asphalt_enabled:
+        return Target(application, paths, StarletteComponent(app=application))
+
+    return Target(application, paths)
+
+
+def build_fastapi(asphalt_enabled: bool) -> Target:
+    from fastapi import Depends, FastAPI
+    from fastapi.responses import PlainTextResponse
+
+    from asphalt.web.fastapi import AsphaltDepends, FastAPIComponent
+
+    def get_value() -> str:
+        return VALUE
+
+    # FastAPI resolves the annotations, so only builtin types can be used here
+    async def plain():  # type: ignore[no-untyped-def]
+        return PlainTextResponse(VALUE)
+
+    async def injected(value: str = AsphaltDepends()):  # type: ignore[no-untyped-def]
+        return PlainTextResponse(value)
+
+    async def bare_injected(value: str = Depends(get_value)):  # type: ignore[no-untyped-def]
+        return PlainTextResponse(value)
+
+    application = FastAPI()
+    application.add_api_route("/plain", plain)
+    application.add_api_route("/inject", injected if asphalt_enabled else bare_injected)
+    paths = {"plain": "/plain", "inject": "/inject"}
+    if asphalt_enabled:
+        return Target(application, paths, FastAPIComponent(app=application))
+
+    return Target(application, paths)
+
+
+def build_litestar(asphalt_enabled: bool) -> Target:
+    from litestar import Litestar, get
+    from litestar.di import Provide
+
+    from asphalt.web.litestar import AsphaltProvide, LitestarComponent
+
+    async def get_value() -> str:
+        return VALUE
+
+    @get("/plain", sync_to_thread=False)
+    def plain() -> str:
+        return VALUE
+
+    provider = AsphaltProvide(str) if asphalt_enabled else Provide(get_value)
+
+    @get("/inject", dependencies={"value": provider}, sync_to_thread=False)
+    def injected(value: str) -> str:
+        return value
+
+    paths = {"plain": "/plain", "inject": "/inject"}
+    if asphalt_enabled:
+        component = LitestarComponent(route_handlers=[plain, injected], config={"debug": False})
+        return Target(component.app, paths, component)
+
+    return Target(Litestar([plain, injected], logging_config=None), paths)
+
+
+def build_aiohttp(asphalt_enabled: bool) -> Target:
+    from aiohttp.web_app import Application
+    from aiohttp.web_request import Request
+    from aiohttp.web_response import Response
+
+    from asphalt.web.aiohttp import AIOHTTPComponent
+
+    async def plain(request: Request) -> Response:
+        return Response(text=VALUE)
+
+    @inject
+    async def injected(request: Request, value: str = resource()) -> Response:
+        return Response(text=value)
+
+    async def bare_injected(request: Request) -> Response:
+        return Response(text=VALUE)
+
+    application = Application()
+    application.router.add_get("/plain", plain)
+    application.router.add_get("/inject", injected if asphalt_enabled else bare_injected)
+    paths = {"plain": "/plain", "inject": "/inject"}
+    if asphalt_enabled:
+        return Target(application, paths, AIOHTTPComponent(app=application))
+
+    return Target(application, paths)
+
+
+def build_django(asphalt_enabled: bool) -> Target:
+    import django
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIHandler
+    from django.http import HttpRequest, HttpResponse
+    from django.urls import path
+
+    from asphalt.web.django import DjangoComponent
+
+    if not settings.configured:
+
+        async def plain(request: HttpRequest) -> HttpResponse:
+            return HttpResponse(VALUE)
+
+        @inject
+        async def injected(request: HttpRequest, value: str = resource()) -> HttpResponse:
+            return HttpResponse(value)
+
+        async def bare_injected(request: HttpRequest) -> HttpResponse:
+            return HttpResponse(VALUE)
+
+        urlpatterns.extend(
+            [
+                path("plain", plain),
+                path("inject", injected),
+                path("bare/plain", plain),
+                path("bare/inject", bare_injected),
+            ]
+        )
+        settings.configure(
+            DEBUG=False,
+            SECRET_KEY="benchmark",
+            ALLOWED_HOSTS=["*"],
+            ROOT_URLCONF=__name__,
+            MIDDLEWARE=[],
+        )
+        django.setup()
+
+    # The middleware stack is loaded when the handler is created
+    settings.MIDDLEWARE = ["asphalt.web.django.AsphaltMiddleware"] if asphalt_enabled else []
+    application = ASGIHandler()
+    if asphalt_enabled:
+        paths = {"plain": "/plain", "inject": "/inject"}
+        return Target(application, paths, DjangoComponent(app=application))
+
+    return Target(application, {"plain": "/bare/plain", "inject": "/bare/inject"})
+
+
+BUILDERS: dict[str, Callable[[bool], Target]] = {
+    "asgi3": build_asgi3,
+    "starlette": build_starlette,
+    "fastapi": build_fastapi,
+    "litestar": build_litestar,
+    "aiohttp": build_aiohttp,
+    "django": build_django,
+}
+
+
+def inprocess_requester(target: Target, path: str) -> Requester:
+    if not target.is_aiohttp:
+        return asgi_requester(target.app, path)
+
+    from aiohttp.test_utils import make_mocked_request
+
+    async def request() -> int:
+        # Run the request through the application's middlewares and router
+        response = await target.app._handle(make_mocked_request("GET", path, app=target.app))
+        return response.status
+
+    return request
+
+
+@asynccontextmanager
+async def serve(target: Target, port: int | None) -> AsyncIterator[None]:
+    """
+    Start the target (and its server, if a port is given) within a context that has the
+    injected resource.
+
+    """
+    async with Context() as ctx:
+        ctx.add_resource(VALUE)
+        if target.component is not None:
+            # Always start the component, as some integrations finish their setup when
+            # the server is started
+            target.component.port = port or free_port()
+            await target.component.start(ctx)
+            target.app = target.component.app
+            yield
+        elif port is None:
+            yield
+        elif target.is_aiohttp:
+            from aiohttp.web_runner import AppRunner, TCPSite
+
+            runner = AppRunner(target.app)
+            await runner.setup()
+            await TCPSite(runner, host=HOST, port=port).start()
+            try:
+                yield
+            finally:
+                await runner.cleanup()
+        else:
+            import uvicorn
+
+            config = uvicorn.Config(
+                app=target.app,
+                host=HOST,
+                port=port,
+                use_colors=False,
+                log_config=None,
+                lifespan="off",
+            )
+            server = uvicorn.Server(config)
+            server_task = asyncio.create_task(server.serve())
+            while not server.started:  # noqa: ASYNC110
+                await asyncio.sleep(0.01)
+
+            try:
+                yield
+            finally:
+                server.should_exit = True
+                await server_task
+
+
+async def run_scenarios(args: argparse.Namespace) -> list[Result]:
+    results: list[Result] = []
+    for integration in args.integrations:
+        for mode in ("bare", "asphalt"):
+            for transport in args.transports:
+                try:
+                    target = BUILDERS[integration](mode == "asphalt")
+                except ImportError as exc:
+                    print(f"Skipping {integration}: {exc}", file=sys.stderr)
+                    break
+
+                port = free_port() if transport == "loopback" else None
+                async with serve(target, port):
+                    for endpoint, path in target.paths.items():
+                        name = {
+                            "integration": integration,
+                            "mode": mode,
+                            "endpoint": endpoint,
+                            "transport": transport,
+                        }
+                        if port is None:
+                            requester = inprocess_requester(target, path)
+                            concurrency = 1
+                        else:
+                            requester = loopback_requester(HOST, port, path, args.concurrency)
+                            concurrency = args.concurrency
+
+                        result = await run_requests(
+                            name, requester, args.requests, concurrency, args.requests // 10
+                        )
+                        if port is None:
+                            result.allocated = await measure_allocations(
+                                requester, min(args.requests, 500)
+                            )
+
+                        results.append(result)
+
+    return results
+
+
+def get_version() -> str | None:
+    try:
+        return version("asphalt-web")
+    except PackageNotFoundError:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=10, help="concurrency of loopback requests"
+    )
+    parser.add_argument(
+        "-i", "--integration", dest="integrations", action="append", choices=list(BUILDERS)
+    )
+    parser.add_argument(
+        "-t",
+        "--transport",
+        dest="transports",
+        action="append",
+        choices=["inprocess", "loopback"],
+    )
+    parser.add_argument("--json", metavar="FILE", help="also write the results to this file")
+    args = parser.parse_args()
+    args.integrations = args.integrations or list(BUILDERS)
+    args.transports = args.transports or ["inprocess", "loopback"]
+
+    results = asyncio.run(run_scenarios(args))
+    print_results(results)
+    if args.json:
+        write_json(
+            results,
+            args.json,
+            asphalt_web_version=get_version(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            requests=args.requests,
+            concurrency=args.concurrency,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures the per-request cost of recording request metrics.
+
+Run with::
+
+    python benchmarks/bench_metrics.py [-n ITERATIONS]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from asphalt.web.metrics import MetricsCollector, MetricsMiddleware
+
+SCOPE = {
+    "type": "http",
+    "method": "GET",
+    "path": "/items/1",
+    "path_template": "/items/{item_id}",
+    "headers": [(b"host", b"localhost"), (b"x-request-start", b"t=1700000000000")],
+}
+START_EVENT = {"type": "http.response.start", "status": 200, "headers": []}
+BODY_EVENT = {"type": "http.response.body", "body": b"Hello World"}
+
+
+async def app(scope, receive, send) -> None:
+    await send(START_EVENT)
+    await send(BODY_EVENT)
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(event: dict) -> None:
+    pass
+
+
+def bench_record(iterations: int) -> float:
+    collector = MetricsCollector()
+    record = collector.record
+    start = perf_counter()
+    for i in range(iterations):
+        record("/items/{item_id}", "GET", 200, (i % 1000) / 10000, 0.001)
+
+    return (perf_counter() - start) / iterations
+
+
+async def bench_app(application, iterations: int) -> float:
+    start = perf_counter()
+    for _ in range(iterations):
+        await application(SCOPE, receive, send)
+
+    return (perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    record_cost = bench_record(args.iterations)
+    bare_cost = asyncio.run(bench_app(app, args.iterations))
+    middleware_cost = asyncio.run(bench_app(MetricsMiddleware(app), args.iterations))
+    print(f"MetricsCollector.record():  {record_cost * 1e6:.2f} µs/request")
+    print(f"bare ASGI application:      {bare_cost * 1e6:.2f} µs/request")
+    print(f"with MetricsMiddleware:     {middleware_cost * 1e6:.2f} µs/request")
+    print(f"middleware overhead:        {(middleware_cost - bare_cost) * 1e6:.2f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
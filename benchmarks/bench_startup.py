@@ -0,0 +1,125 @@
+"""
+Measures how the startup time of the FastAPI and Litestar components scales with the
+number of routes.
+
+Each route has a path parameter and receives an Asphalt resource, as generated CRUD
+style applications do. Two things are measured for each route count:
+
+* ``routes``: creating the routes on the bare framework (the framework's own cost)
+* ``component``: creating and starting the component (without a server) on top of that
+
+Run with::
+
+    python benchmarks/bench_startup.py [-r ROUTES ...] [-i INTEGRATION ...] [--json FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+from collections.abc import Callable
+from time import perf_counter
+from typing import Any
+
+from asphalt.core import Context
+
+VALUE = "foo"
+
+
+def build_fastapi(routes: int) -> tuple[Callable[[], Any], float]:
+    from fastapi import FastAPI
+
+    from asphalt.web.fastapi import AsphaltDepends, FastAPIComponent
+
+    def make_endpoint() -> Callable[..., Any]:
+        async def endpoint(item_id: int, value: str = AsphaltDepends()) -> dict:
+            return {"item_id": item_id, "value": value}
+
+        return endpoint
+
+    start = perf_counter()
+    app = FastAPI()
+    for i in range(routes):
+        app.add_api_route(f"/resource{i}/{{item_id}}", make_endpoint())
+
+    return lambda: FastAPIComponent(app=app, listen=False), perf_counter() - start
+
+
+def build_litestar(routes: int) -> tuple[Callable[[], Any], float]:
+    from litestar import get
+
+    from asphalt.web.litestar import AsphaltProvide, LitestarComponent
+
+    def make_handler(i: int) -> Any:
+        @get(f"/resource{i}/{{item_id:int}}", dependencies={"value": AsphaltProvide(str)})
+        async def handler(item_id: int, value: str) -> dict:
+            return {"item_id": item_id, "value": value}
+
+        return handler
+
+    start = perf_counter()
+    handlers = [make_handler(i) for i in range(routes)]
+    elapsed = perf_counter() - start
+    return lambda: LitestarComponent(route_handlers=handlers, config={"debug": False}), elapsed
+
+
+BUILDERS: dict[str, Callable[[int], tuple[Callable[[], Any], float]]] = {
+    "fastapi": build_fastapi,
+    "litestar": build_litestar,
+}
+
+
+async def start_component(create_component: Callable[[], Any]) -> float:
+    start = perf_counter()
+    component = create_component()
+    async with Context() as ctx:
+        ctx.add_resource(VALUE)
+        await component.start(ctx)
+        return perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-r", "--routes", type=int, action="append", help="route counts (default: 100 1000 4000)"
+    )
+    parser.add_argument(
+        "-i", "--integration", dest="integrations", action="append", choices=list(BUILDERS)
+    )
+    parser.add_argument("--json", metavar="FILE", help="also write the results to this file")
+    args = parser.parse_args()
+    route_counts = args.routes or [100, 1000, 4000]
+
+    results: list[dict[str, Any]] = []
+    print(f"{'integration':<12}{'routes':>8}{'routes s':>12}{'component s':>14}{'ms/route':>10}")
+    for integration in args.integrations or list(BUILDERS):
+        for routes in route_counts:
+            try:
+                create_component, routes_time = BUILDERS[integration](routes)
+            except ImportError as exc:
+                print(f"{integration:<12}skipped ({exc})")
+                break
+
+            component_time = asyncio.run(start_component(create_component))
+            results.append(
+                {
+                    "integration": integration,
+                    "routes": routes,
+                    "routes_time": routes_time,
+                    "component_time": component_time,
+                }
+            )
+            print(
+                f"{integration:<12}{routes:>8}{routes_time:>12.3f}{component_time:>14.3f}"
+                f"{component_time / routes * 1000:>10.3f}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
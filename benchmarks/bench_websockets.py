@@ -0,0 +1,427 @@
+"""
+Measures the cost of websocket connections in each integration that supports them.
+
+Each integration serves an echo endpoint at ``/ws``, both with and without the Asphalt
+component (Django's ASGI handler doesn't support websockets). Three things are measured:
+
+* ``rtt``: the round-trip latency of a message on a single connection
+* ``throughput``: messages per second on a single connection, with up to ``--window``
+  messages in flight
+* ``idle``: the memory allocated per connection while ``--idle`` connections are held
+  open at once (shown in the "alloc KiB/req" column)
+
+For the ASGI based integrations, the connections are made by calling the application
+directly (``inprocess``), so the results only include the cost of the framework and the
+Asphalt middleware. AIOHTTP can only be measured through a server on the loopback
+interface (``loopback``), and as the client shares the process with the server, its
+idle connection memory includes the client side too, so only compare those against each
+other.
+
+Run with::
+
+    python benchmarks/bench_websockets.py [-n MESSAGES] [-w WINDOW] [--idle CONNECTIONS] \\
+        [-i INTEGRATION ...] [--json FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import platform
+import resource
+import sys
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from typing import Any, Protocol
+
+from bench_integrations import HOST, Target, get_version, serve
+from harness import Result, free_port, print_results, write_json
+
+PATH = "/ws"
+
+
+class Connection(Protocol):
+    async def send(self, text: str) -> None: ...
+
+    async def receive(self) -> str: ...
+
+    async def close(self) -> None: ...
+
+
+class ASGIWebSocket:
+    """An in-memory websocket connection that calls an ASGI application directly."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self._incoming: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self._outgoing: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self._task: asyncio.Task[None] | None = None
+
+    async def connect(self) -> ASGIWebSocket:
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "scheme": "ws",
+            "path": PATH,
+            "raw_path": PATH.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"127.0.0.1")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 8000),
+            "subprotocols": [],
+            "state": {},
+        }
+        self._task = asyncio.create_task(self.app(scope, self._incoming.get, self._outgoing.put))
+        self._incoming.put_nowait({"type": "websocket.connect"})
+        event = await self._outgoing.get()
+        if event["type"] != "websocket.accept":
+            raise RuntimeError(f"the connection was not accepted: {event}")
+
+        return self
+
+    async def send(self, text: str) -> None:
+        self._incoming.put_nowait({"type": "websocket.receive", "text": text})
+
+    async def receive(self) -> str:
+        event = await self._outgoing.get()
+        return event["text"]
+
+    async def close(self) -> None:
+        self._incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        if self._task is not None:
+            await self._task
+
+
+def build_asgi3(asphalt_enabled: bool) -> Target:
+    from asphalt.web.asgi3 import ASGIComponent
+
+    async def application(scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] == "websocket":
+            await receive()
+            await send({"type": "websocket.accept"})
+            while True:
+                event = await receive()
+                if event["type"] == "websocket.disconnect":
+                    return
+
+                await send({"type": "websocket.send", "text": event["text"]})
+
+    paths = {"echo": PATH}
+    if asphalt_enabled:
+        return Target(application, paths, ASGIComponent(app=application))
+
+    return Target(application, paths)
+
+
+def build_starlette(asphalt_enabled: bool) -> Target:
+    from starlette.applications import Starlette
+    from starlette.routing import WebSocketRoute
+    from starlette.websockets import WebSocket
+
+    from asphalt.web.starlette import StarletteComponent
+
+    async def echo(websocket: WebSocket) -> None:
+        await websocket.accept()
+        async for message in websocket.iter_text():
+            await websocket.send_text(message)
+
+    application = Starlette(routes=[WebSocketRoute(PATH, echo)])
+    paths = {"echo": PATH}
+    if asphalt_enabled:
+        return Target(application, paths, StarletteComponent(app=application))
+
+    return Target(application, paths)
+
+
+def build_fastapi(asphalt_enabled: bool) -> Target:
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+    from asphalt.web.fastapi import FastAPIComponent
+
+    async def echo(websocket: WebSocket):  # type: ignore[no-untyped-def]
+        await websocket.accept()
+        try:
+            while True:
+                await websocket.send_text(await websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+
+    # FastAPI can't resolve the postponed annotation of a locally imported class
+    echo.__annotations__["websocket"] = WebSocket
+    application = FastAPI()
+    application.add_api_websocket_route(PATH, echo)
+    paths = {"echo": PATH}
+    if asphalt_enabled:
+        return Target(application, paths, FastAPIComponent(app=application))
+
+    return Target(application, paths)
+
+
+def build_litestar(asphalt_enabled: bool) -> Target:
+    from litestar import Litestar, WebSocket, websocket
+    from litestar.exceptions import WebSocketDisconnect
+
+    from asphalt.web.litestar import LitestarComponent
+
+    @websocket(PATH)
+    async def echo(socket: WebSocket) -> None:
+        await socket.accept()
+        try:
+            while True:
+                await socket.send_text(await socket.receive_text())
+        except WebSocketDisconnect:
+            pass
+
+    paths = {"echo": PATH}
+    if asphalt_enabled:
+        component = LitestarComponent(route_handlers=[echo], config={"debug": False})
+        return Target(component.app, paths, component)
+
+    return Target(Litestar([echo], logging_config=None), paths)
+
+
+def build_aiohttp(asphalt_enabled: bool) -> Target:
+    from aiohttp import WSMsgType
+    from aiohttp.web_app import Application
+    from aiohttp.web_request import Request
+    from aiohttp.web_ws import WebSocketResponse
+
+    from asphalt.web.aiohttp import AIOHTTPComponent
+
+    async def echo(request: Request) -> WebSocketResponse:
+        ws = WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type == WSMsgType.TEXT:
+                await ws.send_str(message.data)
+
+        return ws
+
+    application = Application()
+    application.router.add_get(PATH, echo)
+    paths = {"echo": PATH}
+    if asphalt_enabled:
+        return Target(application, paths, AIOHTTPComponent(app=application))
+
+    return Target(application, paths)
+
+
+BUILDERS: dict[str, Callable[[bool], Target]] = {
+    "asgi3": build_asgi3,
+    "starlette": build_starlette,
+    "fastapi": build_fastapi,
+    "litestar": build_litestar,
+    "aiohttp": build_aiohttp,
+}
+
+
+class AIOHTTPWebSocket:
+    """A websocket connection made with the AIOHTTP client."""
+
+    def __init__(self, session: Any, url: str) -> None:
+        self.session = session
+        self.url = url
+        self._ws: Any = None
+
+    async def connect(self) -> AIOHTTPWebSocket:
+        self._ws = await self.session.ws_connect(self.url, autoping=False)
+        return self
+
+    async def send(self, text: str) -> None:
+        await self._ws.send_str(text)
+
+    async def receive(self) -> str:
+        return await self._ws.receive_str()
+
+    async def close(self) -> None:
+        await self._ws.close()
+
+
+async def measure_rtt(connection: Connection, messages: int) -> tuple[list[float], float]:
+    latencies: list[float] = []
+    start = perf_counter()
+    for i in range(messages):
+        sent = perf_counter()
+        await connection.send(str(i))
+        await connection.receive()
+        latencies.append(perf_counter() - sent)
+
+    elapsed = perf_counter() - start
+    latencies.sort()
+    return latencies, elapsed
+
+
+async def measure_throughput(
+    connection: Connection, messages: int, window: int
+) -> tuple[list[float], float]:
+    # The echoes arrive in order, so the send times can be matched to them in order
+    send_times: list[float] = []
+    latencies: list[float] = []
+    in_flight = asyncio.Semaphore(window)
+
+    async def sender() -> None:
+        for i in range(messages):
+            await in_flight.acquire()
+            send_times.append(perf_counter())
+            await connection.send(str(i))
+
+    async def receiver() -> None:
+        for i in range(messages):
+            await connection.receive()
+            latencies.append(perf_counter() - send_times[i])
+            in_flight.release()
+
+    start = perf_counter()
+    await asyncio.gather(sender(), receiver())
+    elapsed = perf_counter() - start
+    latencies.sort()
+    return latencies, elapsed
+
+
+async def measure_idle(connect: Callable[[], Awaitable[Connection]], count: int) -> float:
+    """Return the average memory allocated per open connection (in bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        connections = [await connect() for _ in range(count)]
+        await asyncio.sleep(0.1)  # let the handlers settle into waiting for messages
+        gc.collect()
+        allocated = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    await asyncio.gather(*(connection.close() for connection in connections))
+    return allocated / count
+
+
+def raise_file_limit(needed: int) -> int:
+    """Raise the open file limit as far as needed and allowed, and return the limit."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        soft = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    return soft
+
+
+async def run_integration(
+    integration: str, mode: str, target: Target, args: argparse.Namespace
+) -> list[Result]:
+    results: list[Result] = []
+    name = {"integration": integration, "mode": mode}
+    if target.is_aiohttp:
+        from aiohttp import ClientSession, TCPConnector
+
+        port = free_port()
+        url = f"http://{HOST}:{port}{PATH}"
+        idle = args.idle
+        limit = raise_file_limit(idle * 2 + 100)
+        if limit != resource.RLIM_INFINITY and idle * 2 + 100 > limit:
+            idle = (limit - 100) // 2
+            print(
+                f"Only measuring {idle} idle AIOHTTP connections due to the open file limit",
+                file=sys.stderr,
+            )
+
+        async with serve(target, port), ClientSession(connector=TCPConnector(limit=0)) as session:
+
+            def connect() -> Awaitable[Connection]:
+                return AIOHTTPWebSocket(session, url).connect()
+
+            results.extend(await run_measurements(name, "loopback", connect, idle, args))
+    else:
+        async with serve(target, None):
+            app = target.app
+
+            def connect() -> Awaitable[Connection]:
+                return ASGIWebSocket(app).connect()
+
+            results.extend(await run_measurements(name, "inprocess", connect, args.idle, args))
+
+    return results
+
+
+async def run_measurements(
+    name: dict[str, str],
+    transport: str,
+    connect: Callable[[], Awaitable[Connection]],
+    idle: int,
+    args: argparse.Namespace,
+) -> list[Result]:
+    results: list[Result] = []
+    connection = await connect()
+    try:
+        await measure_rtt(connection, args.messages // 10)  # warm up
+        latencies, elapsed = await measure_rtt(connection, args.messages)
+        results.append(
+            Result({**name, "measure": "rtt", "transport": transport}, latencies, elapsed)
+        )
+        latencies, elapsed = await measure_throughput(connection, args.messages, args.window)
+        results.append(
+            Result({**name, "measure": "throughput", "transport": transport}, latencies, elapsed)
+        )
+    finally:
+        await connection.close()
+
+    if idle:
+        allocated = await measure_idle(connect, idle)
+        results.append(
+            Result({**name, "measure": "idle", "transport": transport}, [], 0, allocated=allocated)
+        )
+
+    return results
+
+
+async def run_scenarios(args: argparse.Namespace) -> list[Result]:
+    results: list[Result] = []
+    for integration in args.integrations:
+        for mode in ("bare", "asphalt"):
+            try:
+                target = BUILDERS[integration](mode == "asphalt")
+            except ImportError as exc:
+                print(f"Skipping {integration}: {exc}", file=sys.stderr)
+                break
+
+            results.extend(await run_integration(integration, mode, target, args))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--messages", type=int, default=5000)
+    parser.add_argument(
+        "-w", "--window", type=int, default=32, help="messages in flight (throughput)"
+    )
+    parser.add_argument(
+        "--idle", type=int, default=10000, help="number of idle connections to hold open"
+    )
+    parser.add_argument(
+        "-i", "--integration", dest="integrations", action="append", choices=list(BUILDERS)
+    )
+    parser.add_argument("--json", metavar="FILE", help="also write the results to this file")
+    args = parser.parse_args()
+    args.integrations = args.integrations or list(BUILDERS)
+
+    results = asyncio.run(run_scenarios(args))
+    print_results(results)
+    if args.json:
+        write_json(
+            results,
+            args.json,
+            asphalt_web_version=get_version(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            messages=args.messages,
+            window=args.window,
+            idle=args.idle,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import gc
+import json
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import Any
+
+import pytest
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+CALIBRATION_ITERATIONS = 50000
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("performance regression tests")
+    group.addoption(
+        "--update-baselines",
+        action="store_true",
+        help=f"store the measurements in {BASELINES_PATH.name} instead of comparing them",
+    )
+    group.addoption(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="fraction by which a measurement may exceed its baseline (default: 0.5)",
+    )
+    group.addoption(
+        "--attempts",
+        type=int,
+        default=3,
+        help="number of times to measure before reporting a regression (default: 3)",
+    )
+
+
+def _calibration_workload(iterations: int) -> None:
+    # Interpreter bound work resembling request handling: calls, dicts and strings
+    counts: dict[str, int] = {}
+    for i in range(iterations):
+        key = f"header-{i % 64}"
+        counts[key] = counts.get(key, 0) + len(key.upper())
+
+
+def calibrate() -> float:
+    """
+    Return the time (in seconds) this machine takes for one iteration of the
+    calibration loop.
+
+    All measurements are divided by this, so the baselines are in "calibration
+    iterations" and stay comparable between machines of different speeds.
+
+    """
+    _calibration_workload(CALIBRATION_ITERATIONS)
+    best = float("inf")
+    for _ in range(7):
+        start = perf_counter()
+        _calibration_workload(CALIBRATION_ITERATIONS)
+        best = min(best, perf_counter() - start)
+
+    return best / CALIBRATION_ITERATIONS
+
+
+class Baselines:
+    """
+    Compares normalised measurements against the stored baselines, or records them.
+
+    :param data: the stored baselines (category ⭢ name ⭢ value)
+    :param tolerance: fraction by which a measurement may exceed its baseline
+    :param attempts: number of times to measure before reporting a regression
+    :param update: ``True`` to record the measurements instead of comparing them
+    """
+
+    def __init__(
+        self, data: dict[str, dict[str, float]], tolerance: float, attempts: int, update: bool
+    ):
+        self.data = data
+        self.tolerance = tolerance
+        self.attempts = attempts
+        self.update = update
+
+    def measure(self, measure: Callable[[], float]) -> float:
+        """
+        Run a measurement and normalise it against a fresh calibration.
+
+        The speed of shared and frequency scaled machines drifts over time, so the
+        calibration loop is run right before each measurement. Garbage collection is
+        disabled during both, so collection pauses don't land on random measurements.
+
+        :param measure: a callable returning the measured time (in seconds)
+        :return: the measurement, in calibration iterations
+
+        """
+        gc.collect()
+        gc.disable()
+        try:
+            calibration = calibrate()
+            return measure() / calibration
+        finally:
+            gc.enable()
+
+    def check(self, category: str, name: str, measure: Callable[[], float]) -> None:
+        """
+        Check a measurement against its baseline.
+
+        A measurement above the limit is repeated (up to ``attempts`` times in total),
+        and only fails if none of the attempts stays within the limit, as one-off noise
+        is much more common than a regression on a shared machine. When updating, the
+        median of ``attempts`` measurements is stored as the baseline.
+
+        :param category: the kind of measurement (like ``startup_time``)
+        :param name: the name of the measured item (like ``fastapi``)
+        :param measure: a callable returning the measured time (in seconds)
+
+        """
+        if self.update:
+            values = [self.measure(measure) for _ in range(self.attempts)]
+            self.data.setdefault(category, {})[name] = round(median(values), 1)
+            return
+
+        baseline = self.data.get(category, {}).get(name)
+        if baseline is None:
+            pytest.skip(f"no baseline for {category}/{name}; run with --update-baselines")
+
+        # The slack keeps tiny baselines from failing on timer noise alone
+        limit = baseline * (1 + self.tolerance) + 1
+        values = []
+        for _ in range(self.attempts):
+            values.append(self.measure(measure))
+            if values[-1] <= limit:
+                return
+
+        pytest.fail(
+            f"{category}/{name} regressed: "
+            f"{', '.join(f'{value:.1f}' for value in values)} calibration iterations, "
+            f"baseline {baseline:.1f} (limit {limit:.1f})"
+        )
+
+
+@pytest.fixture(scope="session")
+def baselines(request: pytest.FixtureRequest) -> Iterator[Baselines]:
+    data: dict[str, Any] = {}
+    if BASELINES_PATH.exists():
+        data = json.loads(BASELINES_PATH.read_text())
+
+    update = request.config.getoption("--update-baselines")
+    yield Baselines(
+        data,
+        request.config.getoption("--tolerance"),
+        request.config.getoption("--attempts"),
+        update,
+    )
+    if update:
+        BASELINES_PATH.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,246 @@
+"""
+Shared helpers for the benchmarks: request drivers, a minimal HTTP client and result
+reporting.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+import tracemalloc
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any
+
+from asphalt.web.bench import HTTPConnection, percentile
+
+#: A callable that performs a single request and returns the response status
+Requester = Callable[[], Awaitable[int]]
+
+
+@dataclass
+class Result:
+    """
+    The measurements of a single benchmark scenario.
+
+    :ivar name: the scenario, as a mapping of dimension name to value
+    :ivar latencies: sorted request latencies (in seconds)
+    :ivar elapsed: total wall clock time spent on the measured requests (in seconds)
+    :ivar errors: number of requests that failed or got a non-2xx response
+    :ivar allocated: average peak of memory allocated during a request (in bytes), or
+        ``None`` if not measured
+    """
+
+    name: dict[str, str]
+    latencies: list[float]
+    elapsed: float
+    errors: int = 0
+    allocated: float | None = None
+
+    @property
+    def requests_per_second(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.latencies, 50)
+
+    @property
+    def p99(self) -> float:
+        return percentile(self.latencies, 99)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            **self.name,
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "requests_per_second": self.requests_per_second,
+            "p50": self.p50,
+            "p99": self.p99,
+            "allocated": self.allocated,
+        }
+
+
+async def run_requests(
+    name: dict[str, str],
+    requester: Requester,
+    requests: int,
+    concurrency: int = 1,
+    warmup: int = 0,
+) -> Result:
+    """
+    Run the given number of requests, spread over ``concurrency`` concurrent workers.
+
+    :param name: the name of the scenario
+    :param requester: the request function to call
+    :param requests: the number of requests to measure
+    :param concurrency: the number of requests in flight at any time
+    :param warmup: the number of unmeasured requests to run first
+
+    """
+    for _ in range(warmup):
+        await requester()
+
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = perf_counter()
+            try:
+                status = await requester()
+            except Exception:
+                status = 0
+
+            latencies.append(perf_counter() - start)
+            if not 200 <= status < 300:
+                errors += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+    latencies.sort()
+    return Result(name, latencies, elapsed, errors)
+
+
+async def measure_allocations(requester: Requester, requests: int) -> float:
+    """
+    Measure the average peak of memory allocated while handling a single request.
+
+    This uses :mod:`tracemalloc`, so it must not be run together with the timed
+    requests.
+
+    :return: the average number of bytes
+
+    """
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(requests):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await requester()
+            total += tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return total / requests
+
+
+def asgi_requester(app: Any, path: str, method: str = "GET") -> Requester:
+    """
+    Create a request function that calls an ASGI application directly, without any
+    server or network in between.
+
+    """
+    request_event = {"type": "http.request", "body": b"", "more_body": False}
+
+    async def request() -> int:
+        status = 0
+        received = False
+        disconnected = asyncio.Event()
+
+        async def receive() -> dict[str, Any]:
+            nonlocal received
+            if not received:
+                received = True
+                return request_event
+
+            # Like a real server, only report the disconnection after the response
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(event: dict[str, Any]) -> None:
+            nonlocal status
+            if event["type"] == "http.response.start":
+                status = event["status"]
+            elif event["type"] == "http.response.body" and not event.get("more_body"):
+                disconnected.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"127.0.0.1"), (b"user-agent", b"benchmark")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 8000),
+            "state": {},
+        }
+        await app(scope, receive, send)
+        return status
+
+    return request
+
+
+def loopback_requester(host: str, port: int, path: str, concurrency: int) -> Requester:
+    """
+    Create a request function that sends requests over a pool of keep-alive connections.
+
+    """
+    pool = [HTTPConnection(host, port) for _ in range(concurrency)]
+
+    async def request() -> int:
+        connection = pool.pop()
+        try:
+            return await connection.request(path)
+        finally:
+            pool.append(connection)
+
+    return request
+
+
+def free_port() -> int:
+    """Return a currently unused TCP port on the loopback interface."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def print_results(results: Sequence[Result]) -> None:
+    """Print the results as a table."""
+    if not results:
+        return
+
+    name_columns = list(results[0].name)
+    header = [*name_columns, "req/s", "p50 µs", "p99 µs", "errors", "alloc KiB/req"]
+    rows = [
+        [
+            *result.name.values(),
+            *(
+                [
+                    f"{result.requests_per_second:.0f}",
+                    f"{result.p50 * 1e6:.1f}",
+                    f"{result.p99 * 1e6:.1f}",
+                    str(result.errors),
+                ]
+                if result.latencies
+                else ["-"] * 4
+            ),
+            f"{result.allocated / 1024:.1f}" if result.allocated is not None else "-",
+        ]
+        for result in results
+    ]
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    for row in [header, *rows]:
+        cells = [
+            cell.ljust(width) if i < len(name_columns) else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        ]
+        print("  ".join(cells))
+
+
+def write_json(results: Sequence[Result], path: str, **metadata: Any) -> None:
+    """Write the results, along with the given metadata, to a JSON file."""
+    with open(path, "w") as f:
+        json.dump({**metadata, "results": [result.as_dict() for result in results]}, f, indent=2)
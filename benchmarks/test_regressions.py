@@ -0,0 +1,113 @@
+"""
+Performance regression tests for the integration components.
+
+These compare the per-request overhead, the startup time and the import time of each
+integration against the baselines in ``baselines.json``, normalised by a calibration
+loop (see ``conftest.py``). They are not part of the regular test suite; run them with::
+
+    python -m pytest benchmarks [--tolerance 0.5] [--update-baselines]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+from statistics import median
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+import pytest
+from asphalt.core import Context
+from bench_integrations import BUILDERS, VALUE, Target, inprocess_requester, serve
+from harness import run_requests
+
+if TYPE_CHECKING:
+    from conftest import Baselines
+
+REQUESTS = 500
+ROUNDS = 7
+STARTUPS = 10
+IMPORTS = 5
+
+
+def build(integration: str, asphalt_enabled: bool) -> Target:
+    try:
+        return BUILDERS[integration](asphalt_enabled)
+    except ImportError as exc:
+        pytest.skip(str(exc))
+
+
+@pytest.mark.parametrize("integration", list(BUILDERS))
+def test_request_overhead(integration: str, baselines: Baselines) -> None:
+    """
+    Measure how much longer the resource injecting endpoint takes with the Asphalt
+    component than the equivalent endpoint on the bare framework.
+
+    """
+
+    async def run() -> float:
+        bare_target = build(integration, False)
+        asphalt_target = build(integration, True)
+        differences: list[float] = []
+        async with serve(bare_target, None), serve(asphalt_target, None):
+            bare = inprocess_requester(bare_target, bare_target.paths["inject"])
+            asphalt = inprocess_requester(asphalt_target, asphalt_target.paths["inject"])
+            # Compare within each round, so that any drift affects both sides equally
+            for _ in range(ROUNDS):
+                bare_result, asphalt_result = [
+                    await run_requests({}, requester, REQUESTS, warmup=REQUESTS // 10)
+                    for requester in (bare, asphalt)
+                ]
+                assert bare_result.errors == asphalt_result.errors == 0
+                differences.append(asphalt_result.p50 - bare_result.p50)
+
+        return max(median(differences), 0)
+
+    baselines.check("request_overhead", integration, lambda: asyncio.run(run()))
+
+
+@pytest.mark.parametrize("integration", list(BUILDERS))
+def test_startup_time(integration: str, baselines: Baselines) -> None:
+    """Measure the time to create and start the component (without a server)."""
+
+    async def start_once() -> float:
+        start = perf_counter()
+        target = build(integration, True)
+        target.component.listen = False
+        async with Context() as ctx:
+            ctx.add_resource(VALUE)
+            await target.component.start(ctx)
+            elapsed = perf_counter() - start
+
+        return elapsed
+
+    def measure() -> float:
+        return min(asyncio.run(start_once()) for _ in range(STARTUPS))
+
+    asyncio.run(start_once())  # warm up imports and one-time framework setup
+    baselines.check("startup_time", integration, measure)
+
+
+@pytest.mark.parametrize("integration", list(BUILDERS))
+def test_import_time(integration: str, baselines: Baselines) -> None:
+    """
+    Measure the time to import the integration module in a fresh interpreter.
+
+    Asphalt itself is imported first, so only the integration module (and whatever it
+    imports) is timed.
+
+    """
+    build(integration, True)  # skip if the framework is not installed
+    code = (
+        "import asphalt.core; from time import perf_counter; start = perf_counter(); "
+        f"import asphalt.web.{integration}; print(perf_counter() - start)"
+    )
+
+    def import_once() -> float:
+        return float(subprocess.check_output([sys.executable, "-c", code]))
+
+    def measure() -> float:
+        return min(import_once() for _ in range(IMPORTS))
+
+    baselines.check("import_time", integration, measure)
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING, Any, Callable, Generic, Iterable, Iterator, Tuple, TypeVar, cast
+from weakref import WeakKeyDictionary
+
+from asphalt.core import Context
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGISendCallable,
+        HTTPResponseBodyEvent,
+        HTTPResponseStartEvent,
+        HTTPScope,
+        Scope,
+        WebSocketScope,
+    )
+
+T = TypeVar("T")
+
+
+def get_header(scope: HTTPScope | WebSocketScope, name: bytes) -> bytes | None:
+    """
+    Return the value of the first header matching the given name in an ASGI scope.
+
+    :param scope: an HTTP or websocket scope
+    :param name: the header name, in lower case
+    :return: the header value, or ``None`` if the header was not present
+
+    """
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+
+    return None
+
+
+def get_client_host(scope: HTTPScope | WebSocketScope) -> str | None:
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+async def send_response(
+    send: ASGISendCallable,
+    status: int,
+    body: bytes = b"",
+    content_type: bytes = b"text/plain; charset=utf-8",
+    headers: Iterable[tuple[bytes, bytes]] = (),
+) -> None:
+    """Send a complete, single-chunk HTTP response through an ASGI ``send`` callable."""
+    response_headers = [(b"content-type", content_type), (b"content-length", b"%d" % len(body))]
+    response_headers.extend(headers)
+    start_event = {"type": "http.response.start", "status": status, "headers": response_headers}
+    body_event = {"type": "http.response.body", "body": body, "more_body": False}
+    await send(cast("HTTPResponseStartEvent", start_event))
+    await send(cast("HTTPResponseBodyEvent", body_event))
+
+
+#: A Starlette route candidate: (route template, route, the mounts leading to the route)
+_RouteCandidate = Tuple[str, Any, Tuple[Any, ...]]
+
+#: Starlette routes by router and endpoint
+_route_candidates: WeakKeyDictionary[Any, dict[Any, list[_RouteCandidate]]] = WeakKeyDictionary()
+
+
+def _find_routes(
+    routes: Iterable[Any], endpoint: Any, prefix: str = "", mounts: tuple[Any, ...] = ()
+) -> Iterator[_RouteCandidate]:
+    for route in routes:
+        if getattr(route, "endpoint", None) is endpoint:
+            yield prefix + route.path, route, mounts
+
+        sub_routes = getattr(route, "routes", None)  # Mount
+        if sub_routes:
+            yield from _find_routes(sub_routes, endpoint, prefix + route.path, mounts + (route,))
+
+
+def _route_matches(candidate: _RouteCandidate, scope: dict[str, Any]) -> bool:
+    from starlette.routing import Match
+
+    _template, route, mounts = candidate
+    route_scope = {
+        "type": scope["type"],
+        "path": scope["path"],
+        "root_path": scope.get("app_root_path", ""),
+        "method": scope.get("method"),
+    }
+    for mount in mounts:
+        match, child_scope = mount.matches(route_scope)
+        if match is not Match.FULL:
+            return False
+
+        route_scope.update(child_scope)
+
+    return route.matches(route_scope)[0] is not Match.NONE
+
+
+def get_route_template(scope: Scope) -> str | None:
+    """
+    Return the template of the route that handled the request in the given scope.
+
+    This relies on the web framework (or the Asphalt middleware of the integration)
+    having stored the matched route in the scope, and must therefore be called after
+    the application has handled the request.
+
+    :param scope: an ASGI scope
+    :return: the route template (like ``/items/{item_id}``), or ``None`` if no route
+        matched or the route template could not be determined
+
+    """
+    scope_dict = cast("dict[str, Any]", scope)
+    route = scope_dict.get("route")  # FastAPI
+    if route is not None:
+        return getattr(route, "path", None)
+
+    template = scope_dict.get("path_template")  # Litestar, Django
+    if template is not None:
+        return template
+
+    endpoint = scope_dict.get("endpoint")  # Starlette
+    router = scope_dict.get("router")
+    if endpoint is None or router is None:
+        return None
+
+    try:
+        routes_by_endpoint = _route_candidates.setdefault(router, {})
+        candidates = routes_by_endpoint.get(endpoint)
+    except TypeError:  # the router is not weakly referenceable or the endpoint is not hashable
+        routes_by_endpoint = None
+        candidates = None
+
+    if not candidates:
+        candidates = list(_find_routes(getattr(router, "routes", ()), endpoint))
+        if candidates and routes_by_endpoint is not None:
+            routes_by_endpoint[endpoint] = candidates
+
+    # The same endpoint may be served on several routes, so unless the route is unique,
+    # match the request path against each candidate to find the one that was used
+    if len(candidates) == 1:
+        return candidates[0][0]
+
+    for candidate in candidates:
+        if _route_matches(candidate, scope_dict):
+            return candidate[0]
+
+    return None
+
+
+async def get_shared_resource(cls: type, name: str) -> Any:
+    """
+    Look up a resource that could be shared by all requests, without waiting for it.
+
+    The resource is looked up from two temporary child contexts of the current context.
+    Resource factories generate a separate value for each context, so their values are
+    not shared, and must instead be looked up separately for each request.
+
+    :param cls: the type of the resource
+    :param name: the name of the resource
+    :return: the resource, or ``None`` if it's provided by a resource factory
+    :raises ~asphalt.core.context.ResourceNotFound: if the resource is not available
+
+    """
+    async with Context() as ctx:
+        value: Any = ctx.require_resource(cls, name)
+
+    async with Context() as ctx:
+        return value if ctx.get_resource(cls, name) is value else None
+
+
+class BatchingThread(Generic[T]):
+    """
+    Hands items over to a background thread which processes them in batches.
+
+    Items are queued without blocking the caller. The thread processes the queued items
+    every ``interval`` seconds, or as soon as ``batch_size`` items have accumulated. If
+    the queue is full, new items are dropped and counted in :attr:`dropped`.
+
+    :param handler: a callable that processes a batch of items (must not raise
+        exceptions)
+    :param name: name of the thread
+    :param batch_size: maximum number of items to pass to the handler at once
+    :param max_queue: maximum number of items waiting to be processed
+    :param interval: maximum number of seconds between processing the queued items
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[list[T]], None],
+        *,
+        name: str,
+        batch_size: int,
+        max_queue: int,
+        interval: float,
+    ) -> None:
+        self.handler = handler
+        self.name = name
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.interval = interval
+        self.dropped = 0
+        self._queue: deque[T] = deque()
+        self._event = Event()
+        self._lock = Lock()
+        self._stopping = False
+        self._thread: Thread | None = None
+
+    def put(self, item: T) -> bool:
+        """
+        Queue an item for processing.
+
+        :return: ``True`` if the item was queued, ``False`` if it was dropped
+
+        """
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+
+        self._queue.append(item)
+        if len(self._queue) >= self.batch_size:
+            self._event.set()
+
+        return True
+
+    def flush(self) -> None:
+        """Process all the queued items in the calling thread."""
+        with self._lock:
+            while self._queue:
+                batch: list[T] = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+
+                self.handler(batch)
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._event.wait(self.interval)
+            self._event.clear()
+            self.flush()
+
+    def start(self) -> None:
+        """Start the background thread."""
+        self._stopping = False
+        self._thread = Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread, processing any remaining items."""
+        if self._thread is not None:
+            self._stopping = True
+            self._event.set()
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from random import random
+from time import perf_counter, time
+from typing import TYPE_CHECKING, NamedTuple
+
+from ._utils import BatchingThread, get_client_host, get_header, get_route_template
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGISendCallable,
+        ASGISendEvent,
+        Scope,
+    )
+
+logger = logging.getLogger(__name__)
+
+
+class AccessLogRecord(NamedTuple):
+    """
+    The details of a single HTTP request, as recorded for the access log.
+
+    :ivar float timestamp: the time the request was received (in seconds since the epoch)
+    :ivar client: the IP address of the client
+    :vartype client: str | None
+    :ivar str method: the HTTP method
+    :ivar str path: the request path
+    :ivar str query_string: the query string of the request (without the ``?``)
+    :ivar route: the template of the route that handled the request
+    :vartype route: str | None
+    :ivar int status: the response status code
+    :ivar int size: number of bytes in the response body
+    :ivar float duration: number of seconds it took to handle the request
+    :ivar user_agent: the value of the ``User-Agent`` request header
+    :vartype user_agent: str | None
+    """
+
+    timestamp: float
+    client: str | None
+    method: str
+    path: str
+    query_string: str
+    route: str | None
+    status: int
+    size: int
+    duration: float
+    user_agent: str | None
+
+
+def format_json(record: AccessLogRecord) -> str:
+    """Format an access log record as a JSON object."""
+    return json.dumps(record._asdict())
+
+
+def format_text(record: AccessLogRecord) -> str:
+    """Format an access log record as a line of text, resembling the common log format."""
+    target = f"{record.path}?{record.query_string}" if record.query_string else record.path
+    return (
+        f'{record.client or "-"} "{record.method} {target}" {record.status} {record.size} '
+        f"{record.duration:.6f}"
+    )
+
+
+formatters = {"json": format_json, "text": format_text}
+
+
+class AccessLogger:
+    """
+    Writes an access log without formatting or writing anything in the event loop
+    thread.
+
+    Records are queued as they are, and a separate thread formats and writes them in
+    batches, every ``flush_interval`` seconds or as soon as ``batch_size`` records have
+    been queued. If the queue is full, new records are dropped (and counted in
+    :attr:`dropped_records`) instead of blocking the event loop.
+
+    If no file is given, the formatted records are emitted as log messages through the
+    ``asphalt.web.accesslog`` logger.
+
+    :param file: path to a file to append the access log to
+    :param format: either ``json`` or ``text``
+    :param sample_rate: the fraction (0 to 1) of the requests to log
+    :param batch_size: maximum number of records to write at once
+    :param max_queue: maximum number of records waiting to be written
+    :param flush_interval: maximum number of seconds between writes
+    :raises ValueError: if the format or sample rate is invalid
+    """
+
+    def __init__(
+        self,
+        *,
+        file: str | Path | None = None,
+        format: str = "json",
+        sample_rate: float = 1.0,
+        batch_size: int = 512,
+        max_queue: int = 10000,
+        flush_interval: float = 1.0,
+    ) -> None:
+        try:
+            self.formatter = formatters[format]
+        except KeyError:
+            raise ValueError(
+                f"format must be one of {', '.join(formatters)}, not {format!r}"
+            ) from None
+
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+
+        self.file = file
+        self.sample_rate = sample_rate
+        self._batcher: BatchingThread[AccessLogRecord] = BatchingThread(
+            self._write_batch,
+            name="asphalt-web-accesslog",
+            batch_size=batch_size,
+            max_queue=max_queue,
+            interval=flush_interval,
+        )
+
+    @property
+    def dropped_records(self) -> int:
+        """The number of records dropped due to a full queue."""
+        return self._batcher.dropped
+
+    def sample(self) -> bool:
+        """Decide whether to log a new request."""
+        return self.sample_rate >= 1 or random() < self.sample_rate
+
+    def log(self, record: AccessLogRecord) -> None:
+        """
+        Queue a record for writing.
+
+        :param record: the record to write
+
+        """
+        self._batcher.put(record)
+
+    def _write_batch(self, records: list[AccessLogRecord]) -> None:
+        try:
+            lines = [self.formatter(record) for record in records]
+            if self.file is not None:
+                with open(self.file, "a", encoding="utf-8") as f:
+                    f.writelines(line + "\n" for line in lines)
+            else:
+                for line in lines:
+                    logger.info(line)
+        except Exception:
+            logger.exception("Error writing the access log")
+
+    def flush(self) -> None:
+        """Write all the queued records in the calling thread."""
+        self._batcher.flush()
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self._batcher.start()
+
+    def stop(self) -> None:
+        """Stop the writer thread, writing any remaining records."""
+        self._batcher.stop()
+
+
+@dataclass
+class AccessLogMiddleware:
+    """
+    ASGI middleware that logs HTTP requests with an :class:`AccessLogger`.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param access_logger: the access logger to use
+    """
+
+    app: ASGI3Application
+    access_logger: AccessLogger
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http" or not self.access_logger.sample():
+            await self.app(scope, receive, send)
+            return
+
+        timestamp = time()
+        start = perf_counter()
+        status = 500
+        size = 0
+
+        async def wrapped_send(event: ASGISendEvent) -> None:
+            nonlocal status, size
+            if event["type"] == "http.response.start":
+                status = event["status"]
+            elif event["type"] == "http.response.body":
+                size += len(event.get("body", b""))
+
+            await send(event)
+
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            user_agent = get_header(scope, b"user-agent")
+            self.access_logger.log(
+                AccessLogRecord(
+                    timestamp,
+                    get_client_host(scope),
+                    scope["method"],
+                    scope["path"],
+                    scope["query_string"].decode("latin-1"),
+                    get_route_template(scope),
+                    status,
+                    size,
+                    perf_counter() - start,
+                    user_agent.decode("latin-1") if user_agent is not None else None,
+                )
+            )
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import tracemalloc
+from collections.abc import Awaitable, Generator
+from dataclasses import dataclass
+from random import random
+from time import thread_time
+from types import coroutine
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from ._utils import get_route_template
+from .metrics import _escape_label
+
+if TYPE_CHECKING:
+    from asgiref.typing import ASGI3Application, ASGIReceiveCallable, ASGISendCallable, Scope
+
+T_Retval = TypeVar("T_Retval")
+
+
+class RequestUsage:
+    """
+    Resources used by a single request.
+
+    :ivar float cpu_time: CPU time (in seconds) used by the request in the event loop
+        thread
+    :ivar net_memory_growth: net growth of traced memory (in bytes) during the steps of
+        the request, or ``None`` if the memory use of the request was not sampled
+    :vartype net_memory_growth: int | None
+    """
+
+    __slots__ = "cpu_time", "net_memory_growth"
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.cpu_time = 0.0
+        self.net_memory_growth: int | None = 0 if trace_memory else None
+
+
+@dataclass
+class RouteUsage:
+    """
+    Aggregated resource usage of the requests to a single route.
+
+    :ivar requests: number of requests
+    :ivar cpu_time: total CPU time used by the requests (in seconds)
+    :ivar max_cpu_time: the most CPU time used by a single request (in seconds)
+    :ivar sampled_requests: number of requests whose memory use was sampled
+    :ivar net_memory_growth: total net memory growth of the sampled requests (in bytes)
+    """
+
+    requests: int = 0
+    cpu_time: float = 0.0
+    max_cpu_time: float = 0.0
+    sampled_requests: int = 0
+    net_memory_growth: int = 0
+
+    @property
+    def mean_cpu_time(self) -> float:
+        """The average CPU time used by a request (in seconds)."""
+        return self.cpu_time / self.requests if self.requests else 0.0
+
+    @property
+    def mean_net_memory_growth(self) -> float:
+        """The average net memory growth of a sampled request (in bytes)."""
+        return self.net_memory_growth / self.sampled_requests if self.sampled_requests else 0.0
+
+
+@coroutine
+def _metered(awaitable: Awaitable[T_Retval], usage: RequestUsage) -> Generator[Any, Any, T_Retval]:
+    # Drives the awaitable like a task would, measuring each step separately so that the
+    # time spent running other tasks in between is not attributed to this request
+    iterator: Any = awaitable.__await__()
+    value: Any = None
+    exc: BaseException | None = None
+    while True:
+        start = thread_time()
+        if usage.net_memory_growth is not None:
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        try:
+            yielded = iterator.send(value) if exc is None else iterator.throw(exc)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            usage.cpu_time += thread_time() - start
+            if usage.net_memory_growth is not None:
+                usage.net_memory_growth += max(
+                    tracemalloc.get_traced_memory()[0] - memory_before, 0
+                )
+
+        try:
+            value, exc = (yield yielded), None
+        except BaseException as caught:
+            value, exc = None, caught
+
+
+class UsageTracker:
+    """
+    Attributes CPU time and memory use to requests, and aggregates them per route.
+
+    The CPU time is measured with :func:`~time.thread_time` around each step of the
+    request handling coroutine, so time spent waiting on I/O (or running other requests)
+    is excluded. Work done in other threads (like synchronous endpoints run in a thread
+    pool) or in tasks spawned by the handler is not included.
+
+    Memory use is measured with :mod:`tracemalloc` as the net growth of traced memory
+    during each step (steps that free more than they allocate count as zero). This is
+    not the number of bytes allocated: memory allocated and freed within the same step
+    is not counted, and as :mod:`tracemalloc` traces the whole process, memory allocated
+    by other threads during the step is. Only a ``memory_sample_rate`` fraction of the
+    requests are measured, and unless :mod:`tracemalloc` was already tracing, tracing is
+    only enabled while sampled requests are being handled. Note that while it is
+    enabled, every allocation in the process pays the cost of tracing, not just the
+    ones made by the sampled requests.
+
+    :param memory_sample_rate: the fraction (0 to 1) of requests to measure the memory
+        use of
+    :param unmatched_route: the route label for requests without a route template (use
+        ``None`` to use the request path instead, but only if the application has a
+        bounded set of paths)
+
+    :ivar dict[tuple[str, str], RouteUsage] routes: resource usage statistics, keyed by
+        (route template, method)
+    """
+
+    def __init__(
+        self,
+        *,
+        memory_sample_rate: float = 0.0,
+        unmatched_route: str | None = "<unmatched>",
+    ) -> None:
+        if not 0 <= memory_sample_rate <= 1:
+            raise ValueError("memory_sample_rate must be between 0 and 1")
+
+        self.memory_sample_rate = memory_sample_rate
+        self.unmatched_route = unmatched_route
+        self.routes: dict[tuple[str, str], RouteUsage] = {}
+        self._tracing_requests = 0
+        self._started_tracing = False
+
+    async def measure(self, awaitable: Awaitable[T_Retval], usage: RequestUsage) -> T_Retval:
+        """
+        Await an awaitable, adding the resources it uses to the given usage object.
+
+        :param awaitable: the awaitable (usually a coroutine) to await
+        :param usage: the usage object to update
+        :return: the return value of the awaitable
+
+        """
+        if usage.net_memory_growth is None:
+            return await _metered(awaitable, usage)
+
+        if self._tracing_requests == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        self._tracing_requests += 1
+        try:
+            return await _metered(awaitable, usage)
+        finally:
+            self._tracing_requests -= 1
+            if self._tracing_requests == 0 and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def new_usage(self) -> RequestUsage:
+        """Create a usage object for a new request, deciding whether to sample it."""
+        return RequestUsage(self.memory_sample_rate > 0 and random() < self.memory_sample_rate)
+
+    def record(self, route: str, method: str, usage: RequestUsage) -> None:
+        """
+        Record the resource usage of a finished request.
+
+        :param route: the route template
+        :param method: the HTTP method
+        :param usage: the resources used by the request
+
+        """
+        key = (route, method)
+        route_usage = self.routes.get(key)
+        if route_usage is None:
+            route_usage = self.routes[key] = RouteUsage()
+
+        route_usage.requests += 1
+        route_usage.cpu_time += usage.cpu_time
+        if usage.cpu_time > route_usage.max_cpu_time:
+            route_usage.max_cpu_time = usage.cpu_time
+
+        if usage.net_memory_growth is not None:
+            route_usage.sampled_requests += 1
+            route_usage.net_memory_growth += usage.net_memory_growth
+
+    def render_prometheus(self, lines: list[str]) -> None:
+        """
+        Render the aggregated usage in the Prometheus text exposition format.
+
+        :param lines: the list to append the rendered lines to
+
+        """
+        labels_by_key = {
+            key: f'route="{_escape_label(key[0])}",method="{_escape_label(key[1])}"'
+            for key in self.routes
+        }
+        lines += [
+            "# HELP http_request_cpu_seconds_total CPU time used handling HTTP requests.",
+            "# TYPE http_request_cpu_seconds_total counter",
+        ]
+        for key, route_usage in self.routes.items():
+            lines.append(
+                f"http_request_cpu_seconds_total{{{labels_by_key[key]}}} {route_usage.cpu_time}"
+            )
+
+        lines += [
+            (
+                "# HELP http_request_net_memory_growth_bytes_total Net memory growth of sampled "
+                "HTTP requests."
+            ),
+            "# TYPE http_request_net_memory_growth_bytes_total counter",
+        ]
+        for key, route_usage in self.routes.items():
+            lines.append(
+                f"http_request_net_memory_growth_bytes_total{{{labels_by_key[key]}}} "
+                f"{route_usage.net_memory_growth}"
+            )
+
+
+@dataclass
+class AccountingMiddleware:
+    """
+    ASGI middleware that records the resource usage of HTTP requests into a
+    :class:`UsageTracker`.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param tracker: the usage tracker to use
+    """
+
+    app: ASGI3Application
+    tracker: UsageTracker
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        usage = self.tracker.new_usage()
+        try:
+            await self.tracker.measure(self.app(scope, receive, send), usage)
+        finally:
+            route = get_route_template(scope) or self.tracker.unmatched_route or scope["path"]
+            self.tracker.record(route, scope["method"], usage)
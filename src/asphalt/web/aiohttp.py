@@ -1,21 +1,42 @@
 from __future__ import annotations
 
+from asyncio import TimeoutError, create_task, get_running_loop, wait_for
 from collections.abc import AsyncGenerator, Awaitable, Callable, Coroutine, Sequence
+from functools import partial
 from inspect import iscoroutinefunction
-from typing import Any
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Any
 
 from aiohttp.web_app import Application
+from aiohttp.web_exceptions import HTTPException, HTTPGatewayTimeout, HTTPServiceUnavailable
 from aiohttp.web_middlewares import middleware
 from aiohttp.web_request import Request
-from aiohttp.web_response import Response
+from aiohttp.web_response import Response, StreamResponse, json_response
 from aiohttp.web_runner import AppRunner, TCPSite
 from asphalt.core import (
     ContainerComponent,
     Context,
     context_teardown,
+    current_context,
     resolve_reference,
 )
 
+if TYPE_CHECKING:
+    from aiohttp.test_utils import TestClient
+
+    from .accesslog import AccessLogger
+    from .accounting import UsageTracker
+    from .batching import MicroBatcher
+    from .health import HealthChecker
+    from .leaks import LeakDetector
+    from .loopmonitor import LoopMonitor
+    from .memo import RequestMemoFactory
+    from .metrics import MetricsCollector
+    from .profiling import RequestProfiler
+    from .recording import TrafficRecorder
+    from .scheduling import FairScheduler
+    from .tracing import Tracer
+
 
 @middleware
 async def asphalt_middleware(request: Request, handler: Callable[..., Awaitable]) -> Response:
@@ -24,6 +45,454 @@ async def asphalt_middleware(request: Request, handler: Callable[..., Awaitable]
         return await handler(request)
 
 
+def scheduling_middleware(
+    scheduler: FairScheduler,
+) -> Callable[..., Coroutine[Any, Any, Response]]:
+    """
+    Create a middleware that admits requests to the handler via a
+    :class:`~.scheduling.FairScheduler`.
+
+    Requests rejected by the scheduler receive a 503 response. Websocket upgrade
+    requests are passed through without scheduling.
+
+    :param scheduler: the scheduler to use
+
+    """
+
+    from .scheduling import SchedulerOverloaded
+
+    @middleware
+    async def schedule(request: Request, handler: Callable[..., Awaitable]) -> Response:
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return await handler(request)
+
+        request_class = scheduler.classify(
+            request.path, request.headers.get(scheduler.header), request.remote
+        )
+        try:
+            async with scheduler.admit(request_class):
+                return await handler(request)
+        except SchedulerOverloaded:
+            raise HTTPServiceUnavailable() from None
+
+    return schedule
+
+
+def setup_deadlines(
+    app: Application,
+    *,
+    timeout: float | None = None,
+    max_timeout: float | None = None,
+    headers: Sequence[str] = ("x-request-deadline", "grpc-timeout"),
+) -> None:
+    """
+    Add a middleware to the application that enforces deadlines on requests.
+
+    The timeout is read from the first of the given headers present in the request,
+    falling back to ``timeout``. Each request with a timeout gets a
+    :class:`~.deadline.Deadline` resource in its request context. If the handler has not
+    finished by the deadline, it is cancelled and the client receives a 504 response.
+
+    The middleware must run within the request context, so it should be added after the
+    component has added its own middleware (via the ``deadlines`` or ``middlewares``
+    options of :class:`AIOHTTPComponent`).
+
+    This function can be used as the ``type`` in a middleware dict.
+
+    :param app: the application
+    :param timeout: the default timeout (in seconds) for requests that don't specify one
+        (``None`` = no deadline)
+    :param max_timeout: the maximum timeout (in seconds) a client can request
+    :param headers: names of the headers to read the timeout from
+
+    """
+
+    from .deadline import Deadline, resolve_timeout
+
+    @middleware
+    async def deadline_middleware(request: Request, handler: Callable[..., Awaitable]) -> Response:
+        header_values = [request.headers.get(header) for header in headers]
+        effective_timeout = resolve_timeout(header_values, timeout, max_timeout)
+        if effective_timeout is None:
+            return await handler(request)
+
+        deadline = Deadline(effective_timeout)
+        current_context().add_resource(deadline)
+        try:
+            return await wait_for(handler(request), effective_timeout)
+        except TimeoutError:
+            if not deadline.expired:
+                raise
+
+            raise HTTPGatewayTimeout() from None
+
+    app.middlewares.append(deadline_middleware)
+
+
+def health_middleware(checker: HealthChecker) -> Callable[..., Coroutine[Any, Any, Response]]:
+    """
+    Create a middleware that answers liveness and readiness probes.
+
+    Probe requests are answered directly by this middleware, without passing them to
+    the handler or any middleware further down the chain.
+
+    :param checker: the health checker to use
+
+    """
+
+    from .health import render_readiness
+
+    @middleware
+    async def check_health(request: Request, handler: Callable[..., Awaitable]) -> Response:
+        if request.path == checker.liveness_path:
+            return json_response({"status": "ok"})
+        elif request.path == checker.readiness_path:
+            ready, results = await checker.is_ready()
+            return Response(
+                body=render_readiness(ready, results),
+                status=200 if ready else 503,
+                content_type="application/json",
+            )
+
+        return await handler(request)
+
+    return check_health
+
+
+def metrics_middleware(
+    collector: MetricsCollector,
+) -> Callable[..., Coroutine[Any, Any, Response]]:
+    """
+    Create a middleware that records request metrics into a
+    :class:`~.metrics.MetricsCollector`.
+
+    If the collector has a ``path`` set, requests to that path are answered with the
+    collected metrics in the Prometheus text format.
+
+    :param collector: the metrics collector to use
+
+    """
+    from .metrics import PROMETHEUS_CONTENT_TYPE
+
+    content_type, _, charset = PROMETHEUS_CONTENT_TYPE.decode().partition("; charset=")
+
+    @middleware
+    async def record_metrics(request: Request, handler: Callable[..., Awaitable]) -> Response:
+        if request.path == collector.path:
+            response = Response(text=collector.render_prometheus(), charset=charset)
+            response.content_type = content_type
+            return response
+
+        start = perf_counter()
+        header_value = request.headers.get(collector.queue_time_header)
+        queue_time = (
+            collector.get_queue_time(header_value, time()) if header_value is not None else None
+        )
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except HTTPException as exc:
+            status = exc.status
+            raise
+        finally:
+            resource = request.match_info.route.resource
+            route = (
+                resource.canonical
+                if resource is not None
+                else collector.unmatched_route or request.path
+            )
+            collector.record(route, request.method, status, perf_counter() - start, queue_time)
+
+    return record_metrics
+
+
+def profiling_middleware(
+    profiler: RequestProfiler,
+) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that profiles requests using a :class:`~.profiling.RequestProfiler`.
+
+    :param profiler: the request profiler to use
+
+    """
+
+    @middleware
+    async def profile(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        token = request.headers.get(profiler.header)
+        if token is None or not profiler.is_authorized(token, request.remote):
+            return await handler(request)
+
+        if profiler.path is not None and request.path == profiler.path:
+            return json_response(profiler.profile_ids)
+        elif profiler.path is not None and request.path.startswith(profiler.path + "/"):
+            text = profiler.render(request.path[len(profiler.path) + 1 :])
+            return Response(text=text) if text is not None else Response(status=404)
+
+        with profiler.profile() as profile_id:
+            response: StreamResponse = await handler(request)
+            if profile_id is not None and not response.prepared:
+                response.headers[profiler.response_header] = profile_id
+
+            return response
+
+    return profile
+
+
+def accounting_middleware(
+    tracker: UsageTracker,
+) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that records the resource usage of requests into a
+    :class:`~.accounting.UsageTracker`.
+
+    :param tracker: the usage tracker to use
+
+    """
+
+    @middleware
+    async def account(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        usage = tracker.new_usage()
+        try:
+            return await tracker.measure(handler(request), usage)
+        finally:
+            resource = request.match_info.route.resource
+            route = (
+                resource.canonical
+                if resource is not None
+                else tracker.unmatched_route or request.path
+            )
+            tracker.record(route, request.method, usage)
+
+    return account
+
+
+def leak_detection_middleware(
+    detector: LeakDetector,
+) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that tracks request contexts with a :class:`~.leaks.LeakDetector`.
+
+    This must be placed after the Asphalt middleware, which creates the request contexts.
+
+    :param detector: the leak detector to use
+
+    """
+
+    @middleware
+    async def track_context(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        if request.path == detector.path:
+            return json_response(detector.as_dict())
+
+        tracked = detector.track(current_context(), request.path)
+        try:
+            return await handler(request)
+        finally:
+            resource = request.match_info.route.resource
+            detector.finish(tracked, resource.canonical if resource is not None else None)
+
+    return track_context
+
+
+def loop_monitor_middleware(
+    monitor: LoopMonitor,
+) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that lets a :class:`~.loopmonitor.LoopMonitor` know which request
+    each task is handling.
+
+    :param monitor: the loop monitor to use
+
+    """
+
+    @middleware
+    async def track_request(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        with monitor.track_request(request.path):
+            return await handler(request)
+
+    return track_request
+
+
+def access_log_middleware(
+    access_logger: AccessLogger,
+) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that logs requests with an :class:`~.accesslog.AccessLogger`.
+
+    :param access_logger: the access logger to use
+
+    """
+
+    from .accesslog import AccessLogRecord
+
+    @middleware
+    async def log_access(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        if not access_logger.sample():
+            return await handler(request)
+
+        timestamp = time()
+        start = perf_counter()
+        status = 500
+        size = 0
+        try:
+            response = await handler(request)
+            status = response.status
+            if response.prepared:
+                size = response.body_length
+            else:
+                size = response.content_length or 0
+
+            return response
+        except HTTPException as exc:
+            status = exc.status
+            raise
+        finally:
+            resource = request.match_info.route.resource
+            access_logger.log(
+                AccessLogRecord(
+                    timestamp,
+                    request.remote,
+                    request.method,
+                    request.path,
+                    request.query_string,
+                    resource.canonical if resource is not None else None,
+                    status,
+                    size,
+                    perf_counter() - start,
+                    request.headers.get("User-Agent"),
+                )
+            )
+
+    return log_access
+
+
+def recording_middleware(
+    recorder: TrafficRecorder,
+) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that records requests with a :class:`~.recording.TrafficRecorder`.
+
+    The body of a sampled request is read before passing the request to the handler,
+    unless its declared length exceeds the recorder's ``max_body_size`` (or the length
+    was not declared), in which case the body is not recorded.
+
+    :param recorder: the traffic recorder to use
+
+    """
+
+    from .recording import RecordedRequest
+
+    @middleware
+    async def record(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        if not recorder.sample():
+            return await handler(request)
+
+        timestamp = time()
+        start = perf_counter()
+        body: bytes | None = None
+        if not request.body_exists:
+            body = b""
+        elif (
+            request.content_length is not None and request.content_length <= recorder.max_body_size
+        ):
+            body = await request.read()
+
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except HTTPException as exc:
+            status = exc.status
+            raise
+        finally:
+            headers = [
+                (key.decode("latin-1").lower(), value.decode("latin-1"))
+                for key, value in request.raw_headers
+            ]
+            recorder.record(
+                RecordedRequest(
+                    timestamp,
+                    request.method,
+                    request.path,
+                    request.query_string,
+                    recorder.filter_headers(headers),
+                    body,
+                    status,
+                    perf_counter() - start,
+                )
+            )
+
+    return record
+
+
+def tracing_middleware(tracer: Tracer) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that records a span for each sampled request using a
+    :class:`~.tracing.Tracer`.
+
+    While the request is being handled, the span is the active span, and is available
+    as a :class:`~.tracing.Span` resource.
+
+    :param tracer: the tracer to use
+
+    """
+
+    @middleware
+    async def trace(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        span = tracer.start_trace(
+            "http",
+            request.headers.get("traceparent"),
+            {"http.method": request.method, "http.target": request.path},
+        )
+        if span is None:
+            return await handler(request)
+
+        with tracer.activate(span):
+            try:
+                response = await handler(request)
+            except HTTPException as exc:
+                span.attributes["http.status_code"] = exc.status
+                raise
+            finally:
+                resource = request.match_info.route.resource
+                if resource is not None:
+                    span.attributes["http.route"] = resource.canonical
+
+            span.attributes["http.status_code"] = response.status
+            return response
+
+    return trace
+
+
+def handler_span_middleware(
+    tracer: Tracer,
+) -> Callable[..., Coroutine[Any, Any, StreamResponse]]:
+    """
+    Create a middleware that records a child span of the active span around the
+    handler.
+
+    This also adds the root span of the request to the request context, so it must be
+    placed after the Asphalt middleware.
+
+    :param tracer: the tracer to use
+
+    """
+
+    from .tracing import add_request_span
+
+    @middleware
+    async def trace_handler(request: Request, handler: Callable[..., Awaitable]) -> StreamResponse:
+        if add_request_span(current_context()) is None:
+            return await handler(request)
+
+        with tracer.span("handler"):
+            return await handler(request)
+
+    return trace_handler
+
+
 class AIOHTTPComponent(ContainerComponent):
     """
     A component that serves an aiohttp application.
@@ -31,10 +500,61 @@ class AIOHTTPComponent(ContainerComponent):
     :param app: the application object, or a module:varname reference to one
     :param host: the IP address to bind to
     :param port: the port to bind to
+    :param listen: if ``False``, don't start a server, and only serve requests made
+        through a client from :meth:`create_client`
     :param middlewares: list of compatible coroutine functions or dicts to be added as
         middleware using :meth:`add_middleware`
+    :param scheduling: if not ``None``, admit requests to the handlers using weighted
+        fair queuing, with these keyword arguments passed to
+        :class:`~.scheduling.FairScheduler`
+    :param deadlines: if not ``None``, enforce deadlines on requests (exposed as
+        :class:`~.deadline.Deadline` resources in the request contexts), with these
+        keyword arguments passed to :func:`setup_deadlines`
+    :param health: if not ``None``, answer liveness and readiness probes before passing
+        requests to any middleware, with these keyword arguments passed to
+        :class:`~.health.HealthChecker`
+    :param metrics: if not ``None``, record request metrics, with these keyword arguments
+        passed to :class:`~.metrics.MetricsCollector`
+    :param profiling: if not ``None``, profile requests carrying the trigger header
+        within their request contexts, with these keyword arguments passed to
+        :class:`~.profiling.RequestProfiler`
+    :param loop_monitor: if not ``None``, monitor the event loop lag and detect code
+        blocking the event loop while the server is running, with these keyword arguments
+        passed to :class:`~.loopmonitor.LoopMonitor`
+    :param accounting: if not ``None``, record the CPU time (and optionally the net
+        memory growth) of each request, with these keyword arguments passed to
+        :class:`~.accounting.UsageTracker`
+    :param leak_detection: if not ``None``, detect request contexts and resources kept
+        alive after the response, with these keyword arguments passed to
+        :class:`~.leaks.LeakDetector`
+    :param tracing: if not ``None``, record spans for sampled requests and export them
+        in batches, with these keyword arguments passed to :class:`~.tracing.Tracer`
+    :param access_log: if not ``None``, write an access log from a separate thread
+        (instead of aiohttp's own access log), with these keyword arguments passed to
+        :class:`~.accesslog.AccessLogger`
+    :param recording: if not ``None``, record a sample of the requests to a file for
+        replaying them later, with these keyword arguments passed to
+        :class:`~.recording.TrafficRecorder`
+    :param request_memo: if not ``None``, make a :class:`~.memo.RequestMemo` available in
+        each request context, with these keyword arguments passed to it
+    :param batching: a dictionary of resource names to keyword arguments passed to
+        :class:`~.batching.MicroBatcher`, to make batchers available as resources for
+        combining the downstream calls of concurrent requests
     """
 
+    scheduler: FairScheduler | None = None
+    health_checker: HealthChecker | None = None
+    metrics_collector: MetricsCollector | None = None
+    profiler: RequestProfiler | None = None
+    loop_monitor: LoopMonitor | None = None
+    usage_tracker: UsageTracker | None = None
+    leak_detector: LeakDetector | None = None
+    tracer: Tracer | None = None
+    access_logger: AccessLogger | None = None
+    recorder: TrafficRecorder | None = None
+    request_memo_factory: RequestMemoFactory | None = None
+    batchers: dict[str, MicroBatcher]
+
     def __init__(
         self,
         components: dict[str, dict[str, Any] | None] | None = None,
@@ -42,18 +562,121 @@ class AIOHTTPComponent(ContainerComponent):
         app: Application | str | None = None,
         host: str = "127.0.0.1",
         port: int = 8000,
+        listen: bool = True,
         middlewares: Sequence[Callable[..., Coroutine[Any, Any, Any]] | dict[str, Any]] = (),
+        scheduling: dict[str, Any] | None = None,
+        deadlines: dict[str, Any] | None = None,
+        health: dict[str, Any] | None = None,
+        metrics: dict[str, Any] | None = None,
+        profiling: dict[str, Any] | None = None,
+        loop_monitor: dict[str, Any] | None = None,
+        accounting: dict[str, Any] | None = None,
+        leak_detection: dict[str, Any] | None = None,
+        tracing: dict[str, Any] | None = None,
+        access_log: dict[str, Any] | None = None,
+        recording: dict[str, Any] | None = None,
+        request_memo: dict[str, Any] | None = None,
+        batching: dict[str, dict[str, Any]] | None = None,
     ) -> None:
         super().__init__(components)
 
         self.app = resolve_reference(app) or Application()
         self.host = host
         self.port = port
+        self.listen = listen
+
+        # The optional features are imported only when used, to keep importing this
+        # module fast
+        if health is not None:
+            from .health import HealthChecker
+
+            self.health_checker = HealthChecker(**health)
+            self.add_middleware(health_middleware(self.health_checker))
+
+        if access_log is not None:
+            from .accesslog import AccessLogger
+
+            self.access_logger = AccessLogger(**access_log)
+            self.add_middleware(access_log_middleware(self.access_logger))
+
+        if recording is not None:
+            from .recording import TrafficRecorder
+
+            self.recorder = TrafficRecorder(**recording)
+            self.add_middleware(recording_middleware(self.recorder))
+
+        if tracing is not None:
+            from .tracing import Tracer
+
+            self.tracer = Tracer(**tracing)
+            self.add_middleware(tracing_middleware(self.tracer))
+
+        if metrics is not None:
+            from .metrics import MetricsCollector
+
+            self.metrics_collector = MetricsCollector(**metrics)
+            self.add_middleware(metrics_middleware(self.metrics_collector))
+
+        if scheduling is not None:
+            from .scheduling import FairScheduler
+
+            self.scheduler = FairScheduler(**scheduling)
+            self.add_middleware(scheduling_middleware(self.scheduler))
 
         self.add_middleware(asphalt_middleware)
+        if leak_detection is not None:
+            from .leaks import LeakDetector
+
+            self.leak_detector = LeakDetector(**leak_detection)
+            self.add_middleware(leak_detection_middleware(self.leak_detector))
+
+        if profiling is not None:
+            from .profiling import RequestProfiler
+
+            self.profiler = RequestProfiler(**profiling)
+            self.add_middleware(profiling_middleware(self.profiler))
+
+        if accounting is not None:
+            from .accounting import UsageTracker
+
+            self.usage_tracker = UsageTracker(**accounting)
+            self.add_middleware(accounting_middleware(self.usage_tracker))
+
+        if deadlines is not None:
+            setup_deadlines(self.app, **deadlines)
+
         for mw in middlewares:
             self.add_middleware(mw)
 
+        if self.tracer:
+            self.add_middleware(handler_span_middleware(self.tracer))
+
+        if loop_monitor is not None:
+            from .loopmonitor import LoopMonitor
+
+            self.loop_monitor = LoopMonitor(**loop_monitor)
+            self.add_middleware(loop_monitor_middleware(self.loop_monitor))
+            if self.metrics_collector:
+                self.metrics_collector.add_renderer(self.loop_monitor.render_prometheus)
+
+        if self.usage_tracker and self.metrics_collector:
+            self.metrics_collector.add_renderer(self.usage_tracker.render_prometheus)
+
+        if request_memo is not None:
+            from .memo import RequestMemoFactory
+
+            self.request_memo_factory = RequestMemoFactory(request_types=[Request], **request_memo)
+
+        self.batchers = {}
+        if batching:
+            from .batching import MicroBatcher, render_batchers_prometheus
+
+            self.batchers = {name: MicroBatcher(**kwargs) for name, kwargs in batching.items()}
+            if self.metrics_collector:
+                self.metrics_collector.add_renderer(
+                    partial(render_batchers_prometheus, self.batchers)
+                )
+
     def add_middleware(
         self, middleware: Callable[..., Coroutine[Any, Any, Any]] | dict[str, Any]
     ) -> None:
@@ -86,9 +709,53 @@ https://docs.aiohttp.org/en/stable/web_advanced.html#aiohttp-web-middlewares
 
     async def start(self, ctx: Context) -> None:
         ctx.add_resource(self.app)
+        if self.scheduler:
+            ctx.add_resource(self.scheduler)
+        if self.health_checker:
+            ctx.add_resource(self.health_checker)
+        if self.metrics_collector:
+            ctx.add_resource(self.metrics_collector)
+        if self.profiler:
+            ctx.add_resource(self.profiler)
+        if self.loop_monitor:
+            ctx.add_resource(self.loop_monitor)
+        if self.usage_tracker:
+            ctx.add_resource(self.usage_tracker)
+        if self.leak_detector:
+            ctx.add_resource(self.leak_detector)
+        if self.tracer:
+            ctx.add_resource(self.tracer)
+        if self.access_logger:
+            ctx.add_resource(self.access_logger)
+        if self.recorder:
+            ctx.add_resource(self.recorder)
+        if self.request_memo_factory:
+            from .memo import RequestMemo
+
+            ctx.add_resource_factory(self.request_memo_factory, [RequestMemo])
+        for name, batcher in self.batchers.items():
+            ctx.add_resource(batcher, name)
+
         await super().start(ctx)
         await self.start_server(ctx)
 
+    def create_client(self) -> TestClient:
+        """
+        Create an aiohttp test client for the application.
+
+        The client starts its own test server on a random port on the loopback
+        interface, so this is most useful with ``listen=False``. The requests go through
+        the entire middleware stack and run in request contexts just like with the
+        component's own server. This only works after the component has been started.
+
+        :return: a client that must be used as an async context manager
+
+        """
+        from aiohttp.test_utils import TestClient, TestServer
+
+        kwargs: dict[str, Any] = {"access_log": None} if self.access_logger else {}
+        return TestClient(TestServer(self.app, host="127.0.0.1", **kwargs))
+
     @context_teardown
     async def start_server(self, ctx: Context) -> AsyncGenerator[None, Exception | None]:
         """
@@ -100,11 +767,52 @@ https://docs.aiohttp.org/en/stable/web_advanced.html#aiohttp-web-middlewares
         implementation after the middleware has been added.
 
         """
-        runner = AppRunner(self.app)
-        await runner.setup()
-        site = TCPSite(runner, host=self.host, port=self.port)
-        await site.start()
+        for batcher in self.batchers.values():
+            batcher.start()
+
+        if self.listen:
+            if self.access_logger:
+                # Replace aiohttp's own access log
+                runner = AppRunner(self.app, access_log=None)
+            else:
+                runner = AppRunner(self.app)
+
+            await runner.setup()
+            site = TCPSite(runner, host=self.host, port=self.port)
+            await site.start()
+
+        if self.loop_monitor:
+            monitor_task = create_task(self.loop_monitor.run())
+        if self.leak_detector:
+            leak_detector_task = create_task(self.leak_detector.run())
+        if self.tracer:
+            self.tracer.start()
+        if self.access_logger:
+            self.access_logger.start()
+        if self.recorder:
+            self.recorder.start()
+        if self.health_checker:
+            self.health_checker.ready = True
 
         yield
 
-        await runner.cleanup()
+        if self.health_checker:
+            self.health_checker.ready = False
+        if self.loop_monitor:
+            monitor_task.cancel()
+        if self.leak_detector:
+            leak_detector_task.cancel()
+
+        if self.listen:
+            await runner.cleanup()
+
+        for batcher in self.batchers.values():
+            await batcher.close()
+
+        if self.tracer:
+            # Export the spans of the last requests without blocking the event loop
+            await get_running_loop().run_in_executor(None, self.tracer.stop)
+        if self.access_logger:
+            await get_running_loop().run_in_executor(None, self.access_logger.stop)
+        if self.recorder:
+            await get_running_loop().run_in_executor(None, self.recorder.stop)
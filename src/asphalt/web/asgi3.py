@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-from asyncio import create_task, sleep
+from asyncio import create_task, get_running_loop, sleep
 from collections.abc import AsyncGenerator, Callable, Sequence
 from dataclasses import dataclass
+from functools import partial
 from inspect import isfunction
-from typing import Any, Generic, TypeVar
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
 
-import uvicorn
 from asgiref.typing import (
     ASGI3Application,
     ASGIReceiveCallable,
@@ -21,7 +21,24 @@ from asphalt.core import (
     context_teardown,
     resolve_reference,
 )
-from uvicorn import Config
+
+if TYPE_CHECKING:
+    from httpx import AsyncClient
+
+    from .accesslog import AccessLogger
+    from .accounting import UsageTracker
+    from .batching import MicroBatcher
+    from .health import HealthChecker
+    from .layertiming import LayerTimingReport
+    from .leaks import LeakDetector
+    from .loopmonitor import LoopMonitor
+    from .memo import RequestMemoFactory
+    from .metrics import MetricsCollector
+    from .mirroring import TrafficMirror
+    from .profiling import RequestProfiler
+    from .recording import TrafficRecorder
+    from .scheduling import FairScheduler
+    from .tracing import Tracer
 
 T_Application = TypeVar("T_Application", bound=ASGI3Application)
 
@@ -59,10 +76,69 @@ class ASGIComponent(ContainerComponent, Generic[T_Application]):
     :type app: asgiref.typing.ASGI3Application | str
     :param host: the IP address to bind to
     :param port: the port to bind to
+    :param listen: if ``False``, don't start a server, and only serve requests made
+        through a client from :meth:`create_client`
     :param middlewares: list of callables or dicts to be added as middleware using
         :meth:`add_middleware`
+    :param scheduling: if not ``None``, admit HTTP requests to the application using
+        weighted fair queuing, with these keyword arguments passed to
+        :class:`~.scheduling.FairScheduler`
+    :param deadlines: if not ``None``, enforce deadlines on HTTP requests (exposed as
+        :class:`~.deadline.Deadline` resources in the request contexts), with these
+        keyword arguments passed to :class:`~.deadline.DeadlineMiddleware`
+    :param health: if not ``None``, answer liveness and readiness probes before passing
+        requests to any middleware (including the framework's own), with these keyword
+        arguments passed to :class:`~.health.HealthChecker`
+    :param metrics: if not ``None``, record request metrics, with these keyword arguments
+        passed to :class:`~.metrics.MetricsCollector`
+    :param layer_timing: if not ``None``, record the time spent in each middleware layer
+        (including the Asphalt middleware and the application itself), with these keyword
+        arguments passed to :class:`~.layertiming.LayerTimingReport`
+    :param profiling: if not ``None``, profile requests carrying the trigger header
+        within their request contexts, with these keyword arguments passed to
+        :class:`~.profiling.RequestProfiler`
+    :param loop_monitor: if not ``None``, monitor the event loop lag and detect code
+        blocking the event loop while the server is running, with these keyword arguments
+        passed to :class:`~.loopmonitor.LoopMonitor`
+    :param accounting: if not ``None``, record the CPU time (and optionally the net
+        memory growth) of each request, with these keyword arguments passed to
+        :class:`~.accounting.UsageTracker`
+    :param leak_detection: if not ``None``, detect request contexts and resources kept
+        alive after the response, with these keyword arguments passed to
+        :class:`~.leaks.LeakDetector`
+    :param tracing: if not ``None``, record spans for sampled requests and export them
+        in batches, with these keyword arguments passed to :class:`~.tracing.Tracer`
+    :param access_log: if not ``None``, write an access log from a separate thread
+        (instead of Uvicorn's own access log), with these keyword arguments passed to
+        :class:`~.accesslog.AccessLogger`
+    :param recording: if not ``None``, record a sample of the requests to a file for
+        replaying them later, with these keyword arguments passed to
+        :class:`~.recording.TrafficRecorder`
+    :param mirroring: if not ``None``, mirror a sample of the HTTP requests to a shadow
+        application and compare its latencies and status codes to the application's, with
+        these keyword arguments passed to :class:`~.mirroring.TrafficMirror`
+    :param request_memo: if not ``None``, make a :class:`~.memo.RequestMemo` available in
+        each request context, with these keyword arguments passed to it
+    :param batching: a dictionary of resource names to keyword arguments passed to
+        :class:`~.batching.MicroBatcher`, to make batchers available as resources for
+        combining the downstream calls of concurrent requests
     """
 
+    scheduler: FairScheduler | None = None
+    health_checker: HealthChecker | None = None
+    metrics_collector: MetricsCollector | None = None
+    layer_timing: LayerTimingReport | None = None
+    profiler: RequestProfiler | None = None
+    loop_monitor: LoopMonitor | None = None
+    usage_tracker: UsageTracker | None = None
+    leak_detector: LeakDetector | None = None
+    tracer: Tracer | None = None
+    access_logger: AccessLogger | None = None
+    recorder: TrafficRecorder | None = None
+    mirror: TrafficMirror | None = None
+    request_memo_factory: RequestMemoFactory | None = None
+    batchers: dict[str, MicroBatcher]
+
     def __init__(
         self,
         components: dict[str, dict[str, Any] | None] | None = None,
@@ -70,18 +146,150 @@ class ASGIComponent(ContainerComponent, Generic[T_Application]):
         app: T_Application | str,
         host: str = "127.0.0.1",
         port: int = 8000,
+        listen: bool = True,
         middlewares: Sequence[Callable[..., ASGI3Application] | dict[str, Any]] = (),
+        scheduling: dict[str, Any] | None = None,
+        deadlines: dict[str, Any] | None = None,
+        health: dict[str, Any] | None = None,
+        metrics: dict[str, Any] | None = None,
+        layer_timing: dict[str, Any] | None = None,
+        profiling: dict[str, Any] | None = None,
+        loop_monitor: dict[str, Any] | None = None,
+        accounting: dict[str, Any] | None = None,
+        leak_detection: dict[str, Any] | None = None,
+        tracing: dict[str, Any] | None = None,
+        access_log: dict[str, Any] | None = None,
+        recording: dict[str, Any] | None = None,
+        mirroring: dict[str, Any] | None = None,
+        request_memo: dict[str, Any] | None = None,
+        batching: dict[str, dict[str, Any]] | None = None,
     ) -> None:
         super().__init__(components)
         self.app: T_Application = resolve_reference(app)
         self.original_app = self.app
         self.host = host
         self.port = port
+        self.listen = listen
+
+        # The optional features (and the server) are imported only when used, to keep
+        # importing the integration modules fast
+        if layer_timing is not None:
+            from .layertiming import LayerTimingReport
+
+            self.layer_timing = LayerTimingReport(**layer_timing)
+            # Time the application itself as the innermost layer
+            self.add_middleware(lambda app: app)
+
+        if tracing is not None:
+            from .tracing import SpanMiddleware, Tracer
+
+            self.tracer = Tracer(**tracing)
+            self.add_middleware(partial(SpanMiddleware, tracer=self.tracer))
+
+        # These are added before the Asphalt middleware to run within the request context
+        if leak_detection is not None:
+            from .leaks import LeakDetectionMiddleware, LeakDetector
+
+            self.leak_detector = LeakDetector(**leak_detection)
+            self.add_middleware(partial(LeakDetectionMiddleware, detector=self.leak_detector))
+
+        if accounting is not None:
+            from .accounting import AccountingMiddleware, UsageTracker
+
+            self.usage_tracker = UsageTracker(**accounting)
+            self.add_middleware(partial(AccountingMiddleware, tracker=self.usage_tracker))
+
+        if profiling is not None:
+            from .profiling import ProfilingMiddleware, RequestProfiler
+
+            self.profiler = RequestProfiler(**profiling)
+            self.add_middleware(partial(ProfilingMiddleware, profiler=self.profiler))
+
+        if deadlines is not None:
+            from .deadline import DeadlineMiddleware
+
+            self.add_middleware(partial(DeadlineMiddleware, **deadlines))
 
         self.add_middleware(self.setup_asphalt_middleware)
+        if mirroring is not None:
+            # Added right outside the Asphalt middleware so that both applications are
+            # timed alike, and the mirrored requests don't inherit the request context
+            from .mirroring import MirroringMiddleware, TrafficMirror
+
+            self.mirror = TrafficMirror(**mirroring)
+            shadow_app = self.setup_asphalt_middleware(self.mirror.app)  # type: ignore[arg-type]
+            self.add_middleware(
+                partial(MirroringMiddleware, mirror=self.mirror, shadow_app=shadow_app)
+            )
+
         for middleware in middlewares:
             self.add_middleware(middleware)
 
+        if scheduling is not None:
+            from .scheduling import FairScheduler, SchedulingMiddleware
+
+            self.scheduler = FairScheduler(**scheduling)
+            self.add_middleware(partial(SchedulingMiddleware, scheduler=self.scheduler))
+
+        if metrics is not None:
+            from .metrics import MetricsCollector, MetricsMiddleware
+
+            self.metrics_collector = MetricsCollector(**metrics)
+            self.add_middleware(partial(MetricsMiddleware, collector=self.metrics_collector))
+
+        if self.tracer:
+            from .tracing import TracingMiddleware
+
+            self.add_middleware(partial(TracingMiddleware, tracer=self.tracer))
+
+        if access_log is not None:
+            from .accesslog import AccessLogger, AccessLogMiddleware
+
+            self.access_logger = AccessLogger(**access_log)
+            self.add_middleware(partial(AccessLogMiddleware, access_logger=self.access_logger))
+
+        if recording is not None:
+            from .recording import RecordingMiddleware, TrafficRecorder
+
+            self.recorder = TrafficRecorder(**recording)
+            self.add_middleware(partial(RecordingMiddleware, recorder=self.recorder))
+
+        if health is not None:
+            from .health import HealthChecker
+
+            self.health_checker = HealthChecker(**health)
+
+        if loop_monitor is not None:
+            from .loopmonitor import LoopMonitor, LoopMonitorMiddleware
+
+            self.loop_monitor = LoopMonitor(**loop_monitor)
+            self.add_middleware(partial(LoopMonitorMiddleware, monitor=self.loop_monitor))
+            if self.metrics_collector:
+                self.metrics_collector.add_renderer(self.loop_monitor.render_prometheus)
+
+        if self.usage_tracker and self.metrics_collector:
+            self.metrics_collector.add_renderer(self.usage_tracker.render_prometheus)
+
+        if self.mirror and self.metrics_collector:
+            self.metrics_collector.add_renderer(self.mirror.render_prometheus)
+
+        if request_memo is not None:
+            from .memo import RequestMemoFactory
+
+            self.request_memo_factory = RequestMemoFactory(
+                request_types=[HTTPScope, WebSocketScope], **request_memo
+            )
+
+        self.batchers = {}
+        if batching:
+            from .batching import MicroBatcher, render_batchers_prometheus
+
+            self.batchers = {name: MicroBatcher(**kwargs) for name, kwargs in batching.items()}
+            if self.metrics_collector:
+                self.metrics_collector.add_renderer(
+                    partial(render_batchers_prometheus, self.batchers)
+                )
+
     def setup_asphalt_middleware(self, app: T_Application) -> ASGI3Application:
         return AsphaltMiddleware(app)
 
@@ -102,21 +310,101 @@ class ASGIComponent(ContainerComponent, Generic[T_Application]):
             if not callable(type_):
                 raise TypeError(f"Middleware ({type_!r}) is not callable")
 
-            self.app = type_(self.app, **middleware)
+            factory: Callable[..., ASGI3Application] = partial(type_, **middleware)
         elif callable(middleware):
-            self.app = middleware(self.app)
+            factory = middleware
         else:
             raise TypeError(f"middleware must be either a callable or a dict, not {middleware!r}")
 
+        if self.layer_timing:
+            factory = self.layer_timing.wrap_factory(factory)
+
+        self.app = factory(self.app)
+
     async def start(self, ctx: Context) -> None:
         types = [ASGI3Application]
         if not isfunction(self.original_app):
             types.append(type(self.original_app))
 
         ctx.add_resource(self.original_app, types=types)
+        if self.scheduler:
+            ctx.add_resource(self.scheduler)
+        if self.health_checker:
+            ctx.add_resource(self.health_checker)
+        if self.metrics_collector:
+            ctx.add_resource(self.metrics_collector)
+        if self.layer_timing:
+            ctx.add_resource(self.layer_timing)
+        if self.profiler:
+            ctx.add_resource(self.profiler)
+        if self.loop_monitor:
+            ctx.add_resource(self.loop_monitor)
+        if self.usage_tracker:
+            ctx.add_resource(self.usage_tracker)
+        if self.leak_detector:
+            ctx.add_resource(self.leak_detector)
+        if self.tracer:
+            ctx.add_resource(self.tracer)
+        if self.access_logger:
+            ctx.add_resource(self.access_logger)
+        if self.recorder:
+            ctx.add_resource(self.recorder)
+        if self.mirror:
+            ctx.add_resource(self.mirror)
+        if self.request_memo_factory:
+            from .memo import RequestMemo
+
+            ctx.add_resource_factory(self.request_memo_factory, [RequestMemo])
+        for name, batcher in self.batchers.items():
+            ctx.add_resource(batcher, name)
+
         await super().start(ctx)
         await self.start_server(ctx)
 
+    def build_server_app(self) -> ASGI3Application:
+        """
+        Return the application as given to the server.
+
+        This is the application with all its middleware, wrapped in the endpoints that
+        bypass the middleware (health probes and the layer timing report).
+
+        """
+        app: ASGI3Application = self.app
+        if self.layer_timing and self.layer_timing.path:
+            from .layertiming import LayerTimingEndpoint
+
+            app = LayerTimingEndpoint(app, self.layer_timing)
+        if self.health_checker:
+            from .health import HealthMiddleware
+
+            # Wrap the final application directly, bypassing any framework middleware
+            app = HealthMiddleware(app, self.health_checker)
+
+        return app
+
+    def create_client(self, **kwargs: Any) -> AsyncClient:
+        """
+        Create an HTTPX client that sends requests directly to the application.
+
+        The requests go through the entire middleware stack and run in request contexts
+        just like with a real server, but without any network connections. This is most
+        useful with ``listen=False``, and only works after the component has been
+        started. Websocket connections are not supported.
+
+        This requires HTTPX_ to be installed.
+
+        .. _HTTPX: https://www.python-httpx.org/
+
+        :param kwargs: extra keyword arguments passed to :class:`httpx.AsyncClient`
+        :return: a client that must be used as an async context manager
+
+        """
+        from httpx import ASGITransport, AsyncClient
+
+        kwargs.setdefault("base_url", f"http://{self.host}:{self.port}")
+        transport = ASGITransport(app=self.build_server_app())  # type: ignore[arg-type]
+        return AsyncClient(transport=transport, **kwargs)
+
     @context_teardown
     async def start_server(self, ctx: Context) -> AsyncGenerator[None, Exception | None]:
         """
@@ -128,21 +416,62 @@ class ASGIComponent(ContainerComponent, Generic[T_Application]):
         implementation after the middleware has been added.
 
         """
-        config = Config(
-            app=self.app,
-            host=self.host,
-            port=self.port,
-            use_colors=False,
-            log_config=None,
-            lifespan="off",
-        )
-        server = uvicorn.Server(config)
-        server.install_signal_handlers = lambda: None
-        server_task = create_task(server.serve())
-        while not server.started:
-            await sleep(0)
+        for batcher in self.batchers.values():
+            batcher.start()
+
+        if self.listen:
+            from uvicorn import Config, Server
+
+            config = Config(
+                app=self.build_server_app(),
+                host=self.host,
+                port=self.port,
+                use_colors=False,
+                log_config=None,
+                lifespan="off",
+                access_log=self.access_logger is None,
+            )
+            server = Server(config)
+            server.install_signal_handlers = lambda: None
+            server_task = create_task(server.serve())
+            while not server.started:
+                await sleep(0)
+
+        if self.loop_monitor:
+            monitor_task = create_task(self.loop_monitor.run())
+        if self.leak_detector:
+            leak_detector_task = create_task(self.leak_detector.run())
+        if self.tracer:
+            self.tracer.start()
+        if self.access_logger:
+            self.access_logger.start()
+        if self.recorder:
+            self.recorder.start()
+        if self.health_checker:
+            self.health_checker.ready = True
 
         yield
 
-        server.should_exit = True
-        await server_task
+        if self.health_checker:
+            self.health_checker.ready = False
+        if self.loop_monitor:
+            monitor_task.cancel()
+        if self.leak_detector:
+            leak_detector_task.cancel()
+
+        if self.listen:
+            server.should_exit = True
+            await server_task
+
+        if self.mirror:
+            self.mirror.cancel()
+        for batcher in self.batchers.values():
+            await batcher.close()
+
+        if self.tracer:
+            # Export the spans of the last requests without blocking the event loop
+            await get_running_loop().run_in_executor(None, self.tracer.stop)
+        if self.access_logger:
+            await get_running_loop().run_in_executor(None, self.access_logger.stop)
+        if self.recorder:
+            await get_running_loop().run_in_executor(None, self.recorder.stop)
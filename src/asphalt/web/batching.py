@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import logging
+from asyncio import Future, Task, TimerHandle, get_running_loop, wait
+from collections.abc import Awaitable, Callable, Iterable, Sequence
+from contextvars import Context, copy_context
+from time import perf_counter
+from typing import Any, Tuple
+
+from asphalt.core import resolve_reference
+
+from .metrics import Histogram, _escape_label, _render_histogram
+
+logger = logging.getLogger(__name__)
+
+#: Default buckets for the batch size histogram
+DEFAULT_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+#: Default buckets for the wait time histogram (in seconds)
+DEFAULT_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+#: A submitted item: (item, the future for its result, submission time)
+_PendingItem = Tuple[Any, "Future[Any]", float]
+
+
+class MicroBatcher:
+    """
+    Collects items submitted by concurrent requests and processes them in batches.
+
+    Each call to :meth:`submit` adds an item to the pending batch, which is passed to the
+    batch function when it reaches ``max_batch_size`` items, or when its first item has
+    waited for ``max_wait`` seconds, whichever comes first. Each caller then receives the
+    result matching its own item. If the batch function raises an exception, every
+    caller in the batch gets that exception.
+
+    The batch function is called in the context the batcher was started in (the root
+    context of the web component), rather than in the context of the request that
+    happened to fill the batch.
+
+    :param batch_function: a coroutine function (or a ``module:varname`` reference to
+        one) that takes a list of items and returns a sequence of results in the same
+        order
+    :param max_batch_size: maximum number of items in a batch
+    :param max_wait: maximum number of seconds an item waits for the batch to fill up
+    :param max_concurrency: maximum number of batches processed at the same time (further
+        full batches wait for a running batch to finish)
+    :param size_buckets: bucket upper bounds for the batch size histogram
+    :param wait_buckets: bucket upper bounds (in seconds) for the wait time histogram
+    :ivar Histogram batch_sizes: the number of items in each batch
+    :ivar Histogram wait_times: the time each item waited before its batch was processed
+    :ivar int errors: number of batches where the batch function failed
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_function: Callable[[list[Any]], Awaitable[Sequence[Any]]] | str,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        max_concurrency: int = 4,
+        size_buckets: Iterable[float] = DEFAULT_SIZE_BUCKETS,
+        wait_buckets: Iterable[float] = DEFAULT_WAIT_BUCKETS,
+    ) -> None:
+        self.batch_function: Callable[[list[Any]], Awaitable[Sequence[Any]]] = resolve_reference(
+            batch_function
+        )
+        if not callable(self.batch_function):
+            raise TypeError(f"batch_function ({self.batch_function!r}) is not callable")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be a positive integer")
+        if max_wait < 0:
+            raise ValueError("max_wait must not be negative")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer")
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self.batch_sizes = Histogram(size_buckets)
+        self.wait_times = Histogram(wait_buckets)
+        self.errors = 0
+        self._context: Context | None = None
+        self._pending: list[_PendingItem] = []
+        self._queued_batches: list[list[_PendingItem]] = []
+        self._timer: TimerHandle | None = None
+        self._tasks: set[Task[None]] = set()
+
+    def start(self) -> None:
+        """
+        Capture the current context for running the batch function in.
+
+        This is called by the web component when it starts.
+
+        """
+        self._context = copy_context()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Add an item to the pending batch and wait for its result.
+
+        :param item: the item to process
+        :return: the result of the batch function for this item
+
+        """
+        loop = get_running_loop()
+        future: Future[Any] = loop.create_future()
+        self._pending.append((item, future, perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._pending:
+            self._queued_batches.append(self._pending)
+            self._pending = []
+            self._run_queued_batches()
+
+    def _run_queued_batches(self) -> None:
+        while self._queued_batches and len(self._tasks) < self.max_concurrency:
+            batch = self._queued_batches.pop(0)
+            context = self._context or copy_context()
+            task = context.run(get_running_loop().create_task, self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: Task[None]) -> None:
+        self._tasks.discard(task)
+        self._run_queued_batches()
+
+    async def _run(self, batch: list[_PendingItem]) -> None:
+        now = perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _item, _future, submitted_at in batch:
+            self.wait_times.observe(now - submitted_at)
+
+        # Leave out the items whose callers have stopped waiting
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        try:
+            results = await self.batch_function([item for item, _future, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"the batch function returned {len(results)} results for {len(batch)} items"
+                )
+        except BaseException as exc:
+            self.errors += 1
+            logger.exception("Error processing a batch of %d items", len(batch))
+            for _item, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+
+            if not isinstance(exc, Exception):
+                raise
+
+            return
+
+        for (_item, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """
+        Process the pending items and wait for all batches to finish.
+
+        This is called by the web component when it shuts down.
+
+        """
+        self._flush()
+        while self._tasks:
+            await wait(list(self._tasks))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the collected data as a JSON compatible dictionary."""
+        return {
+            "batches": self.batch_sizes.count,
+            "items": int(self.batch_sizes.sum),
+            "errors": self.errors,
+            "mean_batch_size": self.batch_sizes.mean,
+            "wait_p50": self.wait_times.quantile(0.5),
+            "wait_p99": self.wait_times.quantile(0.99),
+        }
+
+
+def render_batchers_prometheus(batchers: dict[str, MicroBatcher], lines: list[str]) -> None:
+    """
+    Render the metrics of the given batchers in the Prometheus text exposition format.
+
+    :param batchers: batchers by their resource names
+    :param lines: the list to append the rendered lines to
+
+    """
+    lines += [
+        "# HELP batch_size Number of items in each processed batch.",
+        "# TYPE batch_size histogram",
+    ]
+    for name, batcher in batchers.items():
+        _render_histogram(
+            lines, "batch_size", f'batcher="{_escape_label(name)}"', batcher.batch_sizes
+        )
+
+    lines += [
+        "# HELP batch_wait_seconds Time items waited for their batch to be processed.",
+        "# TYPE batch_wait_seconds histogram",
+    ]
+    for name, batcher in batchers.items():
+        _render_histogram(
+            lines, "batch_wait_seconds", f'batcher="{_escape_label(name)}"', batcher.wait_times
+        )
+
+    lines += [
+        "# HELP batch_errors_total Batches where the batch function failed.",
+        "# TYPE batch_errors_total counter",
+    ]
+    for name, batcher in batchers.items():
+        lines.append(f'batch_errors_total{{batcher="{_escape_label(name)}"}} {batcher.errors}')
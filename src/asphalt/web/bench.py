@@ -0,0 +1,638 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import re
+import traceback
+from collections.abc import Mapping, Sequence
+from copy import deepcopy
+from dataclasses import dataclass, field
+from importlib import import_module
+from math import ceil
+from multiprocessing.connection import Connection
+from random import Random
+from time import perf_counter
+from typing import Any
+
+from asphalt.core import Component, ContainerComponent, Context, merge_config, qualified_name
+from asphalt.core.component import component_types
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """
+    Return the ``q``th percentile of the given values, using the nearest rank method.
+
+    :param sorted_values: the values, in ascending order
+    :param q: the percentile (0 to 100)
+
+    """
+    if not sorted_values:
+        return 0.0
+
+    rank = max(ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class RequestSpec:
+    """
+    A request to send during the benchmark.
+
+    :ivar path: the request path (including any query string)
+    :ivar method: the HTTP method
+    :ivar body: the request body
+    :ivar headers: extra request headers
+    :ivar weight: the relative frequency of this request among all the requests
+    """
+
+    path: str
+    method: str = "GET"
+    body: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+    weight: float = 1
+
+
+@dataclass
+class BenchmarkSpec:
+    """
+    A scripted benchmark.
+
+    The requests are sent for ``warmup`` + ``duration`` seconds at each concurrency
+    level, and only the last ``duration`` seconds are measured.
+
+    :ivar requests: the requests to send (chosen at random according to their weights)
+    :ivar concurrency: the concurrency levels (number of connections) to benchmark
+    :ivar duration: number of seconds to measure each concurrency level for
+    :ivar warmup: number of seconds to send requests before measuring
+    """
+
+    requests: list[RequestSpec]
+    concurrency: list[int] = field(default_factory=lambda: [10])
+    duration: float = 10.0
+    warmup: float = 1.0
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> BenchmarkSpec:
+        """
+        Create a benchmark specification from a parsed YAML or JSON document.
+
+        :raises TypeError: if the document is not structured correctly
+
+        """
+        if not isinstance(data, Mapping):
+            raise TypeError(f"the benchmark spec must be a mapping, not {qualified_name(data)}")
+
+        kwargs = dict(data)
+        raw_requests = kwargs.pop("requests", None)
+        if not isinstance(raw_requests, list) or not raw_requests:
+            raise TypeError("the benchmark spec must contain a non-empty list of requests")
+
+        requests = []
+        for raw_request in raw_requests:
+            if isinstance(raw_request, str):
+                raw_request = {"path": raw_request}
+            elif not isinstance(raw_request, Mapping):
+                raise TypeError(
+                    f"each request must be a path or a mapping, not {qualified_name(raw_request)}"
+                )
+
+            request_kwargs = dict(raw_request)
+            body = request_kwargs.get("body", b"")
+            if isinstance(body, str):
+                request_kwargs["body"] = body.encode("utf-8")
+
+            requests.append(RequestSpec(**request_kwargs))
+
+        concurrency = kwargs.pop("concurrency", [10])
+        if isinstance(concurrency, int):
+            concurrency = [concurrency]
+
+        if not concurrency or any(level < 1 for level in concurrency):
+            raise ValueError("concurrency levels must be positive integers")
+
+        return cls(requests, concurrency=concurrency, **kwargs)
+
+
+@dataclass
+class StageResult:
+    """
+    The results of benchmarking a single concurrency level.
+
+    :ivar concurrency: the number of concurrent connections
+    :ivar latencies: the latencies of the requests (in seconds), in ascending order
+    :ivar errors: number of failed requests (including responses with a 4xx or 5xx
+        status)
+    :ivar elapsed: number of seconds spent sending the measured requests
+    :ivar loop_lag: event loop lag samples from the server processes (in seconds), in
+        ascending order
+    """
+
+    concurrency: int
+    latencies: list[float]
+    errors: int
+    elapsed: float
+    loop_lag: list[float]
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        """Requests per second."""
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """The fraction of requests that failed."""
+        return self.errors / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "throughput": self.throughput,
+            "error_rate": self.error_rate,
+            "latency": {
+                "p50": percentile(self.latencies, 50),
+                "p90": percentile(self.latencies, 90),
+                "p99": percentile(self.latencies, 99),
+                "max": self.latencies[-1] if self.latencies else 0.0,
+            },
+            "loop_lag": {
+                "mean": sum(self.loop_lag) / len(self.loop_lag) if self.loop_lag else 0.0,
+                "p99": percentile(self.loop_lag, 99),
+                "max": self.loop_lag[-1] if self.loop_lag else 0.0,
+            },
+        }
+
+
+class HTTPConnection:
+    """
+    A minimal keep-alive HTTP/1.1 client connection.
+
+    This is much cheaper than a full featured HTTP client, which matters when the load
+    generator shares the CPU (or even the event loop) with the server.
+
+    :param host: the host to connect to
+    :param port: the port to connect to
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def request(
+        self,
+        path: str,
+        method: str = "GET",
+        body: bytes = b"",
+        headers: Mapping[str, str] | None = None,
+    ) -> int:
+        """
+        Send a request and read the response.
+
+        :return: the response status code
+
+        """
+        if self._reader is None or self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+        if body or method not in ("GET", "HEAD"):
+            head += f"Content-Length: {len(body)}\r\n"
+
+        for key, value in (headers or {}).items():
+            head += f"{key}: {value}\r\n"
+
+        try:
+            self._writer.write(head.encode("latin-1") + b"\r\n" + body)
+            raw_headers = await self._reader.readuntil(b"\r\n\r\n")
+            status_line, *header_lines = raw_headers.decode("latin-1").split("\r\n")
+            status = int(status_line.split(" ", 2)[1])
+            response_headers = {}
+            for line in header_lines:
+                if line:
+                    key, _, value = line.partition(":")
+                    response_headers[key.strip().lower()] = value.strip()
+
+            if method == "HEAD" or status in (204, 304):
+                pass
+            elif "content-length" in response_headers:
+                await self._reader.readexactly(int(response_headers["content-length"]))
+            elif response_headers.get("transfer-encoding") == "chunked":
+                while True:
+                    size = int((await self._reader.readline()).split(b";")[0], 16)
+                    await self._reader.readexactly(size + 2)
+                    if size == 0:
+                        break
+            else:
+                await self._reader.read()
+                response_headers["connection"] = "close"
+        except BaseException:
+            self.close()
+            raise
+
+        if response_headers.get("connection") == "close":
+            self.close()
+
+        return status
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+class LagSampler:
+    """
+    Samples the event loop lag by measuring how late short sleeps wake up.
+
+    :param interval: number of seconds to sleep between samples
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - start - self.interval, 0.0))
+
+    def pop_samples(self) -> list[float]:
+        """Return the samples collected so far, and start collecting new ones."""
+        samples, self.samples = self.samples, []
+        return samples
+
+
+def _web_component_classes() -> tuple[type[Component], ...]:
+    classes = []
+    for module_name, class_name in [
+        ("asphalt.web.asgi3", "ASGIComponent"),
+        ("asphalt.web.aiohttp", "AIOHTTPComponent"),
+    ]:
+        try:
+            classes.append(getattr(import_module(module_name), class_name))
+        except ImportError:
+            pass
+
+    return tuple(classes)
+
+
+def find_web_component(config: dict[str, Any]) -> dict[str, Any]:
+    """
+    Find the configuration of the web component in a component configuration tree.
+
+    The child components of container components are only looked up from their
+    ``components`` configuration.
+
+    :param config: the root component's configuration
+    :return: the web component's configuration dictionary (part of ``config``)
+    :raises LookupError: if there is no web component in the configuration
+
+    """
+    component_class = component_types.resolve(config.get("type"))
+    if isinstance(component_class, type) and issubclass(component_class, _web_component_classes()):
+        return config
+
+    for alias, child_config in dict(config.get("components") or {}).items():
+        child_config = dict(child_config or {})
+        child_config.setdefault("type", alias)
+        try:
+            web_config = find_web_component(child_config)
+        except LookupError:
+            continue
+
+        config["components"][alias] = child_config
+        return web_config
+
+    raise LookupError("no web component found in the configuration")
+
+
+def _find_web_component_instance(component: Component) -> Component:
+    if isinstance(component, _web_component_classes()):
+        return component
+    elif isinstance(component, ContainerComponent):
+        for child in component.child_components.values():
+            try:
+                return _find_web_component_instance(child)
+            except LookupError:
+                pass
+
+    raise LookupError("no web component found")
+
+
+async def start_web_component(
+    component_config: dict[str, Any], ctx: Context, **options: Any
+) -> Component:
+    """
+    Create the root component from its configuration and start it.
+
+    :param component_config: the configuration of the root component (which must be a
+        web component or contain one)
+    :param ctx: the context to start the component in
+    :param options: options to override in the web component's configuration (like
+        ``port``)
+    :return: the web component
+
+    """
+    component_config = deepcopy(component_config)
+    find_web_component(component_config).update(options)
+    root = component_types.create_object(**component_config)
+    await root.start(ctx)
+    return _find_web_component_instance(root)
+
+
+def _serve_worker(component_config: dict[str, Any], port: int, conn: Connection) -> None:
+    async def serve() -> None:
+        sampler = LagSampler()
+        async with Context() as ctx:
+            try:
+                await start_web_component(component_config, ctx, listen=True, port=port)
+            except BaseException:
+                conn.send(("error", traceback.format_exc()))
+                return
+
+            sampler_task = asyncio.create_task(sampler.run())
+            conn.send(("ready", None))
+            loop = asyncio.get_running_loop()
+            while True:
+                command = await loop.run_in_executor(None, conn.recv)
+                if command == "reset":
+                    sampler.pop_samples()
+                elif command == "report":
+                    conn.send(("lag", sampler.pop_samples()))
+                else:
+                    break
+
+            sampler_task.cancel()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(serve())
+
+
+class _Workers:
+    def __init__(self, component_config: dict[str, Any], ports: Sequence[int]) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.connections: list[Connection] = []
+        self.processes = []
+        for port in ports:
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_serve_worker,
+                args=(component_config, port, child_conn),
+                name=f"asphalt-web-bench-{port}",
+                daemon=True,
+            )
+            process.start()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+
+        for conn in self.connections:
+            status, payload = conn.recv()
+            if status == "error":
+                self.stop()
+                raise RuntimeError(f"a worker process failed to start:\n{payload}")
+
+    def reset_lag(self) -> None:
+        for conn in self.connections:
+            conn.send("reset")
+
+    def collect_lag(self) -> list[float]:
+        samples: list[float] = []
+        for conn in self.connections:
+            conn.send("report")
+            samples.extend(conn.recv()[1])
+
+        return samples
+
+    def stop(self) -> None:
+        for conn in self.connections:
+            try:
+                conn.send("stop")
+            except OSError:
+                pass
+
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+
+async def _run_stage(
+    spec: BenchmarkSpec, addresses: Sequence[tuple[str, int]], concurrency: int, seed: int
+) -> tuple[list[float], int, float]:
+    rng = Random(seed)
+    weights = [request.weight for request in spec.requests]
+    latencies: list[float] = []
+    errors = 0
+    measure_from = perf_counter() + spec.warmup
+    deadline = measure_from + spec.duration
+
+    async def client(address: tuple[str, int]) -> None:
+        nonlocal errors
+        connection = HTTPConnection(*address)
+        try:
+            while True:
+                request = rng.choices(spec.requests, weights)[0]
+                start = perf_counter()
+                if start >= deadline:
+                    return
+
+                try:
+                    status = await connection.request(
+                        request.path, request.method, request.body, request.headers
+                    )
+                except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status = 0
+
+                if start >= measure_from:
+                    latencies.append(perf_counter() - start)
+                    if not 100 <= status < 400:
+                        errors += 1
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(client(addresses[i % len(addresses)]) for i in range(concurrency)))
+    elapsed = perf_counter() - measure_from
+    latencies.sort()
+    return latencies, errors, elapsed
+
+
+async def _run_in_process(
+    component_config: dict[str, Any], spec: BenchmarkSpec, host: str, port: int
+) -> list[StageResult]:
+    results: list[StageResult] = []
+    async with Context() as ctx:
+        await start_web_component(component_config, ctx, listen=True, port=port)
+        address = (host, port)
+        sampler = LagSampler()
+        sampler_task = asyncio.create_task(sampler.run())
+        try:
+            for i, concurrency in enumerate(spec.concurrency):
+                stage = asyncio.create_task(_run_stage(spec, [address], concurrency, i))
+                await asyncio.sleep(spec.warmup)
+                sampler.pop_samples()
+                latencies, errors, elapsed = await stage
+                lag = sorted(sampler.pop_samples())
+                results.append(StageResult(concurrency, latencies, errors, elapsed, lag))
+        finally:
+            sampler_task.cancel()
+
+    return results
+
+
+async def _run_against_workers(
+    workers: _Workers, spec: BenchmarkSpec, addresses: Sequence[tuple[str, int]]
+) -> list[StageResult]:
+    loop = asyncio.get_running_loop()
+    results: list[StageResult] = []
+    for i, concurrency in enumerate(spec.concurrency):
+        stage = asyncio.create_task(_run_stage(spec, addresses, concurrency, i))
+        # Only sample the lag during the measured part of the stage
+        await asyncio.sleep(spec.warmup)
+        await loop.run_in_executor(None, workers.reset_lag)
+        latencies, errors, elapsed = await stage
+        lag = sorted(await loop.run_in_executor(None, workers.collect_lag))
+        results.append(StageResult(concurrency, latencies, errors, elapsed, lag))
+
+    return results
+
+
+def run_benchmark(
+    component_config: dict[str, Any],
+    spec: BenchmarkSpec,
+    *,
+    workers: int = 0,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+) -> list[StageResult]:
+    """
+    Start a web component and benchmark it.
+
+    With ``workers=0``, the component is started in the current process, sharing the
+    event loop with the load generator. Otherwise, the given number of worker processes
+    are started, each running its own copy of the component on its own port (``port``,
+    ``port + 1`` etc.), and the load generator spreads its connections evenly between
+    them.
+
+    :param component_config: the configuration of the root component (which must be a
+        web component or contain one)
+    :param spec: the benchmark specification
+    :param workers: number of worker processes to start
+    :param host: the address of the server(s), for the load generator (this does not
+        change the address the server binds to)
+    :param port: the port of the (first) server, overriding the configuration
+    :return: the results of each concurrency level
+
+    """
+    if workers <= 0:
+        return asyncio.run(_run_in_process(component_config, spec, host, port))
+
+    ports = [port + i for i in range(workers)]
+    worker_pool = _Workers(component_config, ports)
+    try:
+        addresses = [(host, worker_port) for worker_port in ports]
+        return asyncio.run(_run_against_workers(worker_pool, spec, addresses))
+    finally:
+        worker_pool.stop()
+
+
+def load_config(
+    configs: Sequence[Mapping[str, Any]], service: str | None = None
+) -> dict[str, Any]:
+    """
+    Merge Asphalt configuration documents and return the root component's configuration.
+
+    This resolves services the same way as the ``asphalt run`` command.
+
+    :param configs: the parsed configuration documents
+    :param service: name of the service to use, if the configuration has several
+    :raises LookupError: if the service cannot be determined
+
+    """
+    config: dict[str, Any] = {}
+    for document in configs:
+        config = merge_config(config, dict(document))
+
+    services = dict(config.pop("services", None) or {})
+    if "component" in config:
+        services.setdefault("default", {"component": config.pop("component")})
+
+    if service:
+        try:
+            service_config = services[service]
+        except KeyError:
+            raise LookupError(f"service {service!r} has not been defined") from None
+    elif len(services) == 1:
+        service_config = next(iter(services.values()))
+    elif "default" in services:
+        service_config = services["default"]
+    elif not services:
+        raise LookupError("no services have been defined")
+    else:
+        raise LookupError("multiple services have been defined, but none was selected")
+
+    config = merge_config(config, service_config)
+    return dict(config["component"])
+
+
+def apply_override(config: dict[str, Any], key: str, value: Any) -> None:
+    """
+    Set a value in a nested configuration dictionary.
+
+    :param config: the configuration dictionary
+    :param key: a dotted path to the value (dots can be escaped with a backslash)
+    :param value: the new value
+    :raises TypeError: if an intermediate value is not a dictionary
+
+    """
+    keys = [part.replace(r"\.", ".") for part in re.split(r"(?<!\\)\.", key)]
+    section = config
+    for part in keys[:-1]:
+        section = section.setdefault(part, {})
+        if not isinstance(section, dict):
+            raise TypeError(f"cannot set {key!r}: {part!r} is not a mapping")
+
+    section[keys[-1]] = value
+
+
+def format_results(results: Sequence[StageResult]) -> str:
+    """Format the benchmark results as a table."""
+    header = [
+        "concurrency",
+        "requests",
+        "req/s",
+        "p50 ms",
+        "p90 ms",
+        "p99 ms",
+        "max ms",
+        "errors",
+        "lag mean ms",
+        "lag max ms",
+    ]
+    rows = [header]
+    for result in results:
+        data = result.as_dict()
+        rows.append(
+            [
+                str(result.concurrency),
+                str(result.requests),
+                f"{result.throughput:.0f}",
+                *(f"{data['latency'][key] * 1000:.2f}" for key in ("p50", "p90", "p99", "max")),
+                f"{result.error_rate:.2%}",
+                f"{data['loop_lag']['mean'] * 1000:.2f}",
+                f"{data['loop_lag']['max'] * 1000:.2f}",
+            ]
+        )
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections.abc import Sequence
+from typing import Any
+
+from ruamel.yaml import YAML
+
+
+def load_component_config(args: argparse.Namespace, yaml: YAML) -> dict[str, Any]:
+    from .bench import apply_override, load_config
+
+    configs = []
+    for path in args.config:
+        with open(path) as f:
+            configs.append(yaml.load(f))
+
+    component_config = load_config(configs, args.service)
+    for override in args.set:
+        key, sep, value = override.partition("=")
+        if not sep:
+            raise ValueError(f"configuration must be set with '=', got: {override}")
+
+        apply_override(component_config, key, yaml.load(value))
+
+    return component_config
+
+
+def write_json(path: str, data: dict[str, Any]) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def bench(args: argparse.Namespace) -> None:
+    from .bench import BenchmarkSpec, format_results, run_benchmark
+
+    yaml = YAML(typ="safe")
+    try:
+        component_config = load_component_config(args, yaml)
+        with open(args.spec) as f:
+            spec = BenchmarkSpec.from_dict(yaml.load(f))
+    except (LookupError, TypeError, ValueError) as exc:
+        sys.exit(f"Error: {exc}")
+
+    results = run_benchmark(
+        component_config, spec, workers=args.workers, host=args.host, port=args.port
+    )
+    print(format_results(results))
+    if args.json:
+        write_json(
+            args.json,
+            {"workers": args.workers, "stages": [result.as_dict() for result in results]},
+        )
+
+
+def replay(args: argparse.Namespace) -> None:
+    from asphalt.core import Context
+
+    from .bench import start_web_component
+    from .recording import ReplayResult, load_recording, replay_into
+
+    try:
+        component_config = load_component_config(args, YAML(typ="safe"))
+    except (LookupError, TypeError, ValueError) as exc:
+        sys.exit(f"Error: {exc}")
+
+    async def run() -> ReplayResult:
+        async with Context() as ctx:
+            component = await start_web_component(component_config, ctx, listen=False)
+            return await replay_into(
+                component,
+                load_recording(args.recording),
+                speed=args.speed,
+                concurrency=args.concurrency,
+            )
+
+    result = asyncio.run(run())
+    data = result.as_dict()
+    print(
+        f"{result.requests} requests in {result.elapsed:.2f}s ({result.throughput:.0f} req/s), "
+        f"{result.errors} errors, {result.status_mismatches} status mismatches, "
+        f"{result.skipped} skipped"
+    )
+    for key, label in [("latency", "replayed"), ("original_latency", "original")]:
+        print(
+            f"{label:>8} latency (ms): "
+            + ", ".join(f"{stat} {data[key][stat] * 1000:.2f}" for stat in data[key])
+        )
+
+    if args.json:
+        write_json(args.json, data)
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("config", nargs="+", help="Asphalt configuration file(s)")
+    parser.add_argument(
+        "-s", "--service", help="service to run (if the configuration has several)"
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override a configuration option of the root component (like metrics={})",
+    )
+    parser.add_argument("--json", metavar="FILE", help="also write the results here")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="asphalt-web")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="benchmark a web component with a local load generator",
+        description="Start the web component from the given Asphalt configuration files and "
+        "send it the requests from the benchmark specification at each concurrency level.",
+    )
+    add_config_arguments(bench_parser)
+    bench_parser.add_argument(
+        "-b", "--spec", required=True, help="benchmark specification file (YAML or JSON)"
+    )
+    bench_parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=0,
+        help="number of worker processes to run the component in (default: run it in the "
+        "load generator's process)",
+    )
+    bench_parser.add_argument(
+        "--host", default="127.0.0.1", help="address the load generator connects to"
+    )
+    bench_parser.add_argument(
+        "-p", "--port", type=int, default=8000, help="port of the (first) server"
+    )
+    bench_parser.set_defaults(func=bench)
+
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="replay recorded traffic into a web component",
+        description="Start the web component from the given Asphalt configuration files "
+        "(without a server) and replay the recorded requests into it.",
+    )
+    add_config_arguments(replay_parser)
+    replay_parser.add_argument(
+        "-r", "--recording", required=True, help="the recording file to replay"
+    )
+    replay_parser.add_argument(
+        "--speed",
+        type=float,
+        help="replay at the original timing, sped up by this factor (default: as fast as "
+        "possible)",
+    )
+    replay_parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=1,
+        help="requests in flight when replaying as fast as possible (default: 1)",
+    )
+    replay_parser.set_defaults(func=replay)
+    args = parser.parse_args(argv)
+
+    # Like "python -m", make modules in the working directory importable
+    sys.path.insert(0, os.getcwd())
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import re
+from asyncio import TimeoutError, wait_for
+from collections.abc import Sequence
+from dataclasses import dataclass
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from asphalt.core import Context, current_context
+
+from ._utils import get_header, send_response
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGISendCallable,
+        ASGISendEvent,
+        Scope,
+    )
+
+grpc_timeout_re = re.compile(r"(\d{1,8})([HMSmun])")
+grpc_timeout_units = {
+    "H": 3600.0,
+    "M": 60.0,
+    "S": 1.0,
+    "m": 0.001,
+    "u": 0.000001,
+    "n": 0.000000001,
+}
+
+
+class Deadline:
+    """
+    The time budget of a request.
+
+    This is available as a resource in the request context when a deadline middleware
+    is in use, and lets code resolved during the request (like database or HTTP clients)
+    avoid starting work the client is no longer waiting for.
+
+    :param timeout: the number of seconds from now until the deadline
+    """
+
+    __slots__ = "expires_at"
+
+    def __init__(self, timeout: float) -> None:
+        #: the deadline as a :func:`~time.monotonic` timestamp
+        self.expires_at = monotonic() + timeout
+
+    @property
+    def remaining(self) -> float:
+        """The number of seconds left until the deadline (never negative)."""
+        return max(self.expires_at - monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        """``True`` if the deadline has passed, ``False`` otherwise."""
+        return monotonic() >= self.expires_at
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(remaining={self.remaining:.3f})"
+
+
+def parse_timeout(value: str) -> float | None:
+    """
+    Parse a timeout from a header value.
+
+    The value can be either a number of seconds (like ``2.5``) or a timeout in the
+    `gRPC format <https://grpc.io/docs/guides/deadlines/>`_ (like ``2500m``).
+
+    :param value: the header value
+    :return: the timeout in seconds, or ``None`` if the value could not be parsed
+
+    """
+    match = grpc_timeout_re.fullmatch(value.strip())
+    if match:
+        return int(match.group(1)) * grpc_timeout_units[match.group(2)]
+
+    try:
+        timeout = float(value)
+    except ValueError:
+        return None
+
+    return timeout if timeout >= 0 else None
+
+
+def resolve_timeout(
+    header_values: Sequence[str | None],
+    timeout: float | None = None,
+    max_timeout: float | None = None,
+) -> float | None:
+    """
+    Determine the effective timeout of a request.
+
+    The first valid header value is used if there is one, and ``timeout`` otherwise.
+    Either way, the result is capped at ``max_timeout``.
+
+    :param header_values: values of the timeout headers (``None`` for missing headers)
+    :param timeout: the default timeout
+    :param max_timeout: the maximum timeout
+    :return: the timeout in seconds, or ``None`` if the request has no deadline
+
+    """
+    effective_timeout = timeout
+    for value in header_values:
+        if value is not None:
+            parsed = parse_timeout(value)
+            if parsed is not None:
+                effective_timeout = parsed
+                break
+
+    if max_timeout is not None and (effective_timeout is None or effective_timeout > max_timeout):
+        return max_timeout
+
+    return effective_timeout
+
+
+@dataclass
+class DeadlineMiddleware:
+    """
+    ASGI middleware that enforces a deadline on HTTP requests.
+
+    The timeout is read from the first of the given headers present in the request,
+    falling back to ``timeout``. Each HTTP request with a timeout gets a
+    :class:`Deadline` resource in its request context. If the application has not
+    finished by the deadline, it is cancelled and the client receives a 504 response
+    (unless the response had already been started).
+
+    This middleware is meant to run within the request context, so it should be added
+    via the ``deadlines`` option of the web components rather than as a regular
+    middleware. Outside of a request context (as with Django, where the Asphalt
+    middleware lives in Django's own middleware stack), it creates a context of its own
+    for the deadline.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param timeout: the default timeout (in seconds) for requests that don't specify one
+        (``None`` = no deadline)
+    :param max_timeout: the maximum timeout (in seconds) a client can request
+    :param headers: names of the headers to read the timeout from
+    """
+
+    app: ASGI3Application
+    timeout: float | None = None
+    max_timeout: float | None = None
+    headers: Sequence[str] = ("x-request-deadline", "grpc-timeout")
+
+    def __post_init__(self) -> None:
+        # Imported here, as the aiohttp integration uses this module without asgiref
+        from asgiref.typing import HTTPScope
+
+        self._headers = [header.lower().encode("latin-1") for header in self.headers]
+        self._scope_type = HTTPScope
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header_values = []
+        for header in self._headers:
+            value = get_header(scope, header)
+            header_values.append(value.decode("latin-1") if value is not None else None)
+
+        timeout = resolve_timeout(header_values, self.timeout, self.max_timeout)
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def wrapped_send(event: ASGISendEvent) -> None:
+            nonlocal response_started
+            if event["type"] == "http.response.start":
+                response_started = True
+
+            await send(event)
+
+        deadline = Deadline(timeout)
+
+        async def run() -> None:
+            try:
+                await wait_for(self.app(scope, receive, wrapped_send), timeout)
+            except TimeoutError:
+                if response_started or not deadline.expired:
+                    raise
+
+                await send_response(send, 504, b"Gateway Timeout")
+
+        ctx = current_context()
+        if ctx.get_resource(self._scope_type) is not None:
+            ctx.add_resource(deadline)
+            await run()
+        else:
+            # Not within a request context, so the deadline needs a context of its own
+            async with Context() as ctx:
+                ctx.add_resource(deadline)
+                await run()
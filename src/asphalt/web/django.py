@@ -1,30 +1,41 @@
 from __future__ import annotations
 
 from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
 
 from asgiref.typing import ASGI3Application, HTTPScope
 from asphalt.core import Context
-from django.core.handlers.asgi import ASGIHandler, ASGIRequest
-from django.http import HttpRequest, HttpResponse
 from django.utils.decorators import async_only_middleware
 
 from .asgi3 import ASGIComponent
 
+if TYPE_CHECKING:
+    # The request handling machinery of Django is only imported when needed
+    from django.core.handlers.asgi import ASGIHandler
+    from django.http import HttpRequest, HttpResponse
+
 
 @async_only_middleware
 def AsphaltMiddleware(get_response: Callable[[HttpRequest], Awaitable[HttpResponse]]):
+    from django.core.handlers.asgi import ASGIRequest
+
     async def middleware(request: HttpRequest) -> HttpResponse:
         async with Context() as ctx:
             ctx.add_resource(request)
             if isinstance(request, ASGIRequest):
                 ctx.add_resource(request.scope, types=[HTTPScope])
 
-            return await get_response(request)
+            response = await get_response(request)
+            if isinstance(request, ASGIRequest) and request.resolver_match is not None:
+                # Make the route template available to outer ASGI middleware
+                request.scope["path_template"] = "/" + request.resolver_match.route
+
+            return response
 
     return middleware
 
 
-class DjangoComponent(ASGIComponent[ASGIHandler]):
+class DjangoComponent(ASGIComponent["ASGIHandler"]):
     """
     A component that serves a Django application.
 
@@ -33,8 +44,24 @@ class DjangoComponent(ASGIComponent[ASGIHandler]):
     :param port: the port to bind to
     :param middlewares: list of callables or dicts to be added as middleware using
         :meth:`add_middleware`
+
+    The ``profiling`` and ``leak_detection`` options are not supported, as the request
+    contexts are created by Django's own middleware stack, and these features would thus
+    run outside of them.
     """
 
+    def __init__(
+        self, components: dict[str, dict[str, Any] | None] | None = None, **kwargs: Any
+    ) -> None:
+        for option in ("profiling", "leak_detection"):
+            if kwargs.get(option) is not None:
+                raise ValueError(
+                    f"the {option} option is not supported with Django, as it would run "
+                    "outside the request context"
+                )
+
+        super().__init__(components, **kwargs)
+
     def setup_asphalt_middleware(self, app: ASGIHandler) -> ASGI3Application:
         # In Django, the middleware must be explicitly added to MIDDLEWARE in
         # settings.py
@@ -2,21 +2,31 @@ from __future__ import annotations
 
 from collections.abc import Callable, Sequence
 from dataclasses import dataclass, field
-from inspect import Signature, signature
-from typing import Any, get_type_hints
+from functools import partial
+from typing import TYPE_CHECKING, Any, get_type_hints
 
-from asgiref.typing import ASGI3Application
-from asphalt.core import Context, require_resource, resolve_reference
-from fastapi import Depends, FastAPI
-from fastapi.routing import APIRoute, APIWebSocketRoute
+from asgiref.typing import ASGI3Application, HTTPScope, WebSocketScope
+from asphalt.core import (
+    Context,
+    ResourceNotFound,
+    qualified_name,
+    require_resource,
+    resolve_reference,
+)
 
+from ._utils import get_shared_resource
 from .asgi3 import ASGIComponent
 from .starlette import AsphaltMiddleware
 
+if TYPE_CHECKING:
+    # FastAPI (with Pydantic) is slow to import, so it's only imported when needed
+    from fastapi import FastAPI
+
 
 @dataclass
 class _AsphaltDependency:
     name: str
+    request_scoped: bool = False
     cls: type = field(init=False)
 
     async def __call__(self):
@@ -32,20 +42,116 @@ class _AsphaltDependency:
         return NotImplemented
 
 
-def AsphaltDepends(name: str = "default") -> Any:
+@dataclass(eq=False)
+class _BoundAsphaltDependency:
+    """Provides a resource that was looked up from the root context during startup."""
+
+    dependency: _AsphaltDependency
+    value: Any
+
+    async def __call__(self):
+        return self.value
+
+
+def _get_request_scoped_types() -> set[type]:
+    from starlette.requests import Request
+
+    from .deadline import Deadline
+    from .memo import RequestMemo
+    from .tracing import Span
+
+    return {HTTPScope, WebSocketScope, Request, Deadline, Span, RequestMemo}
+
+
+async def _bind_dependency(
+    dependency: _AsphaltDependency, request_scoped_types: set[type]
+) -> Callable[[], Any]:
+    if dependency.request_scoped or dependency.cls in request_scoped_types:
+        return dependency
+
+    value = await get_shared_resource(dependency.cls, dependency.name)
+    if value is None:
+        return dependency
+
+    return _BoundAsphaltDependency(dependency, value)
+
+
+class _AnnotationResolver:
+    """
+    Resolves the type annotations of endpoint parameters during startup.
+
+    Unlike :func:`typing.get_type_hints`, this only evaluates the annotations that are
+    asked for, caches them per function (as the same endpoint may serve several routes),
+    and evaluates each string annotation (as with ``from __future__ import annotations``)
+    only once per module.
+
+    """
+
+    def __init__(self) -> None:
+        self._by_function: dict[tuple[Callable[..., Any], str], Any] = {}
+        self._by_module: dict[tuple[int, str], Any] = {}
+
+    def resolve(self, func: Callable[..., Any], name: str) -> Any:
+        key = (func, name)
+        try:
+            return self._by_function[key]
+        except KeyError:
+            pass
+
+        annotations = getattr(func, "__annotations__", None)
+        if not isinstance(annotations, dict):
+            annotation = get_type_hints(func)[name]
+        else:
+            annotation = annotations[name]
+            if isinstance(annotation, str):
+                # Look up the globals the same way as get_type_hints() does
+                namespace_owner = func
+                while hasattr(namespace_owner, "__wrapped__"):
+                    namespace_owner = namespace_owner.__wrapped__
+
+                globalns = getattr(namespace_owner, "__globals__", {})
+                module_key = (id(globalns), annotation)
+                try:
+                    annotation = self._by_module[module_key]
+                except KeyError:
+                    annotation = self._by_module[module_key] = eval(annotation, globalns)
+
+            # Strip Annotated[] like get_type_hints() does
+            if hasattr(annotation, "__metadata__"):
+                annotation = annotation.__origin__
+
+        self._by_function[key] = annotation
+        return annotation
+
+
+def AsphaltDepends(name: str = "default", *, request_scoped: bool = False) -> Any:
     """
     Asphalt's version of FastAPI's :func:`~fastapi.Depends`.
 
     This should be marked as the default value on a parameter that should receive an
     Asphalt resource.
 
+    Resources from the root context are looked up once when the component starts, and
+    then passed to every request as is. These must already be available by then (so they
+    should be provided by child components of the web component, or by components started
+    before it).
+    Resources added by the component itself to each request context (the ASGI scope, the
+    request, the deadline, the tracing span and the request memo), and resources
+    provided by resource factories, are looked up separately for each request. To tell
+    these factories apart from shared resources, they're called twice during startup, in
+    temporary contexts.
+
     :param name: the name of the resource within its unique type
+    :param request_scoped: ``True`` to look up the resource separately for each request,
+        for resources that some middleware adds to the request context
 
     """
-    return Depends(_AsphaltDependency(name))
+    from fastapi import Depends
 
+    return Depends(_AsphaltDependency(name, request_scoped))
 
-class FastAPIComponent(ASGIComponent[FastAPI]):
+
+class FastAPIComponent(ASGIComponent["FastAPI"]):
     """
     A component that serves a FastAPI application.
 
@@ -58,6 +164,8 @@ class FastAPIComponent(ASGIComponent[FastAPI]):
         ignored if an application object is explicitly passed in)
     :param middlewares: list of callables or dicts to be added as middleware using
         :meth:`add_middleware`
+    :param kwargs: further keyword arguments passed to
+        :class:`~asphalt.web.asgi3.ASGIComponent`
     """
 
     def __init__(
@@ -69,7 +177,10 @@ class FastAPIComponent(ASGIComponent[FastAPI]):
         port: int = 8000,
         debug: bool | None = None,
         middlewares: Sequence[Callable[..., ASGI3Application] | dict[str, Any]] = (),
+        **kwargs: Any,
     ) -> None:
+        from fastapi import FastAPI
+
         debug = debug if isinstance(debug, bool) else __debug__
         super().__init__(
             components,
@@ -77,6 +188,7 @@ class FastAPIComponent(ASGIComponent[FastAPI]):
             host=host,
             port=port,
             middlewares=middlewares,
+            **kwargs,
         )
 
     def setup_asphalt_middleware(self, app: FastAPI) -> ASGI3Application:
@@ -102,32 +214,65 @@ class FastAPIComponent(ASGIComponent[FastAPI]):
             if not callable(type_):
                 raise TypeError(f"Middleware ({type_}) is not callable")
 
-            self.app.add_middleware(type_, **middleware)
+            factory: Callable[..., ASGI3Application] = partial(type_, **middleware)
         elif callable(middleware):
-            self.app.add_middleware(middleware)
+            factory = middleware
         else:
             raise TypeError(f"middleware must be either a callable or a dict, not {middleware!r}")
 
+        if self.layer_timing:
+            factory = self.layer_timing.wrap_factory(factory)
+
+        self.app.add_middleware(factory)
+
     async def start_server(self, ctx: Context) -> None:
+        from fastapi import FastAPI
+        from fastapi.routing import APIRoute, APIWebSocketRoute
+
         # Convert Asphalt dependencies into FastAPI dependencies
-        for route in self.original_app.router.routes:
-            if isinstance(route, (APIRoute, APIWebSocketRoute)):
-                sig: Signature | None = None
-                type_hints: dict[str, Any]
-                for dependency in route.dependant.dependencies:
-                    if isinstance(dependency.call, _AsphaltDependency):
-                        if sig is None:
-                            sig = signature(route.endpoint)
-                            type_hints = get_type_hints(route.endpoint)
-
-                        try:
-                            annotation = type_hints[dependency.name]
-                        except KeyError:
-                            raise TypeError(
-                                f"Dependency {dependency.name!r} in endpoint "
-                                f"{route.path} is missing a type annotation"
-                            ) from None
-
-                        dependency.call.cls = annotation
+        apps = [self.original_app]
+        if self.mirror and isinstance(self.mirror.app, FastAPI):
+            apps.append(self.mirror.app)
+
+        resolver = _AnnotationResolver()
+        request_scoped_types = _get_request_scoped_types()
+        for route in (route for app in apps for route in app.router.routes):
+            if not isinstance(route, (APIRoute, APIWebSocketRoute)):
+                continue
+
+            # Asphalt dependencies may also be parameters of other dependencies
+            dependants = [route.dependant]
+            while dependants:
+                dependant = dependants.pop()
+                for dependency in dependant.dependencies:
+                    if isinstance(dependency.call, _BoundAsphaltDependency):
+                        # The application was already set up by an earlier start
+                        asphalt_dependency = dependency.call.dependency
+                    elif isinstance(dependency.call, _AsphaltDependency):
+                        asphalt_dependency = dependency.call
+                    else:
+                        dependants.append(dependency)
+                        continue
+
+                    assert dependant.call is not None
+                    try:
+                        annotation = resolver.resolve(dependant.call, dependency.name)
+                    except KeyError:
+                        raise TypeError(
+                            f"Dependency {dependency.name!r} in endpoint "
+                            f"{route.path} is missing a type annotation"
+                        ) from None
+
+                    asphalt_dependency.cls = annotation
+                    try:
+                        dependency.call = await _bind_dependency(
+                            asphalt_dependency, request_scoped_types
+                        )
+                    except ResourceNotFound:
+                        raise LookupError(
+                            f"Dependency {dependency.name!r} in endpoint {route.path} "
+                            f"requires a resource of type {qualified_name(annotation)} "
+                            f"named {asphalt_dependency.name!r}, but none is available"
+                        ) from None
 
         await super().start_server(ctx)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+import logging
+from asyncio import Task, create_task, shield, wait_for
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from inspect import isawaitable
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Union
+
+from asphalt.core import resolve_reference
+
+from ._utils import send_response
+
+if TYPE_CHECKING:
+    from asgiref.typing import ASGI3Application, ASGIReceiveCallable, ASGISendCallable, Scope
+
+logger = logging.getLogger(__name__)
+
+HealthCheck = Callable[[], Union[bool, None, Awaitable[Union[bool, None]]]]
+
+
+class HealthChecker:
+    """
+    Tracks the health of a web component.
+
+    The *liveness* endpoint always responds with 200 as long as the server is able to
+    respond at all. The *readiness* endpoint responds with 200 only while the component
+    is serving requests (between the server starting and the component being shut down)
+    and all the health checks pass, and with 503 otherwise.
+
+    A health check is a callable taking no arguments that returns (or asynchronously
+    returns) ``False`` or raises an exception to signal a failure. The results of the
+    checks are cached for ``cache_ttl`` seconds, and concurrent probes share the same
+    check run, so frequent probing does not multiply the load on the checked services.
+
+    :param liveness_path: the path of the liveness endpoint
+    :param readiness_path: the path of the readiness endpoint
+    :param checks: dictionary of check name ⭢ callable (or a module:varname reference to
+        one)
+    :param cache_ttl: number of seconds to cache the health check results for
+    :param check_timeout: maximum number of seconds to wait for an asynchronous check to
+        finish before considering it failed
+    """
+
+    def __init__(
+        self,
+        *,
+        liveness_path: str = "/livez",
+        readiness_path: str = "/readyz",
+        checks: dict[str, HealthCheck | str] | None = None,
+        cache_ttl: float = 1.0,
+        check_timeout: float = 5.0,
+    ) -> None:
+        self.liveness_path = liveness_path
+        self.readiness_path = readiness_path
+        self.cache_ttl = cache_ttl
+        self.check_timeout = check_timeout
+        #: ``True`` while the component is serving requests
+        self.ready = False
+        self._checks: dict[str, HealthCheck] = {}
+        self._cached_results: dict[str, str] = {}
+        self._cached_at = float("-inf")
+        self._pending: Task[dict[str, str]] | None = None
+        for name, check in (checks or {}).items():
+            self.add_check(name, resolve_reference(check))
+
+    def add_check(self, name: str, check: HealthCheck) -> None:
+        """
+        Add a health check.
+
+        :param name: a unique name for the check
+        :param check: a callable taking no arguments
+
+        """
+        if not callable(check):
+            raise TypeError(f"Health check ({check!r}) is not callable")
+
+        self._checks[name] = check
+        self._cached_at = float("-inf")
+
+    async def _run_check(self, name: str, check: HealthCheck) -> str:
+        try:
+            result = check()
+            if isawaitable(result):
+                result = await wait_for(result, self.check_timeout)
+        except Exception as exc:
+            logger.warning("Health check %r failed", name, exc_info=True)
+            return f"failed: {exc.__class__.__name__}"
+
+        return "failed" if result is False else "ok"
+
+    async def _run_checks(self) -> dict[str, str]:
+        results = {}
+        for name, check in list(self._checks.items()):
+            results[name] = await self._run_check(name, check)
+
+        return results
+
+    async def _refresh(self) -> dict[str, str]:
+        try:
+            results = await self._run_checks()
+            self._cached_results = results
+            self._cached_at = monotonic()
+            return results
+        finally:
+            self._pending = None
+
+    async def check(self) -> dict[str, str]:
+        """
+        Return the results of the health checks, running them if the cached results
+        have expired.
+
+        :return: a dictionary of check name ⭢ ``ok`` or a failure description
+
+        """
+        if monotonic() - self._cached_at < self.cache_ttl:
+            return self._cached_results
+
+        if self._pending is None:
+            self._pending = create_task(self._refresh())
+
+        return await shield(self._pending)
+
+    async def is_ready(self) -> tuple[bool, dict[str, str]]:
+        """
+        Determine whether the component is ready to serve requests.
+
+        :return: a tuple of (readiness, health check results)
+
+        """
+        if not self.ready:
+            return False, {}
+        elif not self._checks:
+            return True, {}
+
+        results = await self.check()
+        return all(result == "ok" for result in results.values()), results
+
+
+def render_readiness(ready: bool, results: dict[str, Any]) -> bytes:
+    status = "ok" if ready else "unavailable"
+    return json.dumps({"status": status, "checks": results}).encode()
+
+
+@dataclass
+class HealthMiddleware:
+    """
+    ASGI middleware that answers liveness and readiness probes.
+
+    Probe requests are answered directly by this middleware, without passing them to
+    the wrapped application.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param checker: the health checker to use
+    """
+
+    app: ASGI3Application
+    checker: HealthChecker
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path == self.checker.liveness_path:
+                await send_response(send, 200, b'{"status": "ok"}', b"application/json")
+                return
+            elif path == self.checker.readiness_path:
+                ready, results = await self.checker.is_ready()
+                body = render_readiness(ready, results)
+                await send_response(send, 200 if ready else 503, body, b"application/json")
+                return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import Callable
+from functools import wraps
+from inspect import Parameter, iscoroutinefunction, signature
+from typing import Any, Tuple, TypeVar, Union, get_args, get_origin, get_type_hints
+
+from asphalt.core import ResourceNotFound, current_context, resource
+
+if sys.version_info >= (3, 10):
+    from types import UnionType
+else:
+    UnionType = Union
+
+T_Callable = TypeVar("T_Callable", bound=Callable[..., Any])
+
+#: The type of the markers returned by :func:`asphalt.core.resource`
+_ResourceMarker = type(resource())
+
+
+#: A precompiled resource lookup: (parameter name, (resource type, resource name), optional)
+_Lookup = Tuple[str, Tuple[type, str], bool]
+
+
+def _compile_lookups(
+    func: Callable[..., Any], names: dict[str, str], localns: dict[str, Any]
+) -> tuple[_Lookup, ...]:
+    type_hints = get_type_hints(func, localns=localns)
+    lookups: list[_Lookup] = []
+    for argname, resource_name in names.items():
+        cls = type_hints[argname]
+        optional = False
+        if get_origin(cls) in (Union, UnionType):
+            args = [arg for arg in get_args(cls) if arg is not type(None)]
+            if len(args) != 1:
+                raise TypeError(
+                    f"Parameter {argname!r} of {func.__qualname__}: unions are only valid "
+                    f"for resources when there are exactly two items and the other is None"
+                )
+
+            cls, optional = args[0], True
+
+        lookups.append((argname, (cls, resource_name), optional))
+
+    return tuple(lookups)
+
+
+def inject_resources(func: T_Callable) -> T_Callable:
+    """
+    Inject Asphalt resources into the parameters of a request handler.
+
+    This works like :func:`asphalt.core.inject` (parameters with
+    :func:`~asphalt.core.resource` as the default value receive the resource matching
+    their type annotation), but the type annotations are resolved when the function is
+    decorated (or on the first call, if the annotations refer to names that aren't yet
+    defined at that point), so mistakes in them are reported early, and each call only
+    looks up the resources.
+
+    Resources annotated as optional (``SomeType | None``) receive ``None`` if the
+    resource is not available.
+
+    :param func: a request handler (a coroutine function or a regular function)
+    :return: the wrapped function
+
+    """
+    names: dict[str, str] = {}
+    for param in signature(func).parameters.values():
+        if isinstance(param.default, _ResourceMarker):
+            if param.kind is Parameter.POSITIONAL_ONLY:
+                raise TypeError(
+                    f"Cannot inject a resource to the positional-only parameter "
+                    f"{param.name!r} of {func.__qualname__}"
+                )
+            elif param.annotation is Parameter.empty:
+                raise TypeError(
+                    f"Parameter {param.name!r} of {func.__qualname__} is missing a type annotation"
+                )
+
+            names[param.name] = param.default.name
+
+    localns = sys._getframe(1).f_locals if "<locals>" in func.__qualname__ else {}
+    try:
+        lookups = _compile_lookups(func, names, localns)
+    except NameError:
+        # Retry on the first call, when the forward references can hopefully be resolved
+        lookups = None
+
+    def get_lookups() -> tuple[_Lookup, ...]:
+        nonlocal lookups, localns
+        if lookups is None:
+            lookups = _compile_lookups(func, names, localns)
+            localns = {}
+
+        return lookups
+
+    if iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            ctx = current_context()
+            for argname, key, optional in lookups or get_lookups():
+                value = ctx.get_resource(*key)
+                if value is None and not optional:
+                    raise ResourceNotFound(*key)
+
+                kwargs[argname] = value
+
+            return await func(*args, **kwargs)
+
+        return async_wrapper  # type: ignore[return-value]
+
+    @wraps(func)
+    def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+        ctx = current_context()
+        for argname, key, optional in lookups or get_lookups():
+            value = ctx.get_resource(*key)
+            if value is None and not optional:
+                raise ResourceNotFound(*key)
+
+            kwargs[argname] = value
+
+        return func(*args, **kwargs)
+
+    return sync_wrapper  # type: ignore[return-value]
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import json
+from collections import deque
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from inspect import isfunction
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+from asphalt.core import callable_name, qualified_name
+
+from ._utils import send_response
+
+if TYPE_CHECKING:
+    from asgiref.typing import ASGI3Application, ASGIReceiveCallable, ASGISendCallable, Scope
+
+
+@dataclass
+class LayerStats:
+    """
+    Aggregated timings of a single middleware layer.
+
+    *Inclusive* time is the time spent in the layer and everything it wraps, while
+    *exclusive* time is the time spent in the layer itself, excluding the inner layers.
+
+    :ivar name: the name of the layer
+    :ivar count: number of requests that passed through the layer
+    :ivar total_inclusive: sum of the inclusive times (in seconds)
+    :ivar total_exclusive: sum of the exclusive times (in seconds)
+    :ivar max_inclusive: longest inclusive time (in seconds)
+    :ivar max_exclusive: longest exclusive time (in seconds)
+    """
+
+    name: str
+    count: int = 0
+    total_inclusive: float = 0.0
+    total_exclusive: float = 0.0
+    max_inclusive: float = 0.0
+    max_exclusive: float = 0.0
+
+    def record(self, inclusive: float, exclusive: float) -> None:
+        self.count += 1
+        self.total_inclusive += inclusive
+        self.total_exclusive += exclusive
+        if inclusive > self.max_inclusive:
+            self.max_inclusive = inclusive
+        if exclusive > self.max_exclusive:
+            self.max_exclusive = exclusive
+
+    @property
+    def mean_inclusive(self) -> float:
+        return self.total_inclusive / self.count if self.count else 0.0
+
+    @property
+    def mean_exclusive(self) -> float:
+        return self.total_exclusive / self.count if self.count else 0.0
+
+
+class _Frame:
+    __slots__ = "child_time", "timings"
+
+    def __init__(self, timings: list[tuple[str, float, float]]) -> None:
+        self.child_time = 0.0
+        self.timings = timings
+
+
+_current_frame: ContextVar[_Frame | None] = ContextVar("_current_frame", default=None)
+
+
+@dataclass
+class TimedLayer:
+    """
+    Wraps an ASGI application and records the time spent in it.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param stats: the statistics object to record the timings to
+    :param report: the report the layer belongs to
+    """
+
+    app: ASGI3Application
+    stats: LayerStats
+    report: LayerTimingReport
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        parent = _current_frame.get()
+        frame = _Frame(parent.timings if parent is not None else [])
+        token = _current_frame.set(frame)
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            inclusive = perf_counter() - start
+            exclusive = inclusive - frame.child_time
+            _current_frame.reset(token)
+            self.stats.record(inclusive, exclusive)
+            frame.timings.append((self.stats.name, inclusive, exclusive))
+            if parent is not None:
+                parent.child_time += inclusive
+            else:
+                # This is the outermost layer, so the request is done
+                frame.timings.reverse()
+                self.report.recent.append(frame.timings)
+
+
+class LayerTimingReport:
+    """
+    Collects the time spent in each layer of a middleware stack.
+
+    Each layer added to the stack (including the Asphalt middleware and the application
+    itself) is wrapped in a :class:`TimedLayer` that records its inclusive and exclusive
+    time for each request.
+
+    :param path: if set, serve the report as JSON on this path
+    :param max_recent: number of most recent per-request breakdowns to keep
+
+    :ivar list[LayerStats] layers: statistics for each layer, in the order the layers
+        were added to the stack (innermost first)
+    :ivar recent: per-request breakdowns for the most recent requests, each as a list of
+        (layer name, inclusive time, exclusive time) tuples, outermost layer first
+    """
+
+    def __init__(self, *, path: str | None = None, max_recent: int = 100) -> None:
+        self.path = path
+        self.layers: list[LayerStats] = []
+        self.recent: deque[list[tuple[str, float, float]]] = deque(maxlen=max_recent)
+
+    def wrap(self, app: ASGI3Application, name: str | None = None) -> TimedLayer:
+        """
+        Wrap an ASGI application (or middleware) in a timed layer.
+
+        :param app: the application to wrap
+        :param name: the name of the layer (defaults to the qualified name of ``app`` if
+            it's a function, or of its type otherwise)
+
+        """
+        if name is None:
+            name = callable_name(app) if isfunction(app) else qualified_name(app)
+
+        stats = LayerStats(name)
+        self.layers.append(stats)
+        return TimedLayer(app, stats, self)
+
+    def wrap_factory(
+        self, factory: Callable[..., ASGI3Application]
+    ) -> Callable[..., ASGI3Application]:
+        """
+        Wrap a middleware factory so that the middleware it creates is wrapped in a timed
+        layer.
+
+        :param factory: a callable that takes the application object and returns an ASGI
+            3.0 application
+
+        """
+
+        def wrapper(app: ASGI3Application) -> ASGI3Application:
+            return self.wrap(factory(app))
+
+        return wrapper
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the report as a JSON compatible dictionary."""
+        return {
+            "layers": [
+                {
+                    "name": stats.name,
+                    "count": stats.count,
+                    "mean_inclusive": stats.mean_inclusive,
+                    "mean_exclusive": stats.mean_exclusive,
+                    "max_inclusive": stats.max_inclusive,
+                    "max_exclusive": stats.max_exclusive,
+                }
+                for stats in reversed(self.layers)
+            ],
+            "recent": [
+                [
+                    {"name": name, "inclusive": inclusive, "exclusive": exclusive}
+                    for name, inclusive, exclusive in timings
+                ]
+                for timings in self.recent
+            ],
+        }
+
+
+@dataclass
+class LayerTimingEndpoint:
+    """
+    ASGI middleware that serves a :class:`LayerTimingReport` as JSON on its configured
+    path.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param report: the report to serve
+    """
+
+    app: ASGI3Application
+    report: LayerTimingReport
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] == "http" and scope["path"] == self.report.path:
+            body = json.dumps(self.report.as_dict()).encode()
+            await send_response(send, 200, body, b"application/json")
+        else:
+            await self.app(scope, receive, send)
@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import gc
+import json
+import logging
+from asyncio import sleep
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from time import monotonic
+from types import CoroutineType, FrameType
+from typing import TYPE_CHECKING, Any
+from weakref import ReferenceType, ref
+
+from asphalt.core import Context, current_context, qualified_name
+
+from ._utils import get_route_template, send_response
+
+if TYPE_CHECKING:
+    from asgiref.typing import ASGI3Application, ASGIReceiveCallable, ASGISendCallable, Scope
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LeakOffender:
+    """
+    A request context, or a resource of one, that stayed alive for too long after the
+    response was sent.
+
+    :ivar kind: ``context`` or ``resource``
+    :ivar description: a description of the object
+    :ivar route: the route template (or path) of the request
+    :ivar age: number of seconds since the response was sent, at the time of detection
+    :ivar referrers: chains of objects referring to the object, each starting from the
+        direct referrer
+    """
+
+    kind: str
+    description: str
+    route: str
+    age: float
+    referrers: list[list[str]] = field(default_factory=list)
+
+
+class _TrackedContext:
+    __slots__ = "context_ref", "route", "finished_at", "resource_refs", "reported"
+
+    def __init__(self, ctx: Context, route: str) -> None:
+        self.context_ref = ref(ctx)
+        self.route = route
+        self.finished_at: float | None = None
+        self.resource_refs: list[tuple[str, ReferenceType[Any]]] = []
+        self.reported = False
+
+
+def _get_resources(ctx: Context) -> list[Any]:
+    # Asphalt has no public API for listing the resources added to a specific context, so
+    # this relies on its internals (and raises AttributeError if they've changed)
+    return [
+        container.value_or_factory
+        for container in set(ctx._resources.values())
+        if not container.is_factory
+    ]
+
+
+def _describe(obj: Any) -> str:
+    if isinstance(obj, FrameType):
+        code = obj.f_code
+        return f"frame of {code.co_name} ({code.co_filename}:{obj.f_lineno})"
+    elif isinstance(obj, CoroutineType):
+        return f"coroutine {obj.__qualname__}"
+
+    try:
+        text = repr(obj)
+    except Exception:
+        text = "<repr failed>"
+
+    if len(text) > 100:
+        text = text[:97] + "..."
+
+    return f"{qualified_name(obj)}: {text}"
+
+
+def find_referrer_chains(obj: Any, max_depth: int = 3, max_chains: int = 5) -> list[list[str]]:
+    """
+    Find out what is keeping the given object alive.
+
+    :param obj: the object to find the referrers of
+    :param max_depth: the maximum length of a referrer chain
+    :param max_chains: the maximum number of chains to return
+    :return: chains of referrer descriptions, each starting from a direct referrer of
+        ``obj``
+
+    """
+    chains: list[list[str]] = []
+    seen = {id(obj)}
+
+    def walk(target: Any, chain: list[str]) -> None:
+        referrers = gc.get_referrers(target)
+        seen.add(id(referrers))
+        found = False
+        for referrer in referrers:
+            if len(chains) >= max_chains:
+                return
+            elif id(referrer) in seen or (
+                isinstance(referrer, FrameType) and referrer.f_code.co_filename == __file__
+            ):
+                continue
+
+            found = True
+            seen.add(id(referrer))
+            if type(referrer).__name__.startswith("hamt"):
+                # Skip the internals of contextvars.Context
+                walk(referrer, chain)
+                continue
+
+            new_chain = chain + [_describe(referrer)]
+            if len(new_chain) >= max_depth:
+                chains.append(new_chain)
+            else:
+                walk(referrer, new_chain)
+
+        if not found and chain:
+            chains.append(chain)
+
+    walk(obj, [])
+    return chains
+
+
+class LeakDetector:
+    """
+    Detects request contexts and per-request resources that are kept alive after the
+    request has been handled.
+
+    Each request context is tracked with a weak reference, as are the resources in it
+    when the response has been sent. If any of these are still alive ``max_age``
+    seconds after the response, they're reported as offenders along with the chains of
+    objects referring to them, and a warning is logged. Typical culprits are closures
+    and tasks spawned by handlers that outlive the request.
+
+    The checks are run every ``check_interval`` seconds while the server is running.
+    Note that the server may legitimately keep a request context alive for a while after
+    the response (for example, in the context of a keep-alive timer), so ``max_age``
+    should be longer than the server's keep-alive timeout.
+
+    :param max_age: number of seconds a request context or its resources can stay alive
+        after the response before being reported
+    :param check_interval: number of seconds between checks
+    :param max_offenders: the maximum number of offenders to keep
+    :param max_referrer_depth: the maximum length of the referrer chains to find
+    :param path: if set, serve the offenders and live context counts as JSON on this path
+    :param unmatched_route: the route label for requests without a route template (use
+        ``None`` to use the request path instead)
+
+    :ivar int leaked_contexts: total number of request contexts reported as leaked
+    :ivar int leaked_resources: total number of resources reported as leaked
+    :ivar bool track_resources: ``True`` if the resources of request contexts are
+        tracked (resource tracking is disabled if the resources can't be listed with
+        the installed version of Asphalt)
+    :ivar offenders: the most recently detected offenders
+    """
+
+    def __init__(
+        self,
+        *,
+        max_age: float = 30.0,
+        check_interval: float = 10.0,
+        max_offenders: int = 20,
+        max_referrer_depth: int = 3,
+        path: str | None = None,
+        unmatched_route: str | None = "<unmatched>",
+    ) -> None:
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.max_referrer_depth = max_referrer_depth
+        self.path = path
+        self.unmatched_route = unmatched_route
+        self.leaked_contexts = 0
+        self.leaked_resources = 0
+        self.track_resources = True
+        self.offenders: deque[LeakOffender] = deque(maxlen=max_offenders)
+        self._tracked: list[_TrackedContext] = []
+
+    def track(self, ctx: Context, path: str) -> _TrackedContext:
+        """
+        Start tracking a request context.
+
+        :param ctx: the request context
+        :param path: the request path
+        :return: an opaque object to be passed to :meth:`finish`
+
+        """
+        tracked = _TrackedContext(ctx, path)
+        self._tracked.append(tracked)
+        return tracked
+
+    def finish(self, tracked: _TrackedContext, route: str | None) -> None:
+        """
+        Mark a tracked request as finished.
+
+        :param tracked: the return value of :meth:`track`
+        :param route: the route template of the request (``None`` if unknown)
+
+        """
+        tracked.finished_at = monotonic()
+        tracked.route = route or self.unmatched_route or tracked.route
+        ctx = tracked.context_ref()
+        if ctx is None or not self.track_resources:
+            return
+
+        try:
+            resources = _get_resources(ctx)
+        except AttributeError:
+            self.track_resources = False
+            logger.warning(
+                "Cannot list the resources of request contexts with this version of "
+                "Asphalt; only the request contexts themselves will be tracked",
+                exc_info=True,
+            )
+            return
+
+        for resource in resources:
+            try:
+                resource_ref = ref(resource)
+            except TypeError:
+                continue
+
+            tracked.resource_refs.append((qualified_name(resource), resource_ref))
+
+    def live_contexts(self) -> dict[str, int]:
+        """
+        Count the tracked request contexts that are still alive, by route.
+
+        Requests still being handled are counted under their request paths.
+
+        """
+        return dict(
+            Counter(
+                tracked.route for tracked in self._tracked if tracked.context_ref() is not None
+            )
+        )
+
+    def check(self) -> list[LeakOffender]:
+        """
+        Check for request contexts and resources that have been alive for too long.
+
+        :return: the newly detected offenders
+
+        """
+        now = monotonic()
+        if any(
+            tracked.finished_at is not None
+            and not tracked.reported
+            and now - tracked.finished_at >= self.max_age
+            for tracked in self._tracked
+        ):
+            # Objects in reference cycles are only freed by the garbage collector
+            gc.collect()
+
+        new_offenders: list[LeakOffender] = []
+        still_tracked: list[_TrackedContext] = []
+        for tracked in self._tracked:
+            ctx = tracked.context_ref()
+            alive_resource_refs = [
+                (description, resource_ref)
+                for description, resource_ref in tracked.resource_refs
+                if resource_ref() is not None
+            ]
+            if ctx is None and not alive_resource_refs:
+                continue
+
+            still_tracked.append(tracked)
+            if tracked.finished_at is None or tracked.reported:
+                continue
+
+            age = now - tracked.finished_at
+            if age < self.max_age:
+                continue
+
+            tracked.reported = True
+            if ctx is not None:
+                self.leaked_contexts += 1
+                referrers = find_referrer_chains(ctx, self.max_referrer_depth)
+                new_offenders.append(
+                    LeakOffender("context", _describe(ctx), tracked.route, age, referrers)
+                )
+
+            for description, resource_ref in alive_resource_refs:
+                # Only hold the resource in a local variable, as the frames of this
+                # module are excluded from the referrer chains
+                resource = resource_ref()
+                if resource is not None:
+                    self.leaked_resources += 1
+                    referrers = find_referrer_chains(resource, self.max_referrer_depth)
+                    new_offenders.append(
+                        LeakOffender("resource", description, tracked.route, age, referrers)
+                    )
+
+        self._tracked = still_tracked
+        for offender in new_offenders:
+            logger.warning(
+                "A request %s of route %s is still alive %.1f seconds after the response: %s",
+                offender.kind,
+                offender.route,
+                offender.age,
+                offender.description,
+            )
+
+        self.offenders.extend(new_offenders)
+        return new_offenders
+
+    async def run(self) -> None:
+        """Run the checks periodically until cancelled."""
+        while True:
+            await sleep(self.check_interval)
+            self.check()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the detector's findings as a JSON compatible dictionary."""
+        return {
+            "live_contexts": self.live_contexts(),
+            "leaked_contexts": self.leaked_contexts,
+            "leaked_resources": self.leaked_resources,
+            "offenders": [
+                {
+                    "kind": offender.kind,
+                    "description": offender.description,
+                    "route": offender.route,
+                    "age": offender.age,
+                    "referrers": offender.referrers,
+                }
+                for offender in self.offenders
+            ],
+        }
+
+
+@dataclass
+class LeakDetectionMiddleware:
+    """
+    ASGI middleware that tracks request contexts with a :class:`LeakDetector`.
+
+    This must be placed inside the middleware that creates the request contexts.
+    Contexts without a parent are never tracked, as they cannot be request contexts.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param detector: the leak detector to use
+    """
+
+    app: ASGI3Application
+    detector: LeakDetector
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        elif scope["type"] == "http" and scope["path"] == self.detector.path:
+            body = json.dumps(self.detector.as_dict()).encode()
+            await send_response(send, 200, body, b"application/json")
+            return
+
+        ctx = current_context()
+        if ctx.parent is None:
+            await self.app(scope, receive, send)
+            return
+
+        tracked = self.detector.track(ctx, scope["path"])
+        del ctx
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.detector.finish(tracked, get_route_template(scope))
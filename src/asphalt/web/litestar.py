@@ -1,38 +1,136 @@
 from __future__ import annotations
 
 from collections.abc import Callable, Sequence
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Any
 
 from asgiref.typing import ASGI3Application, HTTPScope, WebSocketScope
-from asphalt.core import Context, require_resource, resolve_reference
-from litestar import Litestar, Request
+from asphalt.core import (
+    Context,
+    ResourceNotFound,
+    qualified_name,
+    require_resource,
+    resolve_reference,
+)
+from litestar import Litestar, Request, Router
+from litestar.di import Provide
+from litestar.handlers import BaseRouteHandler
 from litestar.middleware import AbstractMiddleware
+from litestar.routes import HTTPRoute, WebSocketRoute
 from litestar.types import ControllerRouterHandler, Receive, Scope, Send
 
+from asphalt.web._utils import get_shared_resource
 from asphalt.web.asgi3 import ASGIComponent
 
+#: Number of route handlers to register on the application at once
+_REGISTRATION_BATCH_SIZE = 64
 
-@dataclass(frozen=True)
+
+# Compared by identity, as Litestar rejects equal providers under different keys
+@dataclass(frozen=True, eq=False)
 class AsphaltProvide:
     """
     Asphalt's version of Litestar's :func:`~litestar.di.Provide`.
 
-    This should be marked as the default value on a parameter that should receive an
-    Asphalt resource.
+    This should be used as the provider of a dependency that should receive an Asphalt
+    resource.
+
+    Resources from the root context are looked up once when the component starts, and
+    then passed to every request as is. These must already be available by then (so they
+    should be provided by child components of the web component, or by components started
+    before it).
+    Resources added by the component itself to each request context (the ASGI scope, the
+    request, the deadline, the tracing span and the request memo), and resources
+    provided by resource factories, are looked up separately for each request. To tell
+    these factories apart from shared resources, they're called twice during startup, in
+    temporary contexts.
 
-    :param cls: the type of the resource
+    :param cls: the type of the resource (default: the type annotation of the parameter
+        receiving the dependency)
     :param name: the name of the resource within its unique type
+    :param request_scoped: ``True`` to look up the resource separately for each request,
+        for resources that some middleware adds to the request context
 
     """
 
-    cls: type
+    cls: type | None = None
     name: str = "default"
+    request_scoped: bool = False
 
     async def __call__(self) -> Any:
+        if self.cls is None:
+            raise TypeError("the resource type has not been resolved")
+
         return require_resource(self.cls, self.name)
 
 
+def _find_annotation(handler: BaseRouteHandler, key: str, providers: dict[str, Provide]) -> Any:
+    # The dependency may be received by the handler itself or by another dependency
+    signatures = [handler.parsed_fn_signature]
+    signatures.extend(
+        provider.parsed_fn_signature
+        for provider in providers.values()
+        if getattr(provider, "parsed_fn_signature", None)
+    )
+    for signature in signatures:
+        if key in signature.parameters:
+            annotation = signature.parameters[key].annotation
+            if annotation is not Any:
+                return annotation
+
+    raise KeyError(key)
+
+
+def _group_by_path(handlers: list[BaseRouteHandler]) -> list[list[BaseRouteHandler]]:
+    # Litestar can't merge the routes of separately registered routers, so handlers
+    # sharing a path (directly or through other handlers) must be registered together
+    parents = list(range(len(handlers)))
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+
+        return index
+
+    first_by_path: dict[str, int] = {}
+    for index, handler in enumerate(handlers):
+        for path in handler.paths:
+            parents[find(index)] = find(first_by_path.setdefault(path, index))
+
+    groups: dict[int, list[BaseRouteHandler]] = {}
+    for index, handler in enumerate(handlers):
+        groups.setdefault(find(index), []).append(handler)
+
+    return list(groups.values())
+
+
+async def _bind_provider(
+    provider: Provide, dependency: AsphaltProvide, request_scoped_types: set[type]
+) -> Provide:
+    assert dependency.cls is not None
+    cls, name = dependency.cls, dependency.name
+    value: Any = None
+    if not dependency.request_scoped and cls not in request_scoped_types:
+        value = await get_shared_resource(cls, name)
+
+    if value is None:
+
+        def lookup() -> Any:
+            return require_resource(cls, name)
+
+        bound = Provide(lookup, sync_to_thread=False)
+    else:
+        # Litestar returns the cached value of the provider without calling anything
+        bound = Provide(lambda: value, use_cache=True, sync_to_thread=False)
+
+    # Both callables take no arguments, so the signature parsed by Litestar for the
+    # original provider applies as is
+    bound.parsed_fn_signature = provider.parsed_fn_signature
+    bound.signature_model = provider.signature_model
+    return bound
+
+
 class AsphaltMiddleware(AbstractMiddleware):
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         async with Context() as ctx:
@@ -57,6 +155,9 @@ class LitestarComponent(ASGIComponent[Litestar]):
         application
     :param middlewares: list of callables or dicts to be added as middleware using
         :meth:`add_middleware`
+    :param config: keyword arguments passed to :class:`~litestar.app.Litestar`
+    :param kwargs: further keyword arguments passed to
+        :class:`~asphalt.web.asgi3.ASGIComponent`
 
     .. note::
         The following options are preset here:
@@ -83,20 +184,110 @@ class LitestarComponent(ASGIComponent[Litestar]):
         route_handlers: Sequence[ControllerRouterHandler | str] = (),
         middlewares: Sequence[Callable[..., ASGI3Application] | dict[str, Any]] = (),
         config: dict[str, Any] | None = None,
+        **kwargs: Any,
     ) -> None:
         config_ = config or {}
         config_.setdefault("debug", __debug__)
         config_["logging_config"] = None
         app = Litestar(**config_)
-        super().__init__(components, app=app, middlewares=middlewares, host=host, port=port)
+        super().__init__(
+            components, app=app, middlewares=middlewares, host=host, port=port, **kwargs
+        )
 
+        # Each registration on the application rebuilds its routing trie, so consecutive
+        # route handlers are registered in batches, through nested routers
+        pending_handlers: list[BaseRouteHandler] = []
         for item in route_handlers:
-            if isinstance(item, str):
-                handler = resolve_reference(item)
+            handler = resolve_reference(item) if isinstance(item, str) else item
+            if isinstance(handler, BaseRouteHandler):
+                pending_handlers.append(handler)
             else:
-                handler = item
+                self._register_handlers(pending_handlers)
+                pending_handlers = []
+                self.original_app.register(handler)
 
-            self.original_app.register(handler)
+        self._register_handlers(pending_handlers)
+
+    def _register_handlers(self, handlers: list[BaseRouteHandler]) -> None:
+        # Routes already on the application can only be extended with handlers registered
+        # directly on it
+        existing_paths = {route.path for route in self.original_app.routes}
+        batch: list[BaseRouteHandler] = []
+        for group in _group_by_path(handlers):
+            if not existing_paths.isdisjoint(path for handler in group for path in handler.paths):
+                for handler in group:
+                    self.original_app.register(handler)
+            else:
+                batch.extend(group)
+                if len(batch) >= _REGISTRATION_BATCH_SIZE:
+                    self.original_app.register(Router(path="/", route_handlers=batch))
+                    batch = []
+
+        if len(batch) > 1:
+            self.original_app.register(Router(path="/", route_handlers=batch))
+        elif batch:
+            self.original_app.register(batch[0])
 
     def setup_asphalt_middleware(self, app: Litestar) -> ASGI3Application:
         return AsphaltMiddleware(app=app)
+
+    async def start_server(self, ctx: Context) -> None:
+        from .deadline import Deadline
+        from .memo import RequestMemo
+        from .tracing import Span
+
+        # Resolve the resource types of the Asphalt providers and replace them with
+        # providers bound to the resources from the root context
+        request_scoped_types = {HTTPScope, WebSocketScope, Request, Deadline, Span, RequestMemo}
+        # The original providers are kept alive here, so their IDs can't be reused
+        bound_providers: dict[int, tuple[Provide, Provide]] = {}
+        for route in self.original_app.routes:
+            handlers = (
+                route.route_handlers if isinstance(route, HTTPRoute) else [route.route_handler]  # type: ignore[attr-defined]
+            )
+            rebind = False
+            for handler in handlers:
+                providers = handler.resolve_dependencies()
+                for key, provider in providers.items():
+                    dependency = provider.dependency
+                    if id(provider) in bound_providers:
+                        providers[key] = bound_providers[id(provider)][1]
+                        rebind = True
+                        continue
+                    elif not isinstance(dependency, AsphaltProvide):
+                        continue
+
+                    if dependency.cls is None:
+                        try:
+                            annotation = _find_annotation(handler, key, providers)
+                        except KeyError:
+                            raise TypeError(
+                                f"Dependency {key!r} in route handler {route.path} is "
+                                f"missing a type annotation"
+                            ) from None
+
+                        dependency = replace(dependency, cls=annotation)
+
+                    try:
+                        bound = await _bind_provider(provider, dependency, request_scoped_types)
+                    except ResourceNotFound:
+                        raise LookupError(
+                            f"Dependency {key!r} in route handler {route.path} requires a "
+                            f"resource of type {qualified_name(dependency.cls)} named "
+                            f"{dependency.name!r}, but none is available"
+                        ) from None
+
+                    bound_providers[id(provider)] = (provider, bound)
+                    providers[key] = bound
+                    rebind = True
+
+            # The parameter models of the route refer to the original providers
+            if rebind and isinstance(route, HTTPRoute):
+                route.route_handler_map.clear()
+                route.create_handler_map()
+            elif rebind and isinstance(route, WebSocketRoute):
+                route.handler_parameter_model = route.route_handler.create_kwargs_model(
+                    path_parameters=route.path_parameters
+                )
+
+        await super().start_server(ctx)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+import sys
+import traceback
+from asyncio import AbstractEventLoop, Task, current_task, get_running_loop, sleep
+from collections import deque
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Event, Thread, get_ident
+from time import monotonic, time
+from typing import TYPE_CHECKING, Any
+
+from .metrics import DEFAULT_BUCKETS, Histogram, _render_histogram
+
+if TYPE_CHECKING:
+    from asgiref.typing import ASGI3Application, ASGIReceiveCallable, ASGISendCallable, Scope
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SlowCallback:
+    """
+    A callback or task step that blocked the event loop for too long.
+
+    :ivar duration: how long (in seconds) the event loop was blocked
+    :ivar path: the path of the request being handled by the blocking code, if any
+    :ivar stack: the stack of the blocking code, as captured while it was running
+    :ivar timestamp: the UNIX time when the blocking was detected
+    """
+
+    duration: float
+    path: str | None
+    stack: str
+    timestamp: float
+
+
+class LoopMonitor:
+    """
+    Monitors the responsiveness of the event loop.
+
+    A monitoring task wakes up every ``interval`` seconds and records how late it woke
+    up (the *lag*) into a histogram. Meanwhile, a watchdog thread checks that the task
+    keeps waking up, and if the event loop has been blocked for longer than
+    ``threshold`` seconds, it captures the stack of the blocking code, along with the
+    path of the request being handled, if it can find one. These are recorded as
+    :class:`SlowCallback` objects and logged as warnings.
+
+    :param interval: number of seconds between lag measurements
+    :param threshold: number of seconds the event loop can be blocked for before the
+        blocking code is flagged
+    :param max_slow_callbacks: the maximum number of slow callbacks to keep
+    :param buckets: the upper bounds of the lag histogram buckets (in seconds)
+    :param stack_limit: the maximum number of stack frames to capture
+
+    :ivar Histogram lag: histogram of the measured event loop lag
+    :ivar float max_lag: the longest event loop lag measured (in seconds)
+    :ivar int slow_callback_count: total number of slow callbacks detected
+    :ivar slow_callbacks: the most recently detected slow callbacks
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.1,
+        threshold: float = 0.1,
+        max_slow_callbacks: int = 100,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        stack_limit: int = 30,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self.lag = Histogram(buckets)
+        self.max_lag = 0.0
+        self.slow_callback_count = 0
+        self.slow_callbacks: deque[SlowCallback] = deque(maxlen=max_slow_callbacks)
+        self._last_beat = monotonic()
+        self._stall: tuple[str | None, str] | None = None
+        self._request_paths: dict[Task[Any], str] = {}
+
+    @contextmanager
+    def track_request(self, path: str) -> Iterator[None]:
+        """
+        Associate the current task with the path of the request it is handling.
+
+        The watchdog thread only reads these associations, as inspecting the frames of
+        the event loop thread (beyond their code locations) is not thread safe.
+
+        :param path: the request path
+
+        """
+        task = current_task()
+        if task is None:
+            yield
+            return
+
+        previous = self._request_paths.get(task)
+        self._request_paths[task] = path
+        try:
+            yield
+        finally:
+            if previous is None:
+                del self._request_paths[task]
+            else:
+                self._request_paths[task] = previous
+
+    async def run(self) -> None:
+        """
+        Monitor the event loop until cancelled.
+
+        This also starts the watchdog thread, and stops it when cancelled.
+
+        """
+        stop_event = Event()
+        watchdog = Thread(
+            target=self._watch,
+            args=(get_running_loop(), get_ident(), stop_event),
+            name="asphalt-web-loop-monitor",
+            daemon=True,
+        )
+        self._last_beat = monotonic()
+        watchdog.start()
+        try:
+            while True:
+                expected = monotonic() + self.interval
+                await sleep(self.interval)
+                now = monotonic()
+                self._last_beat = now
+                self._record_lag(max(now - expected, 0.0))
+        finally:
+            stop_event.set()
+
+    def _record_lag(self, lag: float) -> None:
+        self.lag.observe(lag)
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+        stall, self._stall = self._stall, None
+        if stall is not None:
+            path, stack = stall
+            self.slow_callback_count += 1
+            self.slow_callbacks.append(SlowCallback(lag, path, stack, time()))
+            logger.warning(
+                "The event loop was blocked for %.3f seconds (request path: %s):\n%s",
+                lag,
+                path,
+                stack,
+            )
+
+    def _watch(self, loop: AbstractEventLoop, thread_id: int, stop_event: Event) -> None:
+        poll_interval = min(self.interval, self.threshold) / 2
+        captured_beat = None
+        while not stop_event.wait(poll_interval):
+            last_beat = self._last_beat
+            if (
+                last_beat != captured_beat
+                and monotonic() - last_beat > self.interval + self.threshold
+            ):
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    captured_beat = last_beat
+                    stack = "".join(traceback.format_stack(frame, self.stack_limit))
+                    task = current_task(loop)
+                    path = self._request_paths.get(task) if task is not None else None
+                    self._stall = path, stack
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the collected data as a JSON compatible dictionary."""
+        return {
+            "mean_lag": self.lag.mean,
+            "max_lag": self.max_lag,
+            "slow_callback_count": self.slow_callback_count,
+            "slow_callbacks": [
+                {
+                    "duration": callback.duration,
+                    "path": callback.path,
+                    "stack": callback.stack,
+                    "timestamp": callback.timestamp,
+                }
+                for callback in self.slow_callbacks
+            ],
+        }
+
+    def render_prometheus(self, lines: list[str]) -> None:
+        """
+        Render the collected data in the Prometheus text exposition format.
+
+        :param lines: the list to append the rendered lines to
+
+        """
+        lines += [
+            "# HELP event_loop_lag_seconds Delay in the event loop running scheduled callbacks.",
+            "# TYPE event_loop_lag_seconds histogram",
+        ]
+        _render_histogram(lines, "event_loop_lag_seconds", "", self.lag)
+        lines += [
+            "# HELP event_loop_slow_callbacks_total Number of times the event loop was blocked.",
+            "# TYPE event_loop_slow_callbacks_total counter",
+            f"event_loop_slow_callbacks_total {self.slow_callback_count}",
+        ]
+
+
+@dataclass
+class LoopMonitorMiddleware:
+    """
+    ASGI middleware that lets a :class:`LoopMonitor` know which request each task is
+    handling.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param monitor: the loop monitor to use
+    """
+
+    app: ASGI3Application
+    monitor: LoopMonitor
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] in ("http", "websocket"):
+            with self.monitor.track_request(scope["path"]):
+                await self.app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from asyncio import Future, ensure_future, shield
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from functools import partial, wraps
+from typing import Any, TypeVar
+
+from asphalt.core import Context, current_context
+
+T = TypeVar("T")
+T_Callable = TypeVar("T_Callable", bound=Callable[..., Awaitable[Any]])
+
+
+class RequestMemo:
+    """
+    Memoizes the results of async calls for the duration of a request.
+
+    When the ``request_memo`` option is set on a web component, a memo is created lazily
+    in each request context that asks for it (as a resource), and dropped along with the
+    context. Other contexts (like the root context) don't get one. Identical calls made
+    during the request (like loading the current user from several dependencies) then run
+    only once, and concurrent identical calls share the same pending result.
+
+    Failed and cancelled calls are not memoized, so they're retried on the next call.
+
+    :param max_entries: maximum number of results to keep (further calls are run, but
+        their results are not memoized)
+    :ivar int hits: number of calls answered from the memo (including shared pending
+        calls)
+    :ivar int misses: number of calls that were actually run
+    """
+
+    def __init__(self, *, max_entries: int = 1024) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be a positive integer")
+
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._futures: dict[Hashable, Future[Any]] = {}
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """
+        Call the given coroutine function, or return the result of an identical call.
+
+        Calls are identical when the function and the arguments are equal, so the
+        arguments must be hashable.
+
+        :param func: a coroutine function
+        :param args: positional arguments to call the function with
+        :param kwargs: keyword arguments to call the function with
+        :return: the return value of the function
+
+        """
+        key = (func, args, tuple(sorted(kwargs.items()))) if kwargs else (func, args)
+        future = self._futures.get(key)
+        if future is None:
+            self.misses += 1
+            future = ensure_future(func(*args, **kwargs))
+            if len(self._futures) >= self.max_entries:
+                return await future
+
+            self._futures[key] = future
+            future.add_done_callback(partial(self._discard_failed, key))
+        else:
+            self.hits += 1
+            if future.done():
+                return future.result()
+
+        # Shielded, so that a cancelled caller doesn't cancel the call for the others
+        return await shield(future)
+
+    def _discard_failed(self, key: Hashable, future: Future[Any]) -> None:
+        if self._futures.get(key) is future:
+            if future.cancelled() or future.exception() is not None:
+                del self._futures[key]
+
+    def clear(self) -> None:
+        """Forget all memoized results (pending calls still complete for their callers)."""
+        self._futures.clear()
+
+    def close(self) -> None:
+        """
+        Cancel any pending calls and forget all memoized results.
+
+        This is called when the context the memo belongs to is torn down.
+
+        """
+        for future in self._futures.values():
+            future.cancel()
+
+        self._futures.clear()
+
+
+class RequestMemoFactory:
+    """
+    Creates a :class:`RequestMemo` for each request context it's requested from.
+
+    This is the resource factory added by the web components when their ``request_memo``
+    option is set. Requesting the memo from any other context produces ``None``.
+
+    :param request_types: resource types, one of which is present in every request
+        context (like the ASGI scope or the request object)
+    :param kwargs: keyword arguments passed to :class:`RequestMemo`
+    """
+
+    def __init__(self, *, request_types: Iterable[type], **kwargs: Any) -> None:
+        RequestMemo(**kwargs)  # validate the options early
+        self.request_types = tuple(request_types)
+        self.kwargs = kwargs
+
+    def __call__(self, ctx: Context) -> RequestMemo | None:
+        if all(ctx.get_resource(cls) is None for cls in self.request_types):
+            return None
+
+        memo = RequestMemo(**self.kwargs)
+        ctx.add_teardown_callback(memo.close)
+        return memo
+
+
+def memoize(func: T_Callable) -> T_Callable:
+    """
+    Memoize the calls of a coroutine function in the current request's memo.
+
+    Outside of a request (or when no :class:`RequestMemo` is available in the current
+    context), the function is called normally.
+
+    :param func: a coroutine function with hashable arguments
+    :return: the wrapped function
+
+    """
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        memo = current_context().get_resource(RequestMemo)
+        if memo is None:
+            return await func(*args, **kwargs)
+
+        return await memo.call(func, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
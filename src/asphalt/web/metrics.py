@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+from time import perf_counter, time
+from typing import TYPE_CHECKING
+
+from ._utils import get_header, get_route_template, send_response
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGISendCallable,
+        ASGISendEvent,
+        Scope,
+    )
+
+#: default histogram bucket upper bounds (in seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    A histogram with fixed buckets.
+
+    :param buckets: the upper bounds of the buckets (an implicit ``+Inf`` bucket is
+        always added)
+
+    :ivar tuple[float, ...] bounds: the upper bounds of the finite buckets, in ascending
+        order
+    :ivar list[int] counts: the number of observations in each bucket (not cumulative),
+        with the last item being the ``+Inf`` bucket
+    :ivar int count: the total number of observations
+    :ivar float sum: the sum of all observed values
+    """
+
+    __slots__ = "bounds", "counts", "count", "sum"
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile of the observed values.
+
+        The estimate is the upper bound of the bucket containing the quantile, so its
+        precision depends on the bucket layout. If the quantile falls into the ``+Inf``
+        bucket, the highest finite bound is returned.
+
+        :param q: the quantile (between 0 and 1)
+        :return: the estimated quantile, or 0 if there are no observations
+
+        """
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+
+        return self.bounds[-1] if self.bounds else 0.0
+
+    @property
+    def mean(self) -> float:
+        """The mean of the observed values."""
+        return self.sum / self.count if self.count else 0.0
+
+
+def parse_request_start(value: str) -> float | None:
+    """
+    Parse the value of an ``X-Request-Start`` header into a UNIX timestamp.
+
+    Both the plain (``1700000000.123``) and the ``t=`` prefixed forms are supported,
+    and the unit (seconds, milliseconds, microseconds or nanoseconds) is inferred from
+    the magnitude of the value.
+
+    :param value: the header value
+    :return: the timestamp in seconds, or ``None`` if the value could not be parsed
+
+    """
+    if value.startswith("t="):
+        value = value[2:]
+
+    try:
+        timestamp = float(value)
+    except ValueError:
+        return None
+
+    while timestamp > 1e11:
+        timestamp /= 1000
+
+    return timestamp
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histogram(lines: list[str], name: str, labels: str, histogram: Histogram) -> None:
+    separator = "," if labels else ""
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+
+    lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+class MetricsCollector:
+    """
+    Collects request metrics.
+
+    Request latencies are recorded into a :class:`Histogram` per route template, method
+    and response status. Routes are identified by their templates (like
+    ``/items/{item_id}``) rather than the actual request paths to keep the number of
+    histograms bounded. Requests that did not match any route, or whose route template
+    could not be determined, are grouped under ``unmatched_route``.
+
+    If the request has an ``X-Request-Start`` header (as set by many load balancers and
+    reverse proxies), the time between that and the request reaching the application is
+    recorded as the request queue time.
+
+    :param buckets: the upper bounds of the histogram buckets (in seconds)
+    :param path: if set, serve the metrics in the Prometheus text format on this path
+    :param queue_time_header: name of the header containing the time the request was
+        received by the upstream proxy
+    :param unmatched_route: the route label for requests without a route template (use
+        ``None`` to use the request path instead, but only if the application has a
+        bounded set of paths)
+
+    :ivar dict[tuple[str, str, int], Histogram] latencies: request latency histograms,
+        keyed by (route template, method, status)
+    :ivar Histogram queue_times: histogram of request queue times
+    """
+
+    def __init__(
+        self,
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        path: str | None = None,
+        queue_time_header: str = "x-request-start",
+        unmatched_route: str | None = "<unmatched>",
+    ) -> None:
+        self.buckets = tuple(buckets)
+        self.path = path
+        self.queue_time_header = queue_time_header.lower()
+        self.unmatched_route = unmatched_route
+        self.latencies: dict[tuple[str, str, int], Histogram] = {}
+        self.queue_times = Histogram(buckets)
+        self._renderers: list[Callable[[list[str]], None]] = []
+
+    def record(
+        self,
+        route: str,
+        method: str,
+        status: int,
+        duration: float,
+        queue_time: float | None = None,
+    ) -> None:
+        """
+        Record a finished request.
+
+        :param route: the route template
+        :param method: the HTTP method
+        :param status: the response status code
+        :param duration: the time it took to handle the request (in seconds)
+        :param queue_time: the time the request spent in the upstream queue (in seconds)
+
+        """
+        key = (route, method, status)
+        histogram = self.latencies.get(key)
+        if histogram is None:
+            histogram = self.latencies[key] = Histogram(self.buckets)
+
+        histogram.observe(duration)
+        if queue_time is not None:
+            self.queue_times.observe(max(queue_time, 0.0))
+
+    def add_renderer(self, renderer: Callable[[list[str]], None]) -> None:
+        """
+        Add a callable that renders additional metrics.
+
+        :param renderer: a callable that appends lines in the Prometheus text exposition
+            format to the given list
+
+        """
+        self._renderers.append(renderer)
+
+    def get_queue_time(self, header_value: str | None, received_at: float) -> float | None:
+        """
+        Calculate the request queue time.
+
+        :param header_value: value of the queue time header, if present
+        :param received_at: the UNIX time when the request reached the application
+        :return: the queue time (in seconds), or ``None`` if not available
+
+        """
+        if header_value is None:
+            return None
+
+        timestamp = parse_request_start(header_value)
+        return received_at - timestamp if timestamp is not None else None
+
+    def render_prometheus(self) -> str:
+        """Render the collected metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP http_requests_total Total number of HTTP requests handled.",
+            "# TYPE http_requests_total counter",
+        ]
+        labels_by_key = {
+            key: (
+                f'route="{_escape_label(key[0])}",method="{_escape_label(key[1])}",'
+                f'status="{key[2]}"'
+            )
+            for key in self.latencies
+        }
+        for key, histogram in self.latencies.items():
+            lines.append(f"http_requests_total{{{labels_by_key[key]}}} {histogram.count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Time spent handling HTTP requests.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for key, histogram in self.latencies.items():
+            _render_histogram(
+                lines, "http_request_duration_seconds", labels_by_key[key], histogram
+            )
+
+        lines += [
+            "# HELP http_request_queue_time_seconds Time HTTP requests spent queued upstream.",
+            "# TYPE http_request_queue_time_seconds histogram",
+        ]
+        _render_histogram(lines, "http_request_queue_time_seconds", "", self.queue_times)
+        for renderer in self._renderers:
+            renderer(lines)
+
+        return "\n".join(lines) + "\n"
+
+
+@dataclass
+class MetricsMiddleware:
+    """
+    ASGI middleware that records HTTP request metrics into a :class:`MetricsCollector`.
+
+    If the collector has a ``path`` set, requests to that path are answered with the
+    collected metrics in the Prometheus text format.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param collector: the metrics collector to use
+    """
+
+    app: ASGI3Application
+    collector: MetricsCollector = field(default_factory=MetricsCollector)
+
+    def __post_init__(self) -> None:
+        self._queue_time_header = self.collector.queue_time_header.encode("latin-1")
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        collector = self.collector
+        if scope["path"] == collector.path:
+            body = collector.render_prometheus().encode()
+            await send_response(send, 200, body, PROMETHEUS_CONTENT_TYPE)
+            return
+
+        start = perf_counter()
+        header_value = get_header(scope, self._queue_time_header)
+        queue_time = (
+            collector.get_queue_time(header_value.decode("latin-1"), time())
+            if header_value is not None
+            else None
+        )
+        status = 500
+        recorded = False
+
+        def record() -> None:
+            nonlocal recorded
+            recorded = True
+            route = get_route_template(scope) or collector.unmatched_route or scope["path"]
+            collector.record(route, scope["method"], status, perf_counter() - start, queue_time)
+
+        async def wrapped_send(event: ASGISendEvent) -> None:
+            nonlocal status
+            if event["type"] == "http.response.start":
+                status = event["status"]
+            elif event["type"] == "http.response.body" and not event.get("more_body", False):
+                # Record before the response is complete from the client's point of view
+                record()
+
+            await send(event)
+
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            if not recorded:
+                record()
@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import logging
+from asyncio import Event, Task, create_task, wait, wait_for
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from random import random
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, cast
+
+from asphalt.core import resolve_reference
+
+from ._utils import get_header, get_route_template
+from .metrics import DEFAULT_BUCKETS, Histogram, _escape_label, _render_histogram
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGIReceiveEvent,
+        ASGISendCallable,
+        ASGISendEvent,
+        HTTPScope,
+        Scope,
+    )
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteComparison:
+    """
+    Comparison of the primary and the shadow application on a single route.
+
+    :ivar Histogram primary: latencies of the mirrored requests in the primary application
+    :ivar Histogram shadow: latencies of the same requests in the shadow application
+    :ivar statuses: number of mirrored requests per (primary status, shadow status)
+    :vartype statuses: dict[tuple[int, int], int]
+    :ivar int errors: number of mirrored requests where the shadow application raised an
+        exception or timed out
+    """
+
+    primary: Histogram
+    shadow: Histogram
+    statuses: dict[tuple[int, int], int] = field(default_factory=dict)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        """Number of mirrored requests that finished in the shadow application."""
+        return self.shadow.count
+
+    @property
+    def status_mismatches(self) -> int:
+        """Number of mirrored requests where the two applications' statuses differed."""
+        return sum(
+            count
+            for (primary_status, shadow_status), count in self.statuses.items()
+            if primary_status != shadow_status
+        )
+
+
+class TrafficMirror:
+    """
+    Mirrors a sample of requests to a shadow application and compares the results.
+
+    After the primary application has sent its response, a sampled request is sent
+    again to the shadow application (like a rewritten version of the primary one) in a
+    separate task, with the request body captured from the primary request. The shadow
+    application's responses are discarded, and only its latency and status code are
+    compared to those of the primary application, per route template and method.
+
+    The mirrored work is bounded: a request is dropped instead of being mirrored if
+    ``max_concurrency`` mirrored requests are already in flight, and a mirrored request
+    is cancelled after ``timeout`` seconds. Requests whose bodies are larger than
+    ``max_body_size``, or that the primary application did not read completely, are
+    skipped.
+
+    .. note:: The shadow application receives the same requests as the primary one, so
+        it should not have side effects (like writing to the same database).
+
+    :param app: the shadow ASGI application, or a module:varname reference to one
+    :param sample_rate: fraction of requests to mirror (0 to 1)
+    :param max_concurrency: the maximum number of mirrored requests in flight
+    :param timeout: number of seconds a mirrored request may take before it is cancelled
+    :param max_body_size: the largest request body (in bytes) to mirror
+    :param buckets: the upper bounds of the latency histogram buckets (in seconds)
+    :param unmatched_route: the route label for requests without a route template (use
+        ``None`` to use the request path instead, but only if the application has a
+        bounded set of paths)
+
+    :ivar dict[tuple[str, str], RouteComparison] routes: comparisons keyed by (route
+        template, method)
+    :ivar int dropped_requests: number of sampled requests dropped because too many
+        mirrored requests were in flight
+    :ivar int skipped_requests: number of sampled requests not mirrored because of their
+        request bodies
+    """
+
+    def __init__(
+        self,
+        *,
+        app: ASGI3Application | str,
+        sample_rate: float = 0.1,
+        max_concurrency: int = 10,
+        timeout: float = 10.0,
+        max_body_size: int = 65536,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        unmatched_route: str | None = "<unmatched>",
+    ) -> None:
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer")
+
+        self.app: ASGI3Application = resolve_reference(app)
+        self.sample_rate = sample_rate
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_body_size = max_body_size
+        self.buckets = tuple(buckets)
+        self.unmatched_route = unmatched_route
+        self.routes: dict[tuple[str, str], RouteComparison] = {}
+        self.dropped_requests = 0
+        self.skipped_requests = 0
+        self._tasks: set[Task[None]] = set()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of mirrored requests currently in flight."""
+        return len(self._tasks)
+
+    def sample(self) -> bool:
+        """Decide whether to mirror the current request."""
+        return self.sample_rate >= 1 or random() < self.sample_rate
+
+    def _get_comparison(self, route: str, method: str) -> RouteComparison:
+        key = (route, method)
+        comparison = self.routes.get(key)
+        if comparison is None:
+            comparison = self.routes[key] = RouteComparison(
+                Histogram(self.buckets), Histogram(self.buckets)
+            )
+
+        return comparison
+
+    def mirror(
+        self,
+        shadow_app: ASGI3Application,
+        scope: HTTPScope,
+        body: bytes,
+        route: str | None,
+        primary_status: int,
+        primary_duration: float,
+    ) -> None:
+        """
+        Send a request to the shadow application in a new task.
+
+        The request is dropped if ``max_concurrency`` mirrored requests are already in
+        flight.
+
+        :param shadow_app: the shadow application, with any middleware applied
+        :param scope: a copy of the request's scope, made before the primary application
+            received it
+        :param body: the complete request body
+        :param route: the route template reported by the primary application, if any
+        :param primary_status: the status code of the primary application's response
+        :param primary_duration: the time it took the primary application to respond (in
+            seconds)
+
+        """
+        if len(self._tasks) >= self.max_concurrency:
+            self.dropped_requests += 1
+            return
+
+        task = create_task(
+            self._run(shadow_app, scope, body, route, primary_status, primary_duration)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        shadow_app: ASGI3Application,
+        scope: HTTPScope,
+        body: bytes,
+        route: str | None,
+        primary_status: int,
+        primary_duration: float,
+    ) -> None:
+        response_complete = Event()
+        body_sent = False
+        status = 500
+
+        async def receive() -> ASGIReceiveEvent:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(event: ASGISendEvent) -> None:
+            nonlocal status
+            if event["type"] == "http.response.start":
+                status = event["status"]
+            elif event["type"] == "http.response.body" and not event.get("more_body", False):
+                response_complete.set()
+
+        start = perf_counter()
+        failed = False
+        try:
+            await wait_for(shadow_app(cast("Scope", scope), receive, send), self.timeout)
+        except Exception:
+            failed = True
+            logger.warning(
+                "Error mirroring %s %s to the shadow application",
+                scope["method"],
+                scope["path"],
+                exc_info=True,
+            )
+
+        duration = perf_counter() - start
+        route = route or get_route_template(scope) or self.unmatched_route or scope["path"]
+        comparison = self._get_comparison(route, scope["method"])
+        if failed:
+            comparison.errors += 1
+        else:
+            comparison.primary.observe(primary_duration)
+            comparison.shadow.observe(duration)
+            key = (primary_status, status)
+            comparison.statuses[key] = comparison.statuses.get(key, 0) + 1
+
+    async def wait_idle(self) -> None:
+        """Wait until no mirrored requests are in flight."""
+        while self._tasks:
+            await wait(list(self._tasks))
+
+    def cancel(self) -> None:
+        """Cancel all mirrored requests in flight."""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the collected data as a JSON compatible dictionary."""
+        return {
+            "dropped_requests": self.dropped_requests,
+            "skipped_requests": self.skipped_requests,
+            "routes": [
+                {
+                    "route": route,
+                    "method": method,
+                    "requests": comparison.requests,
+                    "errors": comparison.errors,
+                    "status_mismatches": comparison.status_mismatches,
+                    "statuses": [
+                        {"primary": primary, "shadow": shadow, "count": count}
+                        for (primary, shadow), count in comparison.statuses.items()
+                    ],
+                    "primary_p50": comparison.primary.quantile(0.5),
+                    "primary_p99": comparison.primary.quantile(0.99),
+                    "shadow_p50": comparison.shadow.quantile(0.5),
+                    "shadow_p99": comparison.shadow.quantile(0.99),
+                }
+                for (route, method), comparison in self.routes.items()
+            ],
+        }
+
+    def render_prometheus(self, lines: list[str]) -> None:
+        """
+        Render the collected data in the Prometheus text exposition format.
+
+        :param lines: the list to append the rendered lines to
+
+        """
+        labels_by_key = {
+            key: f'route="{_escape_label(key[0])}",method="{_escape_label(key[1])}"'
+            for key in self.routes
+        }
+        lines += [
+            "# HELP http_mirrored_requests_total Mirrored requests by primary and shadow status.",
+            "# TYPE http_mirrored_requests_total counter",
+        ]
+        for key, comparison in self.routes.items():
+            for (primary_status, shadow_status), count in comparison.statuses.items():
+                lines.append(
+                    f"http_mirrored_requests_total{{{labels_by_key[key]},"
+                    f'primary_status="{primary_status}",shadow_status="{shadow_status}"}} '
+                    f"{count}"
+                )
+
+        lines += [
+            "# HELP http_mirrored_request_errors_total Failed or timed out mirrored requests.",
+            "# TYPE http_mirrored_request_errors_total counter",
+        ]
+        for key, comparison in self.routes.items():
+            lines.append(
+                f"http_mirrored_request_errors_total{{{labels_by_key[key]}}} {comparison.errors}"
+            )
+
+        lines += [
+            "# HELP http_mirrored_request_duration_seconds Time spent handling mirrored requests.",
+            "# TYPE http_mirrored_request_duration_seconds histogram",
+        ]
+        for key, comparison in self.routes.items():
+            for name, histogram in [
+                ("primary", comparison.primary),
+                ("shadow", comparison.shadow),
+            ]:
+                _render_histogram(
+                    lines,
+                    "http_mirrored_request_duration_seconds",
+                    f'{labels_by_key[key]},app="{name}"',
+                    histogram,
+                )
+
+        lines += [
+            "# HELP http_mirrored_requests_dropped_total Sampled requests dropped at capacity.",
+            "# TYPE http_mirrored_requests_dropped_total counter",
+            f"http_mirrored_requests_dropped_total {self.dropped_requests}",
+        ]
+
+
+@dataclass
+class MirroringMiddleware:
+    """
+    ASGI middleware that mirrors HTTP requests with a :class:`TrafficMirror`.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param mirror: the traffic mirror to use
+    :param shadow_app: the shadow application to send the mirrored requests to (with
+        any middleware applied), if not the mirror's ``app``
+    """
+
+    app: ASGI3Application
+    mirror: TrafficMirror
+    shadow_app: ASGI3Application | None = None
+
+    def __post_init__(self) -> None:
+        if self.shadow_app is None:
+            self.shadow_app = self.mirror.app
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http" or not self.mirror.sample():
+            await self.app(scope, receive, send)
+            return
+
+        # Frameworks add their own entries to the scope, so copy it before they do
+        shadow_scope = cast("HTTPScope", dict(scope))
+        start = perf_counter()
+        status = 500
+        response_started = False
+        responded = False
+        chunks: list[bytes] = []
+        body_size = 0
+        # Applications may not read the body at all if the request doesn't have one, or
+        # stop reading once they have received as many bytes as announced
+        content_length: int | None = None
+        if get_header(scope, b"transfer-encoding") is None:
+            header_value = get_header(scope, b"content-length")
+            try:
+                content_length = int(header_value) if header_value is not None else 0
+            except ValueError:
+                pass
+
+        body_complete = content_length == 0
+
+        async def wrapped_receive() -> ASGIReceiveEvent:
+            nonlocal body_size, body_complete
+            event = await receive()
+            if event["type"] == "http.request" and body_size <= self.mirror.max_body_size:
+                body = event.get("body", b"")
+                body_size += len(body)
+                chunks.append(body)
+                body_complete = not event.get("more_body", False) or body_size == content_length
+
+            return event
+
+        async def wrapped_send(event: ASGISendEvent) -> None:
+            nonlocal status, response_started, responded
+            if event["type"] == "http.response.start":
+                status = event["status"]
+                response_started = True
+            elif event["type"] == "http.response.body" and not event.get("more_body", False):
+                responded = True
+
+            await send(event)
+
+        def mirror() -> None:
+            if not body_complete or body_size > self.mirror.max_body_size:
+                self.mirror.skipped_requests += 1
+                return
+
+            self.mirror.mirror(
+                cast("ASGI3Application", self.shadow_app),
+                shadow_scope,
+                b"".join(chunks),
+                get_route_template(scope),
+                status if response_started else 500,
+                perf_counter() - start,
+            )
+
+        try:
+            await self.app(scope, wrapped_receive, wrapped_send)
+        except Exception:
+            # The server responds with a 500 error if the response wasn't started yet
+            mirror()
+            raise
+
+        if responded:
+            mirror()
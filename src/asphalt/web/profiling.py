@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import hmac
+import io
+import json
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from cProfile import Profile
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from pstats import Stats
+from secrets import token_hex
+from tempfile import gettempdir
+from time import time, time_ns
+from typing import TYPE_CHECKING
+
+from ._utils import get_client_host, get_header, send_response
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGISendCallable,
+        ASGISendEvent,
+        Scope,
+    )
+
+
+class RequestProfiler:
+    """
+    Profiles individual requests on demand.
+
+    A request is profiled only if it carries the trigger header, and either the header
+    value is a valid token (as created by :meth:`create_token`) or the request comes
+    from one of the allowed clients. Requests without the header are passed through with
+    a single header lookup as the only overhead.
+
+    Profiled requests are run under :mod:`cProfile`, and the resulting profiles are
+    saved in ``directory``, keeping only the ``max_profiles`` most recent ones. The ID
+    of the profile is returned to the client in the ``response_header`` response header,
+    and if ``path`` is set, the profiles can be retrieved as text from
+    ``<path>/<profile id>`` (and listed from ``path``), using the same trigger header
+    for authorization.
+
+    Only one request is profiled at a time, as the profiler captures everything running
+    in the event loop thread. Other requests running concurrently with a profiled
+    request will thus show up in its profile.
+
+    :param secret: the secret key used to sign and verify tokens
+    :param allowed_clients: IP addresses of clients allowed to trigger profiling without
+        a valid token
+    :param header: name of the request header that triggers profiling
+    :param response_header: name of the response header containing the profile ID
+    :param directory: the directory to save profiles in (defaults to
+        ``asphalt-web-profiles`` in the system temporary directory)
+    :param max_profiles: the maximum number of profiles to keep in ``directory``
+    :param path: if set, serve the saved profiles on this path
+    :param sort_by: the :class:`~pstats.Stats` sort key to use when rendering profiles
+    :raises ValueError: if neither ``secret`` nor ``allowed_clients`` is given
+    """
+
+    def __init__(
+        self,
+        *,
+        secret: str | None = None,
+        allowed_clients: Iterable[str] = (),
+        header: str = "x-profile",
+        response_header: str = "x-profile-id",
+        directory: str | Path | None = None,
+        max_profiles: int = 20,
+        path: str | None = None,
+        sort_by: str = "cumulative",
+    ) -> None:
+        self.secret = secret.encode() if secret is not None else None
+        self.allowed_clients = frozenset(allowed_clients)
+        if self.secret is None and not self.allowed_clients:
+            raise ValueError("either secret or allowed_clients must be specified")
+
+        self.header = header.lower()
+        self.response_header = response_header.lower()
+        self.directory = Path(directory or Path(gettempdir()) / "asphalt-web-profiles")
+        self.max_profiles = max_profiles
+        self.path = path.rstrip("/") if path else None
+        self.sort_by = sort_by
+        self._active = False
+
+        # Pick up the profiles saved by previous runs (the IDs sort chronologically)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._profile_ids = deque(sorted(file.stem for file in self.directory.glob("*.prof")))
+        self._prune()
+
+    def _sign(self, expires: int) -> str:
+        assert self.secret is not None
+        return hmac.new(self.secret, str(expires).encode(), sha256).hexdigest()
+
+    def create_token(self, ttl: float = 300) -> str:
+        """
+        Create a token that triggers profiling when sent in the trigger header.
+
+        :param ttl: number of seconds the token is valid for
+        :return: the token
+
+        """
+        if self.secret is None:
+            raise ValueError("no secret has been configured")
+
+        expires = int(time() + ttl)
+        return f"{expires}.{self._sign(expires)}"
+
+    def is_authorized(self, token: str, client: str | None) -> bool:
+        """
+        Check if a request carrying the trigger header may be profiled.
+
+        :param token: the value of the trigger header
+        :param client: the IP address of the client
+        :return: ``True`` if the request may be profiled, ``False`` if not
+
+        """
+        if client is not None and client in self.allowed_clients:
+            return True
+        elif self.secret is None:
+            return False
+
+        expires, _, signature = token.partition(".")
+        if not expires.isdigit() or int(expires) < time():
+            return False
+
+        return hmac.compare_digest(signature, self._sign(int(expires)))
+
+    @property
+    def profile_ids(self) -> list[str]:
+        """The IDs of the saved profiles, oldest first."""
+        return list(self._profile_ids)
+
+    @contextmanager
+    def profile(self) -> Iterator[str | None]:
+        """
+        Profile the code run within this context manager.
+
+        The profile is saved when the context manager exits.
+
+        :return: the ID of the profile, or ``None`` if another profile is already being
+            recorded
+
+        """
+        if self._active:
+            yield None
+            return
+
+        profile_id = f"{time_ns() // 1000}-{token_hex(4)}"
+        profiler = Profile()
+        self._active = True
+        profiler.enable()
+        try:
+            yield profile_id
+        finally:
+            profiler.disable()
+            self._active = False
+            profiler.dump_stats(self.directory / f"{profile_id}.prof")
+            self._profile_ids.append(profile_id)
+            self._prune()
+
+    def _prune(self) -> None:
+        while len(self._profile_ids) > self.max_profiles:
+            profile_id = self._profile_ids.popleft()
+            try:
+                os.remove(self.directory / f"{profile_id}.prof")
+            except FileNotFoundError:
+                pass
+
+    def render(self, profile_id: str, limit: int = 50) -> str | None:
+        """
+        Render a saved profile as text.
+
+        :param profile_id: the ID of the profile
+        :param limit: the maximum number of functions to include
+        :return: the rendered profile, or ``None`` if there is no such profile
+
+        """
+        if profile_id not in self._profile_ids:
+            return None
+
+        stream = io.StringIO()
+        stats = Stats(str(self.directory / f"{profile_id}.prof"), stream=stream)
+        stats.sort_stats(self.sort_by).print_stats(limit)
+        return stream.getvalue()
+
+
+@dataclass
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles HTTP requests using a :class:`RequestProfiler`.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param profiler: the request profiler to use
+    """
+
+    app: ASGI3Application
+    profiler: RequestProfiler
+
+    def __post_init__(self) -> None:
+        self._header = self.profiler.header.encode("latin-1")
+        self._response_header = self.profiler.response_header.encode("latin-1")
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = get_header(scope, self._header)
+        if token is None or not self.profiler.is_authorized(
+            token.decode("latin-1"), get_client_host(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        path = self.profiler.path
+        if path is not None and scope["path"] == path:
+            body = json.dumps(self.profiler.profile_ids).encode()
+            await send_response(send, 200, body, b"application/json")
+            return
+        elif path is not None and scope["path"].startswith(path + "/"):
+            text = self.profiler.render(scope["path"][len(path) + 1 :])
+            if text is None:
+                await send_response(send, 404, b"Not Found")
+            else:
+                await send_response(send, 200, text.encode())
+
+            return
+
+        with self.profiler.profile() as profile_id:
+            if profile_id is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def wrapped_send(event: ASGISendEvent) -> None:
+                if event["type"] == "http.response.start":
+                    headers = list(event.get("headers", ()))
+                    headers.append((self._response_header, profile_id.encode("ascii")))
+                    event = {**event, "headers": headers}
+
+                await send(event)
+
+            await self.app(scope, receive, wrapped_send)
@@ -0,0 +1,521 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+from base64 import b64decode, b64encode
+from collections.abc import Awaitable, Callable, Collection, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from random import random
+from time import perf_counter, time
+from typing import IO, TYPE_CHECKING, Any, NamedTuple, cast
+
+from ._utils import BatchingThread
+
+if TYPE_CHECKING:
+    from aiohttp.test_utils import TestClient
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGISendCallable,
+        ASGISendEvent,
+        Scope,
+    )
+
+logger = logging.getLogger(__name__)
+
+
+class RecordedRequest(NamedTuple):
+    """
+    An HTTP request, as recorded by a :class:`TrafficRecorder`.
+
+    :ivar float timestamp: the time the request was received (in seconds since the epoch)
+    :ivar str method: the HTTP method
+    :ivar str path: the request path
+    :ivar str query_string: the query string of the request (without the ``?``)
+    :ivar headers: the request headers (as lower case name, value pairs)
+    :vartype headers: list[tuple[str, str]]
+    :ivar body: the request body, or ``None`` if it was too large to record
+    :vartype body: bytes | None
+    :ivar int status: the status code of the original response
+    :ivar float duration: number of seconds it originally took to handle the request
+    """
+
+    timestamp: float
+    method: str
+    path: str
+    query_string: str
+    headers: list[tuple[str, str]]
+    body: bytes | None
+    status: int
+    duration: float
+
+
+def encode_request(request: RecordedRequest) -> str:
+    """Encode a recorded request as a line of JSON."""
+    data = request._asdict()
+    if request.body is not None:
+        data["body"] = b64encode(request.body).decode("ascii")
+
+    return json.dumps(data, separators=(",", ":"))
+
+
+def decode_request(line: str) -> RecordedRequest:
+    """Decode a recorded request from a line of JSON."""
+    data = json.loads(line)
+    if data["body"] is not None:
+        data["body"] = b64decode(data["body"])
+
+    data["headers"] = [(key, value) for key, value in data["headers"]]
+    return RecordedRequest(**data)
+
+
+def _open(path: str | Path, mode: str) -> IO[str]:
+    if str(path).endswith(".gz"):
+        return cast(IO[str], gzip.open(path, mode + "t", encoding="utf-8"))
+
+    return open(path, mode, encoding="utf-8")
+
+
+def load_recording(path: str | Path) -> Iterator[RecordedRequest]:
+    """
+    Read the requests recorded by a :class:`TrafficRecorder`.
+
+    :param path: path to the recording (read as gzip compressed if it ends with ``.gz``)
+
+    """
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield decode_request(line)
+
+
+class TrafficRecorder:
+    """
+    Records a sample of HTTP requests for replaying them later with :func:`replay`.
+
+    The method, path, query string, headers and body of each sampled request are
+    recorded, along with the time it was received, the response status code and how
+    long it took to handle. Requests are queued as they are, and a separate thread
+    encodes and appends them to the file in batches, every ``flush_interval`` seconds or
+    as soon as ``batch_size`` requests have been queued. If the queue is full, new
+    requests are dropped (and counted in :attr:`dropped_records`) instead of blocking
+    the event loop.
+
+    The file contains one JSON object per line, and is compressed with gzip if its name
+    ends with ``.gz``.
+
+    :param file: path to a file to append the recorded requests to
+    :param sample_rate: the fraction (0 to 1) of the requests to record
+    :param max_body_size: maximum size of a request body to record (in bytes); the
+        bodies of larger requests are left out
+    :param exclude_headers: names of request headers to leave out (case insensitive),
+        like those carrying credentials
+    :param batch_size: maximum number of requests to write at once
+    :param max_queue: maximum number of requests waiting to be written
+    :param flush_interval: maximum number of seconds between writes
+    :raises ValueError: if the sample rate is invalid
+    """
+
+    def __init__(
+        self,
+        *,
+        file: str | Path,
+        sample_rate: float = 1.0,
+        max_body_size: int = 65536,
+        exclude_headers: Collection[str] = ("authorization", "cookie", "proxy-authorization"),
+        batch_size: int = 512,
+        max_queue: int = 10000,
+        flush_interval: float = 1.0,
+    ) -> None:
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+
+        self.file = file
+        self.sample_rate = sample_rate
+        self.max_body_size = max_body_size
+        self.exclude_headers = frozenset(header.lower() for header in exclude_headers)
+        self._batcher: BatchingThread[RecordedRequest] = BatchingThread(
+            self._write_batch,
+            name="asphalt-web-recorder",
+            batch_size=batch_size,
+            max_queue=max_queue,
+            interval=flush_interval,
+        )
+
+    @property
+    def dropped_records(self) -> int:
+        """The number of requests dropped due to a full queue."""
+        return self._batcher.dropped
+
+    def sample(self) -> bool:
+        """Decide whether to record a new request."""
+        return self.sample_rate >= 1 or random() < self.sample_rate
+
+    def filter_headers(self, headers: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+        """
+        Return the given headers without the excluded ones.
+
+        :param headers: header name, value pairs (with the names in lower case)
+
+        """
+        return [(key, value) for key, value in headers if key not in self.exclude_headers]
+
+    def record(self, request: RecordedRequest) -> None:
+        """
+        Queue a request for writing.
+
+        :param request: the request to record
+
+        """
+        self._batcher.put(request)
+
+    def _write_batch(self, requests: list[RecordedRequest]) -> None:
+        try:
+            lines = [encode_request(request) + "\n" for request in requests]
+            with _open(self.file, "a") as f:
+                f.writelines(lines)
+        except Exception:
+            logger.exception("Error writing the traffic recording")
+
+    def flush(self) -> None:
+        """Write all the queued requests in the calling thread."""
+        self._batcher.flush()
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self._batcher.start()
+
+    def stop(self) -> None:
+        """Stop the writer thread, writing any remaining requests."""
+        self._batcher.stop()
+
+
+@dataclass
+class RecordingMiddleware:
+    """
+    ASGI middleware that records HTTP requests with a :class:`TrafficRecorder`.
+
+    The request body is recorded as the application reads it, so any part of the body
+    the application didn't read is not recorded.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param recorder: the traffic recorder to use
+    """
+
+    app: ASGI3Application
+    recorder: TrafficRecorder
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http" or not self.recorder.sample():
+            await self.app(scope, receive, send)
+            return
+
+        timestamp = time()
+        start = perf_counter()
+        status = 500
+        chunks: list[bytes] = []
+        body_size = 0
+        truncated = False
+
+        async def wrapped_receive() -> Any:
+            nonlocal body_size, truncated
+            event = await receive()
+            if event["type"] == "http.request" and not truncated:
+                body = event.get("body", b"")
+                body_size += len(body)
+                if body_size > self.recorder.max_body_size:
+                    truncated = True
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+
+            return event
+
+        async def wrapped_send(event: ASGISendEvent) -> None:
+            nonlocal status
+            if event["type"] == "http.response.start":
+                status = event["status"]
+
+            await send(event)
+
+        try:
+            await self.app(scope, wrapped_receive, wrapped_send)
+        finally:
+            headers = [
+                (key.decode("latin-1"), value.decode("latin-1")) for key, value in scope["headers"]
+            ]
+            self.recorder.record(
+                RecordedRequest(
+                    timestamp,
+                    scope["method"],
+                    scope["path"],
+                    scope["query_string"].decode("latin-1"),
+                    self.recorder.filter_headers(headers),
+                    None if truncated else b"".join(chunks),
+                    status,
+                    perf_counter() - start,
+                )
+            )
+
+
+#: A callable that sends a recorded request to an application and returns the response
+#: status code
+Sender = Callable[[RecordedRequest], Awaitable[int]]
+
+
+@dataclass
+class ReplayResult:
+    """
+    The results of replaying a recording.
+
+    :ivar latencies: the latencies of the replayed requests (in seconds), in ascending
+        order
+    :ivar original_latencies: the latencies of the same requests when they were
+        recorded (in seconds), in ascending order
+    :ivar errors: number of requests that raised an exception
+    :ivar status_mismatches: number of requests whose response status code differed
+        from the recorded one
+    :ivar skipped: number of requests not replayed because their bodies were not
+        recorded
+    :ivar elapsed: number of seconds the replay took
+    """
+
+    latencies: list[float]
+    original_latencies: list[float]
+    errors: int
+    status_mismatches: int
+    skipped: int
+    elapsed: float
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        """Requests per second."""
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the results as a JSON compatible dictionary."""
+        from .bench import percentile
+
+        return {
+            "requests": self.requests,
+            "throughput": self.throughput,
+            "errors": self.errors,
+            "status_mismatches": self.status_mismatches,
+            "skipped": self.skipped,
+            **{
+                key: {
+                    "p50": percentile(latencies, 50),
+                    "p90": percentile(latencies, 90),
+                    "p99": percentile(latencies, 99),
+                    "max": latencies[-1] if latencies else 0.0,
+                }
+                for key, latencies in [
+                    ("latency", self.latencies),
+                    ("original_latency", self.original_latencies),
+                ]
+            },
+        }
+
+
+def asgi_sender(app: ASGI3Application) -> Sender:
+    """
+    Create a sender that calls an ASGI application directly.
+
+    :param app: the ASGI application (like the one from
+        :meth:`~.asgi3.ASGIComponent.build_server_app`)
+
+    """
+
+    async def send_request(request: RecordedRequest) -> int:
+        status = 0
+        received = False
+        response_complete = asyncio.Event()
+
+        async def receive() -> Any:
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": request.body or b"", "more_body": False}
+
+            # Like a real server, only report the disconnection after the response
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(event: Any) -> None:
+            nonlocal status
+            if event["type"] == "http.response.start":
+                status = event["status"]
+            elif event["type"] == "http.response.body" and not event.get("more_body"):
+                response_complete.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": "http",
+            "path": request.path,
+            "raw_path": request.path.encode("utf-8"),
+            "root_path": "",
+            "query_string": request.query_string.encode("latin-1"),
+            "headers": [
+                (key.encode("latin-1"), value.encode("latin-1")) for key, value in request.headers
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+            "state": {},
+        }
+        await app(scope, receive, send)  # type: ignore[arg-type]
+        return status
+
+    return send_request
+
+
+def aiohttp_sender(client: TestClient) -> Sender:
+    """
+    Create a sender that sends requests through an aiohttp test client.
+
+    :param client: a started client (like the one from
+        :meth:`~.aiohttp.AIOHTTPComponent.create_client`)
+
+    """
+    # The client sets these itself
+    skip_headers = {"host", "content-length", "transfer-encoding"}
+
+    async def send_request(request: RecordedRequest) -> int:
+        target = f"{request.path}?{request.query_string}" if request.query_string else request.path
+        headers = [(key, value) for key, value in request.headers if key not in skip_headers]
+        async with client.request(
+            request.method, target, headers=headers, data=request.body or None
+        ) as response:
+            await response.read()
+            return response.status
+
+    return send_request
+
+
+async def replay(
+    send: Sender,
+    requests: Iterable[RecordedRequest],
+    *,
+    speed: float | None = None,
+    concurrency: int = 1,
+) -> ReplayResult:
+    """
+    Replay recorded requests.
+
+    With ``speed=None``, the requests are sent as fast as possible, in their original
+    order, with up to ``concurrency`` requests in flight at once. Otherwise, each
+    request is sent at the same time (relative to the first one) as it was originally
+    received, divided by ``speed``, regardless of how many are still in flight.
+
+    :param send: the callable that sends a request to the application
+    :param requests: the recorded requests
+    :param speed: the speed to replay the requests at, relative to the original timing
+        (``None`` = as fast as possible)
+    :param concurrency: number of requests in flight at once, when replaying as fast as
+        possible
+    :raises ValueError: if ``speed`` or ``concurrency`` is not positive
+
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError("speed must be positive")
+    if concurrency < 1:
+        raise ValueError("concurrency must be positive")
+
+    latencies: list[float] = []
+    original_latencies: list[float] = []
+    errors = status_mismatches = skipped = 0
+
+    async def send_one(request: RecordedRequest) -> None:
+        nonlocal errors, status_mismatches
+        start = perf_counter()
+        try:
+            status = await send(request)
+        except Exception:
+            logger.exception("Error replaying %s %s", request.method, request.path)
+            errors += 1
+            return
+
+        latencies.append(perf_counter() - start)
+        original_latencies.append(request.duration)
+        if status != request.status:
+            status_mismatches += 1
+
+    def replayable() -> Iterator[RecordedRequest]:
+        nonlocal skipped
+        for request in requests:
+            if request.body is None:
+                skipped += 1
+            else:
+                yield request
+
+    start = perf_counter()
+    if speed is None:
+        iterator = replayable()
+
+        async def worker() -> None:
+            for request in iterator:
+                await send_one(request)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        tasks: list[asyncio.Task[None]] = []
+        first_timestamp: float | None = None
+        for request in replayable():
+            if first_timestamp is None:
+                first_timestamp = request.timestamp
+
+            delay = (request.timestamp - first_timestamp) / speed - (perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            tasks.append(asyncio.create_task(send_one(request)))
+
+        await asyncio.gather(*tasks)
+
+    elapsed = perf_counter() - start
+    latencies.sort()
+    original_latencies.sort()
+    return ReplayResult(latencies, original_latencies, errors, status_mismatches, skipped, elapsed)
+
+
+async def replay_into(
+    component: Any,
+    requests: Iterable[RecordedRequest],
+    *,
+    speed: float | None = None,
+    concurrency: int = 1,
+) -> ReplayResult:
+    """
+    Replay recorded requests into a started web component.
+
+    With an ASGI based component, the requests are passed directly to the application
+    (as given to the server). With :class:`~.aiohttp.AIOHTTPComponent`, they're sent
+    through its test client, over the loopback interface. Either way, the component can
+    (and should) be started with ``listen=False``.
+
+    :param component: an :class:`~.asgi3.ASGIComponent` or
+        :class:`~.aiohttp.AIOHTTPComponent`
+    :param requests: the recorded requests
+    :param speed: see :func:`replay`
+    :param concurrency: see :func:`replay`
+
+    """
+    build_server_app = getattr(component, "build_server_app", None)
+    if build_server_app is not None:
+        sender = asgi_sender(build_server_app())
+        return await replay(sender, requests, speed=speed, concurrency=concurrency)
+
+    async with component.create_client() as client:
+        sender = aiohttp_sender(client)
+        return await replay(sender, requests, speed=speed, concurrency=concurrency)
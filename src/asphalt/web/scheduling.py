@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+from asyncio import CancelledError, Future, get_running_loop
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from ._utils import get_client_host, get_header, send_response
+
+if TYPE_CHECKING:
+    from asgiref.typing import ASGI3Application, ASGIReceiveCallable, ASGISendCallable, Scope
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a request cannot be queued because its class queue is full."""
+
+    def __init__(self, request_class: str) -> None:
+        super().__init__(f"the queue for request class {request_class!r} is full")
+        self.request_class = request_class
+
+
+@dataclass
+class ClassStats:
+    """
+    Statistics for a single request class.
+
+    :ivar weight: the relative share of handler slots this class is entitled to
+    :ivar queued: number of requests currently waiting for admission
+    :ivar active: number of requests currently being handled
+    :ivar admitted: total number of requests admitted to the handler
+    :ivar rejected: total number of requests rejected due to a full queue
+    :ivar total_wait: cumulative time (in seconds) admitted requests spent queued
+    :ivar max_wait: longest time (in seconds) a single request spent queued
+    """
+
+    weight: float
+    queued: int = 0
+    active: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        """The average time (in seconds) admitted requests spent queued."""
+        return self.total_wait / self.admitted if self.admitted else 0.0
+
+
+@dataclass
+class _ClassState:
+    stats: ClassStats
+    last_finish: float = 0.0
+
+
+class FairScheduler:
+    """
+    Admits requests to the handler using weighted fair queuing between request classes.
+
+    At most ``max_concurrency`` requests are handled at once. Requests arriving when all
+    slots are taken are queued per class, and as slots free up, they are handed out to
+    the queued request with the lowest virtual finish time. Over time, this gives each
+    busy class a share of the slots proportional to its weight, regardless of how many
+    requests the other classes are sending.
+
+    Requests are classified by one of the following keys:
+
+    * ``path``: the first matching path prefix in ``prefixes`` (prefix ⭢ class name)
+    * ``header``: the value of the request header named by ``header``
+    * ``client``: the IP address of the client
+
+    Requests that don't match anything (or would create more than ``max_classes``
+    classes) are placed in ``default_class``.
+
+    :param max_concurrency: maximum number of requests handled concurrently
+    :param key: the key to classify requests by (``path``, ``header`` or ``client``)
+    :param header: name of the header to classify requests by (when ``key`` is
+        ``header``)
+    :param prefixes: dictionary of path prefix ⭢ class name (when ``key`` is ``path``)
+    :param weights: dictionary of class name ⭢ weight
+    :param default_weight: weight for classes not listed in ``weights``
+    :param default_class: name of the class for requests that could not be classified
+    :param max_queue_depth: maximum number of queued requests per class (requests
+        exceeding this are rejected with a 503 response)
+    :param max_classes: maximum number of distinct request classes to track
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 100,
+        key: str = "path",
+        header: str = "x-tenant-id",
+        prefixes: dict[str, str] | None = None,
+        weights: dict[str, float] | None = None,
+        default_weight: float = 1.0,
+        default_class: str = "default",
+        max_queue_depth: int | None = None,
+        max_classes: int = 1000,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if key not in ("path", "header", "client"):
+            raise ValueError(f"key must be one of 'path', 'header' or 'client', not {key!r}")
+        if default_weight <= 0 or any(weight <= 0 for weight in (weights or {}).values()):
+            raise ValueError("weights must be positive")
+
+        self.max_concurrency = max_concurrency
+        self.key = key
+        self.header = header.lower()
+        self.prefixes = sorted((prefixes or {}).items(), key=lambda item: -len(item[0]))
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self.default_class = default_class
+        self.max_queue_depth = max_queue_depth
+        self.max_classes = max_classes
+        self._classes: dict[str, _ClassState] = {}
+        self._queue: list[tuple[float, int, float, str, Future[None]]] = []
+        self._sequence = count()
+        self._virtual_time = 0.0
+        self._active = 0
+
+    @property
+    def stats(self) -> dict[str, ClassStats]:
+        """A dictionary of class name ⭢ statistics for every class seen so far."""
+        return {name: state.stats for name, state in self._classes.items()}
+
+    def classify(self, path: str, header_value: str | None, client: str | None) -> str:
+        """
+        Determine the request class for a request.
+
+        :param path: the request path
+        :param header_value: value of the classification header, if present
+        :param client: the client's IP address, if known
+        :return: the name of the request class
+
+        """
+        value: str | None
+        if self.key == "path":
+            value = next((name for prefix, name in self.prefixes if path.startswith(prefix)), None)
+        elif self.key == "header":
+            value = header_value
+        else:
+            value = client
+
+        if not value or (value not in self._classes and len(self._classes) >= self.max_classes):
+            return self.default_class
+
+        return value
+
+    def _get_class(self, name: str) -> _ClassState:
+        state = self._classes.get(name)
+        if state is None:
+            weight = self.weights.get(name, self.default_weight)
+            state = self._classes[name] = _ClassState(ClassStats(weight))
+
+        return state
+
+    def _release(self) -> None:
+        self._active -= 1
+        while self._queue and self._active < self.max_concurrency:
+            _finish, _seq, start, name, future = heappop(self._queue)
+            if not future.done():
+                self._virtual_time = start
+                self._active += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, request_class: str) -> AsyncIterator[None]:
+        """
+        Wait until a request of the given class may be handled.
+
+        Use this as an async context manager around the request handler.
+
+        :param request_class: name of the request class (see :meth:`classify`)
+        :raises SchedulerOverloaded: if the class queue is already full
+
+        """
+        state = self._get_class(request_class)
+        stats = state.stats
+        must_wait = self._active >= self.max_concurrency or bool(self._queue)
+        if must_wait and self.max_queue_depth is not None:
+            if stats.queued >= self.max_queue_depth:
+                stats.rejected += 1
+                raise SchedulerOverloaded(request_class)
+
+        start_tag = max(self._virtual_time, state.last_finish)
+        state.last_finish = start_tag + 1 / stats.weight
+        if not must_wait:
+            self._virtual_time = start_tag
+            self._active += 1
+            wait = 0.0
+        else:
+            future: Future[None] = get_running_loop().create_future()
+            heappush(
+                self._queue,
+                (state.last_finish, next(self._sequence), start_tag, request_class, future),
+            )
+            stats.queued += 1
+            enqueued_at = monotonic()
+            try:
+                await future
+            except CancelledError:
+                # If a slot was already handed to us, pass it on
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    future.cancel()
+
+                raise
+            finally:
+                stats.queued -= 1
+
+            wait = monotonic() - enqueued_at
+
+        stats.admitted += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.active += 1
+        try:
+            yield
+        finally:
+            stats.active -= 1
+            self._release()
+
+
+@dataclass
+class SchedulingMiddleware:
+    """
+    ASGI middleware that admits HTTP requests to the application via a
+    :class:`FairScheduler`.
+
+    Requests rejected by the scheduler receive a 503 response. Websocket connections and
+    other scope types are passed through without scheduling.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param scheduler: the scheduler to use
+    """
+
+    app: ASGI3Application
+    scheduler: FairScheduler = field(default_factory=FairScheduler)
+
+    def __post_init__(self) -> None:
+        self._header = self.scheduler.header.encode("latin-1")
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header_value = get_header(scope, self._header)
+        request_class = self.scheduler.classify(
+            scope["path"],
+            header_value.decode("latin-1") if header_value is not None else None,
+            get_client_host(scope),
+        )
+        try:
+            async with self.scheduler.admit(request_class):
+                await self.app(scope, receive, send)
+        except SchedulerOverloaded:
+            await send_response(send, 503, b"Service Unavailable")
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from collections.abc import Callable, Sequence
+from functools import partial
 from typing import Any
 
 from asgiref.typing import ASGI3Application, HTTPScope, WebSocketScope
@@ -42,6 +43,8 @@ class StarletteComponent(ASGIComponent[Starlette]):
         ignored if an application object is explicitly passed in)
     :param middlewares: list of callables or dicts to be added as middleware using
         :meth:`add_middleware`
+    :param kwargs: further keyword arguments passed to
+        :class:`~asphalt.web.asgi3.ASGIComponent`
     """
 
     def __init__(
@@ -53,6 +56,7 @@ class StarletteComponent(ASGIComponent[Starlette]):
         port: int = 8000,
         debug: bool | None = None,
         middlewares: Sequence[Callable[..., ASGI3Application] | dict[str, Any]] = (),
+        **kwargs: Any,
     ) -> None:
         debug = debug if isinstance(debug, bool) else __debug__
         super().__init__(
@@ -61,6 +65,7 @@ class StarletteComponent(ASGIComponent[Starlette]):
             host=host,
             port=port,
             middlewares=middlewares,
+            **kwargs,
         )
 
     def setup_asphalt_middleware(self, app: Starlette) -> ASGI3Application:
@@ -86,8 +91,13 @@ class StarletteComponent(ASGIComponent[Starlette]):
             if not callable(type_):
                 raise TypeError(f"Middleware ({type_}) is not callable")
 
-            self.app.add_middleware(type_, **middleware)
+            factory: Callable[..., ASGI3Application] = partial(type_, **middleware)
         elif callable(middleware):
-            self.app.add_middleware(middleware)
+            factory = middleware
         else:
             raise TypeError(f"middleware must be either a callable or a dict, not {middleware!r}")
+
+        if self.layer_timing:
+            factory = self.layer_timing.wrap_factory(factory)
+
+        self.app.add_middleware(factory)
@@ -0,0 +1,445 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from pathlib import Path
+from random import getrandbits, random
+from time import time_ns
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, TypeVar
+
+from asphalt.core import Context, callable_name, current_context, resolve_reference
+
+from ._utils import BatchingThread, get_header, get_route_template
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGISendCallable,
+        ASGISendEvent,
+        Scope,
+    )
+
+logger = logging.getLogger(__name__)
+
+T_Retval = TypeVar("T_Retval")
+SpanExporter = Callable[[List[Dict[str, Any]]], None]
+
+traceparent_re = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+_current_span: ContextVar[Span | None] = ContextVar("_current_span", default=None)
+_request_span: ContextVar[Span | None] = ContextVar("_request_span", default=None)
+
+
+class Span:
+    """
+    A timed operation within a trace.
+
+    The span of the request being handled is available as a resource in the request
+    context when tracing is enabled and the request was sampled.
+
+    :ivar str trace_id: the trace ID (32 hexadecimal digits)
+    :ivar str span_id: the span ID (16 hexadecimal digits)
+    :ivar parent_id: the ID of the parent span, if any
+    :vartype parent_id: str | None
+    :ivar str name: the name of the span
+    :ivar dict[str, Any] attributes: attributes of the span
+    :ivar int start_time: the start time of the span (in nanoseconds since the epoch)
+    :ivar end_time: the end time of the span (in nanoseconds since the epoch), or
+        ``None`` if the span has not ended yet
+    :vartype end_time: int | None
+    :ivar bool error: ``True`` if the operation failed
+    """
+
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "attributes",
+        "start_time",
+        "end_time",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = f"{getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes if attributes is not None else {}
+        self.start_time = time_ns()
+        self.end_time: int | None = None
+        self.error = False
+
+    @property
+    def traceparent(self) -> str:
+        """The span as a W3C ``traceparent`` header value."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name!r}, span_id={self.span_id!r})"
+
+
+def current_span() -> Span | None:
+    """Return the currently active span, or ``None`` if there is none."""
+    return _current_span.get()
+
+
+def add_request_span(ctx: Context) -> Span | None:
+    """
+    Add the root span of the request being handled as a resource to the given context.
+
+    The root span is started before the request context exists, so the web components
+    call this from within the request context.
+
+    :param ctx: the request context
+    :return: the span, or ``None`` if the request is not being traced
+
+    """
+    span = _request_span.get()
+    if span is not None:
+        ctx.add_resource(span)
+
+    return span
+
+
+def parse_traceparent(value: str) -> tuple[str, str, bool] | None:
+    """
+    Parse a W3C ``traceparent`` header value.
+
+    :param value: the header value
+    :return: a tuple of (trace ID, parent span ID, sampled flag), or ``None`` if the
+        value could not be parsed
+
+    """
+    match = traceparent_re.fullmatch(value.strip())
+    if match is None:
+        return None
+
+    trace_id, parent_id, flags = match.groups()
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def file_exporter(path: str | Path) -> SpanExporter:
+    """
+    Create a span exporter that appends spans to a file, one JSON object per line.
+
+    :param path: path to the file
+
+    """
+
+    def export(spans: list[dict[str, Any]]) -> None:
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span) + "\n" for span in spans)
+
+    return export
+
+
+class Tracer:
+    """
+    Records request spans and exports them in batches.
+
+    Requests are sampled at the head: if the request carries a ``traceparent`` header,
+    its sampling decision is followed, and otherwise ``sample_rate`` of the requests are
+    sampled. Unsampled requests don't create any spans.
+
+    Finished spans are added to a bounded in-memory buffer, which is exported in batches
+    by a separate thread every ``export_interval`` seconds, or as soon as ``batch_size``
+    spans have accumulated. If the buffer is full, new spans are dropped (and counted in
+    :attr:`dropped_spans`).
+
+    :param sample_rate: the fraction (0 to 1) of requests to sample when the client did
+        not make the sampling decision
+    :param file: path to a file to append the spans to, one JSON object per line
+    :param exporter: a callable (or a module:varname reference to one) that receives
+        lists of finished spans (as dictionaries), called from the export thread
+    :param batch_size: maximum number of spans to export at once
+    :param max_buffer: maximum number of finished spans waiting for export
+    :param export_interval: maximum number of seconds between exports
+    :raises ValueError: if neither ``file`` nor ``exporter`` is given
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_rate: float = 1.0,
+        file: str | Path | None = None,
+        exporter: SpanExporter | str | None = None,
+        batch_size: int = 512,
+        max_buffer: int = 10000,
+        export_interval: float = 5.0,
+    ) -> None:
+        if exporter is not None:
+            self.exporter: SpanExporter = resolve_reference(exporter)
+        elif file is not None:
+            self.exporter = file_exporter(file)
+        else:
+            raise ValueError("either file or exporter must be specified")
+
+        self.sample_rate = sample_rate
+        self._batcher: BatchingThread[Span] = BatchingThread(
+            self._export_batch,
+            name="asphalt-web-tracer",
+            batch_size=batch_size,
+            max_queue=max_buffer,
+            interval=export_interval,
+        )
+
+    def start_trace(
+        self, name: str, traceparent: str | None = None, attributes: dict[str, Any] | None = None
+    ) -> Span | None:
+        """
+        Start the root span of a request, if the request is sampled.
+
+        The span does not become the active span by calling this method.
+
+        :param name: the name of the span
+        :param traceparent: the value of the ``traceparent`` request header, if any
+        :param attributes: attributes of the span
+        :return: the span, or ``None`` if the request was not sampled
+
+        """
+        parsed = parse_traceparent(traceparent) if traceparent is not None else None
+        if parsed is not None:
+            trace_id, parent_id, sampled = parsed
+            if not sampled:
+                return None
+
+            return Span(name, trace_id, parent_id, attributes)
+        elif self.sample_rate >= 1 or random() < self.sample_rate:
+            return Span(name, f"{getrandbits(128):032x}", None, attributes)
+
+        return None
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """
+        Make the given span the active one, ending it when the context manager exits.
+
+        The span also becomes the root span of the request, to be added to the request
+        context with :func:`add_request_span`.
+
+        :param span: the span to activate
+
+        """
+        token = _current_span.set(span)
+        request_token = _request_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            _request_span.reset(request_token)
+            _current_span.reset(token)
+            self.finish(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        """
+        Record a child span of the active span.
+
+        If there is no active span (because tracing is not enabled or the request was not
+        sampled), no span is recorded.
+
+        :param name: the name of the span
+        :param attributes: attributes of the span
+        :return: the new span, or ``None`` if there was no active span
+
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def traced(
+        self, name: str | None = None
+    ) -> Callable[[Callable[..., T_Retval]], Callable[..., T_Retval]]:
+        """
+        Decorate a function to record its calls as child spans of the active span.
+
+        This is mostly useful for resource factories, to record the time spent acquiring
+        resources. For coroutine functions, use :meth:`span` instead.
+
+        :param name: the name of the spans (defaults to the qualified name of the
+            function)
+
+        """
+
+        def decorator(func: Callable[..., T_Retval]) -> Callable[..., T_Retval]:
+            span_name = name or callable_name(func)
+
+            @wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> T_Retval:
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @property
+    def dropped_spans(self) -> int:
+        """The number of spans dropped due to a full buffer."""
+        return self._batcher.dropped
+
+    def finish(self, span: Span) -> None:
+        """
+        End the given span and queue it for export.
+
+        :param span: the span to finish
+
+        """
+        span.end_time = time_ns()
+        self._batcher.put(span)
+
+    def _export_batch(self, spans: list[Span]) -> None:
+        try:
+            self.exporter([span.as_dict() for span in spans])
+        except Exception:
+            logger.exception("Error exporting spans")
+
+    def export(self) -> None:
+        """Export all the buffered spans."""
+        self._batcher.flush()
+
+    def start(self) -> None:
+        """Start the export thread."""
+        self._batcher.start()
+
+    def stop(self) -> None:
+        """Stop the export thread, exporting any remaining spans."""
+        self._batcher.stop()
+
+
+@dataclass
+class TracingMiddleware:
+    """
+    ASGI middleware that records a span for each sampled HTTP request or websocket
+    connection.
+
+    While the request is being handled, the span is the active span, and is available
+    as a :class:`Span` resource.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param tracer: the tracer to use
+    """
+
+    app: ASGI3Application
+    tracer: Tracer
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = get_header(scope, b"traceparent")
+        span = self.tracer.start_trace(
+            scope["type"],
+            traceparent.decode("latin-1") if traceparent is not None else None,
+            {"http.target": scope["path"]},
+        )
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["type"] == "http":
+            span.attributes["http.method"] = scope["method"]
+
+        async def wrapped_send(event: ASGISendEvent) -> None:
+            if event["type"] == "http.response.start":
+                span.attributes["http.status_code"] = event["status"]
+
+            await send(event)
+
+        with self.tracer.activate(span):
+            try:
+                await self.app(scope, receive, wrapped_send)
+            finally:
+                route = get_route_template(scope)
+                if route is not None:
+                    span.attributes["http.route"] = route
+
+
+@dataclass
+class SpanMiddleware:
+    """
+    ASGI middleware that records a child span of the active span around the wrapped
+    application.
+
+    This also adds the root span of the request to the request context, so it must be
+    placed inside the middleware that creates the request contexts. If there is no
+    request context, the span is added to a new context instead.
+
+    :param asgiref.typing.ASGI3Application app: an ASGI 3.0 application
+    :param tracer: the tracer to use
+    :param name: the name of the span
+    """
+
+    app: ASGI3Application
+    tracer: Tracer
+    name: str = "application"
+
+    def __post_init__(self) -> None:
+        # Imported here, as the aiohttp integration uses this module without asgiref
+        from asgiref.typing import HTTPScope, WebSocketScope
+
+        self._scope_types = (HTTPScope, WebSocketScope)
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if _request_span.get() is None:
+            await self.app(scope, receive, send)
+            return
+
+        ctx = current_context()
+        if all(ctx.get_resource(scope_type) is None for scope_type in self._scope_types):
+            # Not within a request context (as with Django), so the span needs a context
+            # of its own
+            async with Context() as ctx:
+                add_request_span(ctx)
+                with self.tracer.span(self.name):
+                    await self.app(scope, receive, send)
+        else:
+            add_request_span(ctx)
+            with self.tracer.span(self.name):
+                await self.app(scope, receive, send)
@@ -19,4 +19,9 @@ from django.urls import path
 
 from . import views
 
-urlpatterns = [path("admin/", admin.site.urls), path("", views.index)]
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("", views.index),
+    path("injected", views.injected),
+    path("traced", views.traced),
+]
@@ -1,6 +1,9 @@
-from asphalt.core import inject, resource
+from asphalt.core import current_context, inject, resource
 from django.http import HttpRequest, HttpResponse, JsonResponse
 
+from asphalt.web.injection import inject_resources
+from asphalt.web.tracing import Span
+
 
 @inject
 async def index(
@@ -15,3 +18,13 @@ async def index(
             "another resource": another_resource,
         }
     )
+
+
+@inject_resources
+async def injected(request: HttpRequest, my_resource: str = resource()) -> HttpResponse:
+    return HttpResponse(f"Hello {my_resource}")
+
+
+async def traced(request: HttpRequest) -> HttpResponse:
+    span = current_context().require_resource(Span)
+    return HttpResponse(span.trace_id)
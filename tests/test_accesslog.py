@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context
+from httpx import AsyncClient
+
+from asphalt.web._utils import send_response
+from asphalt.web.accesslog import AccessLogger, AccessLogRecord, format_text
+from asphalt.web.asgi3 import ASGIComponent
+
+record = AccessLogRecord(
+    1700000000.0, "127.0.0.1", "GET", "/items", "page=2", None, 200, 5, 0.0015, "curl/8.0"
+)
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    await send_response(send, 200, b"Hello")
+
+
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [
+        pytest.param(
+            {"format": "xml"}, "format must be one of json, text, not 'xml'", id="format"
+        ),
+        pytest.param({"sample_rate": -1}, "sample_rate must be between 0 and 1", id="sample_rate"),
+    ],
+)
+def test_bad_arguments(kwargs: dict, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        AccessLogger(**kwargs)
+
+
+def test_format_text() -> None:
+    assert format_text(record) == '127.0.0.1 "GET /items?page=2" 200 5 0.001500'
+
+
+def test_full_queue(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO, "asphalt.web.accesslog")
+    access_logger = AccessLogger(max_queue=2)
+    for _ in range(3):
+        access_logger.log(record)
+
+    assert access_logger.dropped_records == 1
+    access_logger.flush()
+    assert [json.loads(message)["path"] for message in caplog.messages] == ["/items", "/items"]
+
+
+def test_sampling() -> None:
+    assert not AccessLogger(sample_rate=0).sample()
+    assert AccessLogger(sample_rate=1).sample()
+
+
+@pytest.mark.asyncio
+async def test_asgi_component(unused_tcp_port: int, tmp_path: Path) -> None:
+    log_file = tmp_path / "access.log"
+    component = ASGIComponent(
+        app=application, port=unused_tcp_port, access_log={"file": str(log_file)}
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        assert ctx.require_resource(AccessLogger) is component.access_logger
+        for _ in range(2):
+            response = await http.get(
+                f"http://127.0.0.1:{unused_tcp_port}/hello",
+                params={"foo": "bar"},
+                headers={"User-Agent": "test"},
+            )
+            assert response.text == "Hello"
+
+    # The records are written when the server shuts down at the latest
+    records = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert len(records) == 2
+    assert records[0]["client"] == "127.0.0.1"
+    assert records[0]["method"] == "GET"
+    assert records[0]["path"] == "/hello"
+    assert records[0]["query_string"] == "foo=bar"
+    assert records[0]["status"] == 200
+    assert records[0]["size"] == 5
+    assert records[0]["user_agent"] == "test"
+    assert records[0]["duration"] > 0
+
+
+@pytest.mark.asyncio
+async def test_body_less_event(tmp_path: Path) -> None:
+    async def streaming_application(
+        scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"Hello", "more_body": True})
+        # "body" is optional in the ASGI spec, defaulting to b""
+        await send({"type": "http.response.body"})  # type: ignore[typeddict-item]
+
+    log_file = tmp_path / "access.log"
+    component = ASGIComponent(
+        app=streaming_application, listen=False, access_log={"file": str(log_file)}
+    )
+    async with Context() as ctx:
+        await component.start(ctx)
+        async with component.create_client() as http:
+            response = await http.get("/")
+            assert response.text == "Hello"
+
+    records = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [(record["status"], record["size"]) for record in records] == [(200, 5)]
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import tracemalloc
+from asyncio import CancelledError, create_task, sleep
+from time import thread_time
+
+import pytest
+from asphalt.core import Context
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette.responses import PlainTextResponse, Response
+
+from asphalt.web.accounting import RequestUsage, UsageTracker
+from asphalt.web.fastapi import FastAPIComponent
+
+
+def burn_cpu(seconds: float) -> None:
+    deadline = thread_time() + seconds
+    while thread_time() < deadline:
+        pass
+
+
+async def busy(seconds: float, steps: int = 2) -> str:
+    for _ in range(steps):
+        burn_cpu(seconds / steps)
+        await sleep(0.01)
+
+    return "done"
+
+
+def test_bad_sample_rate() -> None:
+    with pytest.raises(ValueError, match="memory_sample_rate must be between 0 and 1"):
+        UsageTracker(memory_sample_rate=1.5)
+
+
+@pytest.mark.asyncio
+async def test_cpu_time() -> None:
+    tracker = UsageTracker()
+    usage = tracker.new_usage()
+    assert usage.net_memory_growth is None
+
+    # CPU time used by other tasks while the request is waiting must not be counted
+    other_task = create_task(busy(0.1))
+    assert await tracker.measure(busy(0.05), usage) == "done"
+    await other_task
+    assert 0.05 <= usage.cpu_time < 0.1
+
+
+@pytest.mark.asyncio
+async def test_cancel() -> None:
+    tracker = UsageTracker()
+    usage = RequestUsage()
+    task = create_task(tracker.measure(busy(1, steps=100), usage))
+    await sleep(0.05)
+    task.cancel()
+    with pytest.raises(CancelledError):
+        await task
+
+    assert 0 < usage.cpu_time < 1
+
+
+@pytest.mark.asyncio
+async def test_net_memory_growth() -> None:
+    async def allocate() -> list[bytes]:
+        await sleep(0)
+        return [bytes(100_000)]
+
+    tracker = UsageTracker(memory_sample_rate=1)
+    usage = tracker.new_usage()
+    await tracker.measure(allocate(), usage)
+    assert usage.net_memory_growth is not None
+    assert usage.net_memory_growth >= 100_000
+    assert not tracemalloc.is_tracing()
+
+    tracker.record("/", "GET", usage)
+    tracker.record("/", "GET", RequestUsage())
+    route_usage = tracker.routes[("/", "GET")]
+    assert route_usage.requests == 2
+    assert route_usage.sampled_requests == 1
+    assert route_usage.mean_net_memory_growth == usage.net_memory_growth
+
+
+@pytest.mark.asyncio
+async def test_fastapi(unused_tcp_port: int) -> None:
+    async def item(item_id: int) -> Response:
+        await busy(0.05)
+        return PlainTextResponse(f"Item {item_id}")
+
+    application = FastAPI()
+    application.add_api_route("/items/{item_id}", item)
+    component = FastAPIComponent(
+        app=application,
+        port=unused_tcp_port,
+        metrics={"path": "/metrics"},
+        accounting={},
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        tracker = ctx.require_resource(UsageTracker)
+        for item_id in (1, 2):
+            response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/items/{item_id}")
+            assert response.text == f"Item {item_id}"
+
+        route_usage = tracker.routes[("/items/{item_id}", "GET")]
+        assert route_usage.requests == 2
+        assert route_usage.mean_cpu_time >= 0.05
+        assert route_usage.max_cpu_time >= 0.05
+        assert route_usage.sampled_requests == 0
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/metrics")
+        assert (
+            f'http_request_cpu_seconds_total{{route="/items/{{item_id}}",method="GET"}} '
+            f"{route_usage.cpu_time}" in response.text
+        )
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import json
+import time
+from asyncio import sleep
 
 import pytest
 import websockets
-from asphalt.core import Component, Context, inject, require_resource, resource
+from asphalt.core import Component, Context, current_context, inject, require_resource, resource
 from httpx import AsyncClient
 
 try:
@@ -14,7 +16,17 @@ try:
     from aiohttp.web_response import Response, json_response
     from aiohttp.web_ws import WebSocketResponse
 
+    from asphalt.web.accesslog import AccessLogger
+    from asphalt.web.accounting import UsageTracker
     from asphalt.web.aiohttp import AIOHTTPComponent
+    from asphalt.web.deadline import Deadline
+    from asphalt.web.health import HealthChecker
+    from asphalt.web.loopmonitor import LoopMonitor
+    from asphalt.web.metrics import MetricsCollector
+    from asphalt.web.profiling import RequestProfiler
+    from asphalt.web.recording import TrafficRecorder, load_recording, replay_into
+    from asphalt.web.scheduling import FairScheduler
+    from asphalt.web.tracing import Span
 except ModuleNotFoundError:
     pytestmark = pytest.mark.skip("aiohttp not available")
 
@@ -177,6 +189,299 @@ async def test_middleware(unused_tcp_port: int, method: str):
         assert response.text == "Hello Middleware"
 
 
+@pytest.mark.asyncio
+async def test_scheduling(unused_tcp_port: int):
+    async def root(request: Request) -> Response:
+        return Response(text="Hello World")
+
+    application = Application()
+    application.router.add_route("GET", "/api/items", root)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application,
+            port=unused_tcp_port,
+            scheduling={"prefixes": {"/api": "api"}},
+        ).start(ctx)
+        scheduler = ctx.require_resource(FairScheduler)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/api/items")
+        response.raise_for_status()
+        assert response.text == "Hello World"
+        assert scheduler.stats["api"].admitted == 1
+
+
+@pytest.mark.asyncio
+async def test_deadlines(unused_tcp_port: int):
+    async def root(request: Request) -> Response:
+        deadline = require_resource(Deadline)
+        if request.path == "/slow":
+            await sleep(5)
+
+        # The deadline is added to the request context rather than a context of its own
+        in_request_context = current_context().parent.get_resource(Request) is None
+        return json_response(
+            {"remaining": deadline.remaining, "in_request_context": in_request_context}
+        )
+
+    application = Application()
+    application.router.add_route("GET", "/", root)
+    application.router.add_route("GET", "/slow", root)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application, port=unused_tcp_port, deadlines={"timeout": 10}
+        ).start(ctx)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}")
+        response.raise_for_status()
+        assert 9 < response.json()["remaining"] <= 10
+        assert response.json()["in_request_context"]
+
+        response = await http.get(
+            f"http://127.0.0.1:{unused_tcp_port}/slow", headers={"X-Request-Deadline": "0.1"}
+        )
+        assert response.status_code == 504
+
+
+@pytest.mark.asyncio
+async def test_health(unused_tcp_port: int):
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(port=unused_tcp_port, health={"readiness_path": "/ready"}).start(
+            ctx
+        )
+        checker = ctx.require_resource(HealthChecker)
+        assert checker.ready
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/livez")
+        assert response.status_code == 200
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok", "checks": {}}
+
+        checker.add_check("false", lambda: False)
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/ready")
+        assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_metrics(unused_tcp_port: int):
+    async def item(request: Request) -> Response:
+        return Response(text=f"Item {request.match_info['item_id']}")
+
+    application = Application()
+    application.router.add_route("GET", "/items/{item_id}", item)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application, port=unused_tcp_port, metrics={"path": "/metrics"}
+        ).start(ctx)
+        collector = ctx.require_resource(MetricsCollector)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/items/1")
+        response.raise_for_status()
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/nonexistent")
+        assert response.status_code == 404
+        assert collector.latencies[("/items/{item_id}", "GET", 200)].count == 1
+        assert collector.latencies[("<unmatched>", "GET", 404)].count == 1
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/metrics")
+        response.raise_for_status()
+        assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+        assert (
+            'http_requests_total{route="/items/{item_id}",method="GET",status="200"} 1'
+            in response.text
+        )
+
+
+@pytest.mark.asyncio
+async def test_profiling(unused_tcp_port: int, tmp_path):
+    async def root(request: Request) -> Response:
+        return Response(text="Hello")
+
+    application = Application()
+    application.router.add_route("GET", "/", root)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application,
+            port=unused_tcp_port,
+            profiling={"allowed_clients": ["127.0.0.1"], "directory": tmp_path},
+        ).start(ctx)
+        profiler = ctx.require_resource(RequestProfiler)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/")
+        assert response.text == "Hello"
+        assert "x-profile-id" not in response.headers
+
+        response = await http.get(
+            f"http://127.0.0.1:{unused_tcp_port}/", headers={"X-Profile": "1"}
+        )
+        assert response.text == "Hello"
+        assert profiler.profile_ids == [response.headers["x-profile-id"]]
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor(unused_tcp_port: int):
+    async def block(request: Request) -> Response:
+        time.sleep(0.3)  # noqa: ASYNC251
+        return Response(text="Hello")
+
+    application = Application()
+    application.router.add_route("GET", "/block", block)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application,
+            port=unused_tcp_port,
+            loop_monitor={"interval": 0.01, "threshold": 0.1},
+        ).start(ctx)
+        monitor = ctx.require_resource(LoopMonitor)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/block")
+        assert response.text == "Hello"
+        await sleep(0.05)
+        assert monitor.slow_callback_count == 1
+        assert monitor.slow_callbacks[0].path == "/block"
+
+
+@pytest.mark.asyncio
+async def test_accounting(unused_tcp_port: int):
+    async def item(request: Request) -> Response:
+        return Response(text=f"Item {request.match_info['item_id']}")
+
+    application = Application()
+    application.router.add_route("GET", "/items/{item_id}", item)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application,
+            port=unused_tcp_port,
+            accounting={"memory_sample_rate": 1},
+        ).start(ctx)
+        tracker = ctx.require_resource(UsageTracker)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/items/1")
+        assert response.text == "Item 1"
+        route_usage = tracker.routes[("/items/{item_id}", "GET")]
+        assert route_usage.requests == 1
+        assert route_usage.sampled_requests == 1
+        assert route_usage.cpu_time > 0
+
+
+@pytest.mark.asyncio
+async def test_tracing(unused_tcp_port: int):
+    async def item(request: Request) -> Response:
+        span = require_resource(Span)
+        return Response(text=f"Item {request.match_info['item_id']} {span.trace_id}")
+
+    batches: list[list[dict]] = []
+    application = Application()
+    application.router.add_route("GET", "/items/{item_id}", item)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application,
+            port=unused_tcp_port,
+            tracing={"exporter": batches.append},
+        ).start(ctx)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/items/1")
+        assert response.text.startswith("Item 1 ")
+        trace_id = response.text.split()[-1]
+
+    handler_span, request_span = batches[0]
+    assert handler_span["name"] == "handler"
+    assert handler_span["parent_id"] == request_span["span_id"]
+    assert request_span["trace_id"] == trace_id
+    assert request_span["attributes"] == {
+        "http.method": "GET",
+        "http.target": "/items/1",
+        "http.route": "/items/{item_id}",
+        "http.status_code": 200,
+    }
+
+
+@pytest.mark.asyncio
+async def test_access_log(unused_tcp_port: int, tmp_path):
+    async def item(request: Request) -> Response:
+        return Response(text=f"Item {request.match_info['item_id']}")
+
+    log_file = tmp_path / "access.log"
+    application = Application()
+    application.router.add_route("GET", "/items/{item_id}", item)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application,
+            port=unused_tcp_port,
+            access_log={"file": str(log_file), "format": "text"},
+        ).start(ctx)
+        ctx.require_resource(AccessLogger)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/items/1")
+        assert response.text == "Item 1"
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/missing")
+        assert response.status_code == 404
+
+    lines = log_file.read_text().splitlines()
+    assert lines[0].startswith('127.0.0.1 "GET /items/1" 200 6 ')
+    assert lines[1].startswith('127.0.0.1 "GET /missing" 404 ')
+
+
+@pytest.mark.asyncio
+async def test_recording(unused_tcp_port: int, tmp_path):
+    async def echo(request: Request) -> Response:
+        return Response(body=await request.read())
+
+    recording = tmp_path / "traffic.jsonl"
+    application = Application()
+    application.router.add_route("POST", "/echo", echo)
+    async with Context() as ctx, AsyncClient() as http:
+        await AIOHTTPComponent(
+            app=application, port=unused_tcp_port, recording={"file": str(recording)}
+        ).start(ctx)
+        ctx.require_resource(TrafficRecorder)
+
+        response = await http.post(
+            f"http://127.0.0.1:{unused_tcp_port}/echo?a=1",
+            content=b"hello",
+            headers={"Cookie": "secret=1"},
+        )
+        assert response.text == "hello"
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/missing")
+        assert response.status_code == 404
+
+    requests = list(load_recording(recording))
+    assert [(request.method, request.path, request.status) for request in requests] == [
+        ("POST", "/echo", 200),
+        ("GET", "/missing", 404),
+    ]
+    assert requests[0].query_string == "a=1"
+    assert requests[0].body == b"hello"
+    assert "cookie" not in dict(requests[0].headers)
+
+    application = Application()
+    application.router.add_route("POST", "/echo", echo)
+    component = AIOHTTPComponent(app=application, listen=False)
+    async with Context() as ctx:
+        await component.start(ctx)
+        result = await replay_into(component, requests)
+
+    assert result.requests == 2
+    assert result.errors == result.status_mismatches == 0
+
+
+@pytest.mark.asyncio
+async def test_create_client():
+    @inject
+    async def root(request: Request, my_resource: str = resource()) -> Response:
+        return Response(text=f"Hello {my_resource}")
+
+    application = Application()
+    application.router.add_route("GET", "/", root)
+    component = AIOHTTPComponent(app=application, listen=False)
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await component.start(ctx)
+        async with component.create_client() as client:
+            response = await client.get("/")
+            assert response.status == 200
+            assert await response.text() == "Hello foo"
+
+
 def test_bad_middleware_type():
     with pytest.raises(
         TypeError,
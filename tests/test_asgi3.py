@@ -205,3 +205,24 @@ def test_bad_middleware_type():
 def test_bad_middleware_dict():
     with pytest.raises(TypeError, match=r"Middleware \(1\) is not callable"):
         ASGIComponent(app=application, middlewares=[{"type": 1}])
+
+
+@pytest.mark.asyncio
+async def test_create_client() -> None:
+    component = ASGIComponent(app=application, listen=False, health={})
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        ctx.add_resource("bar", name="another")
+        await component.start(ctx)
+        async with component.create_client() as http:
+            response = await http.get("/", params={"param": "Hello World"})
+            response.raise_for_status()
+            assert response.json() == {
+                "message": "Hello World",
+                "my resource": "foo",
+                "another resource": "bar",
+            }
+
+            # The endpoints bypassing the middleware are included
+            response = await http.get("/livez")
+            assert response.json() == {"status": "ok"}
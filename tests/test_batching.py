@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from asphalt.core import Context, current_context, require_resource
+from fastapi import FastAPI
+from starlette.responses import PlainTextResponse, Response
+
+from asphalt.web.batching import MicroBatcher
+from asphalt.web.fastapi import AsphaltDepends, FastAPIComponent
+
+
+class Backend:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.batches: list[list[int]] = []
+
+    async def lookup(self, items: list[int]) -> list[str]:
+        self.batches.append(items)
+        await asyncio.sleep(self.delay)
+        if any(item < 0 for item in items):
+            raise ValueError("negative item")
+
+        return [f"item {item}" for item in items]
+
+
+@pytest.mark.asyncio
+async def test_max_batch_size() -> None:
+    backend = Backend()
+    batcher = MicroBatcher(batch_function=backend.lookup, max_batch_size=3, max_wait=10)
+    results = await asyncio.gather(*[batcher.submit(item) for item in range(6)])
+    assert results == [f"item {item}" for item in range(6)]
+    assert backend.batches == [[0, 1, 2], [3, 4, 5]]
+    assert batcher.batch_sizes.count == 2
+    assert batcher.wait_times.count == 6
+
+
+@pytest.mark.asyncio
+async def test_max_wait() -> None:
+    backend = Backend()
+    batcher = MicroBatcher(batch_function=backend.lookup, max_wait=0.05)
+    first = asyncio.create_task(batcher.submit(1))
+    await asyncio.sleep(0.01)
+    assert await asyncio.gather(first, batcher.submit(2)) == ["item 1", "item 2"]
+    assert backend.batches == [[1, 2]]
+    assert batcher.wait_times.quantile(1) >= 0.025
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency() -> None:
+    backend = Backend(delay=0.05)
+    batcher = MicroBatcher(
+        batch_function=backend.lookup, max_batch_size=1, max_wait=0, max_concurrency=1
+    )
+    await asyncio.gather(*[batcher.submit(item) for item in range(3)])
+    assert backend.batches == [[0], [1], [2]]
+    assert batcher.wait_times.quantile(1) >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_batch_function_error() -> None:
+    backend = Backend()
+    batcher = MicroBatcher(batch_function=backend.lookup, max_batch_size=2)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(-1), return_exceptions=True)
+    assert [str(result) for result in results] == ["negative item"] * 2
+    assert batcher.errors == 1
+    assert await batcher.submit(2) == "item 2"
+
+
+@pytest.mark.asyncio
+async def test_result_count_mismatch() -> None:
+    async def lookup(items: list[int]) -> list[str]:
+        return ["too few"]
+
+    batcher = MicroBatcher(batch_function=lookup, max_batch_size=2)
+    with pytest.raises(ValueError, match="the batch function returned 1 results for 2 items"):
+        await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller() -> None:
+    backend = Backend()
+    batcher = MicroBatcher(batch_function=backend.lookup, max_wait=0.05)
+    first = asyncio.create_task(batcher.submit(1))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await batcher.submit(2) == "item 2"
+    assert backend.batches == [[2]]
+
+
+@pytest.mark.asyncio
+async def test_close() -> None:
+    backend = Backend()
+    batcher = MicroBatcher(batch_function=backend.lookup, max_wait=10)
+    task = asyncio.create_task(batcher.submit(1))
+    await asyncio.sleep(0)
+    await batcher.close()
+    assert task.done()
+    assert await task == "item 1"
+
+
+@pytest.mark.parametrize(
+    "kwargs, exc_type, message",
+    [
+        pytest.param({"batch_function": "builtins:len", "max_batch_size": 0}, ValueError,
+                     "max_batch_size must be a positive integer", id="batch_size"),
+        pytest.param({"batch_function": "builtins:len", "max_wait": -1}, ValueError,
+                     "max_wait must not be negative", id="wait"),
+        pytest.param({"batch_function": "builtins:len", "max_concurrency": 0}, ValueError,
+                     "max_concurrency must be a positive integer", id="concurrency"),
+        pytest.param({"batch_function": 1}, TypeError, "is not callable", id="not_callable"),
+    ],
+)  # fmt: skip
+def test_bad_options(kwargs: dict, exc_type: type[Exception], message: str) -> None:
+    with pytest.raises(exc_type, match=message):
+        MicroBatcher(**kwargs)
+
+
+@pytest.mark.asyncio
+async def test_fastapi() -> None:
+    backend = Backend()
+    contexts: list[Context] = []
+
+    async def lookup(items: list[int]) -> list[str]:
+        contexts.append(current_context())
+        return await backend.lookup(items)
+
+    async def item(item_id: int, batcher: MicroBatcher = AsphaltDepends("lookup")) -> Response:
+        return PlainTextResponse(await batcher.submit(item_id))
+
+    async def other(item_id: int) -> Response:
+        batcher = require_resource(MicroBatcher, "lookup")
+        return PlainTextResponse(await batcher.submit(item_id))
+
+    application = FastAPI()
+    application.add_api_route("/items/{item_id}", item)
+    application.add_api_route("/other/{item_id}", other)
+    component = FastAPIComponent(
+        app=application,
+        listen=False,
+        metrics={"path": "/metrics"},
+        batching={"lookup": {"batch_function": lookup, "max_wait": 0.05}},
+    )
+    async with Context() as ctx:
+        await component.start(ctx)
+        async with component.create_client() as http:
+            responses = await asyncio.gather(
+                *[
+                    http.get(f"/{path}/{item_id}")
+                    for path in ("items", "other")
+                    for item_id in (1, 2)
+                ]
+            )
+            assert [response.text for response in responses] == ["item 1", "item 2"] * 2
+            assert backend.batches == [[1, 2, 1, 2]]
+            # The batch function runs in the root context, not in a request context
+            assert contexts == [ctx]
+
+            response = await http.get("/metrics")
+            assert 'batch_size_count{batcher="lookup"} 1' in response.text
+            assert 'batch_size_sum{batcher="lookup"} 4' in response.text
+            assert 'batch_wait_seconds_count{batcher="lookup"} 4' in response.text
+            assert 'batch_errors_total{batcher="lookup"} 0' in response.text
+
+
+@pytest.mark.asyncio
+async def test_aiohttp() -> None:
+    pytest.importorskip("aiohttp")
+    from aiohttp.web import Application, Request
+    from aiohttp.web import Response as AIOHTTPResponse
+
+    from asphalt.web.aiohttp import AIOHTTPComponent
+
+    backend = Backend()
+
+    async def root(request: Request) -> AIOHTTPResponse:
+        batcher = require_resource(MicroBatcher, "lookup")
+        return AIOHTTPResponse(text=await batcher.submit(int(request.query["item"])))
+
+    application = Application()
+    application.router.add_route("GET", "/", root)
+    component = AIOHTTPComponent(
+        app=application,
+        listen=False,
+        batching={"lookup": {"batch_function": backend.lookup, "max_batch_size": 2}},
+    )
+    async with Context() as ctx:
+        await component.start(ctx)
+        async with component.create_client() as client:
+            responses = await asyncio.gather(*[client.get(f"/?item={item}") for item in (1, 2)])
+            assert sorted([await response.text() for response in responses]) == [
+                "item 1",
+                "item 2",
+            ]
+
+    assert [sorted(batch) for batch in backend.batches] == [[1, 2]]
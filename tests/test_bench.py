@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import ContainerComponent
+
+from asphalt.web._utils import send_response
+from asphalt.web.bench import (
+    BenchmarkSpec,
+    RequestSpec,
+    apply_override,
+    find_web_component,
+    format_results,
+    load_config,
+    run_benchmark,
+)
+from asphalt.web.cli import main
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    if scope["type"] == "http":
+        status = 404 if scope["path"] == "/missing" else 200
+        await send_response(send, status, b"Hello")
+
+
+def test_spec_from_dict() -> None:
+    spec = BenchmarkSpec.from_dict(
+        {
+            "concurrency": 5,
+            "duration": 2,
+            "requests": ["/", {"path": "/items", "method": "POST", "body": "{}", "weight": 3}],
+        }
+    )
+    assert spec.concurrency == [5]
+    assert spec.duration == 2
+    assert spec.requests == [
+        RequestSpec("/"),
+        RequestSpec("/items", method="POST", body=b"{}", weight=3),
+    ]
+
+
+@pytest.mark.parametrize(
+    "data, exception, message",
+    [
+        pytest.param([], TypeError, "must be a mapping, not list", id="not_mapping"),
+        pytest.param({}, TypeError, "non-empty list of requests", id="no_requests"),
+        pytest.param({"requests": [1]}, TypeError, "path or a mapping, not int", id="request"),
+        pytest.param(
+            {"requests": ["/"], "concurrency": [0]}, ValueError, "positive", id="concurrency"
+        ),
+    ],
+)
+def test_bad_spec(data: object, exception: type[Exception], message: str) -> None:
+    with pytest.raises(exception, match=message):
+        BenchmarkSpec.from_dict(data)  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize(
+    "configs, service, expected",
+    [
+        pytest.param([{"component": {"type": "asgi3"}}], None, "asgi3", id="component"),
+        pytest.param(
+            [
+                {"services": {"a": {"component": {"type": "aiohttp"}}}},
+                {"services": {"b": {"component": {"type": "asgi3"}}}},
+            ],
+            "b",
+            "asgi3",
+            id="service",
+        ),
+    ],
+)
+def test_load_config(configs: list[dict], service: str | None, expected: str) -> None:
+    assert load_config(configs, service)["type"] == expected
+
+
+def test_load_config_ambiguous() -> None:
+    configs = [{"services": {"a": {"component": {}}, "b": {"component": {}}}}]
+    with pytest.raises(LookupError, match="multiple services have been defined"):
+        load_config(configs)
+
+
+def test_apply_override() -> None:
+    config: dict = {"type": "asgi3", "metrics": None}
+    apply_override(config, "metrics", {})
+    apply_override(config, "scheduling.classes.api\\.v1", {"weight": 2})
+    assert config == {
+        "type": "asgi3",
+        "metrics": {},
+        "scheduling": {"classes": {"api.v1": {"weight": 2}}},
+    }
+
+
+def test_find_web_component() -> None:
+    config = {
+        "type": ContainerComponent,
+        "components": {"web": {"type": "asgi3", "app": "tests.test_bench:application"}},
+    }
+    assert find_web_component(config) is config["components"]["web"]
+    with pytest.raises(LookupError, match="no web component found"):
+        find_web_component({"type": ContainerComponent})
+
+
+@pytest.mark.parametrize(
+    "workers", [pytest.param(0, id="inprocess"), pytest.param(2, id="workers")]
+)
+def test_run_benchmark(workers: int, unused_tcp_port: int) -> None:
+    spec = BenchmarkSpec(
+        [RequestSpec("/"), RequestSpec("/missing")], concurrency=[1, 4], duration=0.3, warmup=0.1
+    )
+    config = {"type": "asgi3", "app": "tests.test_bench:application"}
+    results = run_benchmark(config, spec, workers=workers, port=unused_tcp_port)
+    assert [result.concurrency for result in results] == [1, 4]
+    for result in results:
+        assert result.requests > 0
+        assert 0 < result.error_rate < 1
+        assert result.loop_lag
+        assert result.as_dict()["latency"]["p99"] >= result.as_dict()["latency"]["p50"]
+
+    assert format_results(results).splitlines()[0].split()[:2] == ["concurrency", "requests"]
+
+
+def test_cli(tmp_path: Path, unused_tcp_port: int, capsys: pytest.CaptureFixture[str]) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("component:\n  type: asgi3\n  app: tests.test_bench:application\n")
+    spec_path = tmp_path / "spec.yaml"
+    spec_path.write_text("duration: 0.2\nwarmup: 0\nconcurrency: 2\nrequests: [/]\n")
+    json_path = tmp_path / "results.json"
+    main(
+        [
+            "bench",
+            str(config_path),
+            "--spec",
+            str(spec_path),
+            "--port",
+            str(unused_tcp_port),
+            "--set",
+            "health={}",
+            "--json",
+            str(json_path),
+        ]
+    )
+    assert capsys.readouterr().out.startswith("concurrency")
+    results = json.loads(json_path.read_text())
+    assert results["stages"][0]["concurrency"] == 2
+    assert results["stages"][0]["error_rate"] == 0
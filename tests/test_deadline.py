@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+from asyncio import sleep
+from typing import Any
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context, current_context, require_resource
+from httpx import AsyncClient
+
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.deadline import Deadline, parse_timeout, resolve_timeout
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    deadline = require_resource(Deadline)
+    if scope["path"] == "/slow":
+        await sleep(5)
+
+    ctx = current_context()
+    body = json.dumps(
+        {
+            "remaining": deadline.remaining,
+            "in_request_context": ctx.parent.get_resource(Deadline) is None,
+        }
+    ).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body, "more_body": False})
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        pytest.param("2.5", 2.5, id="seconds"),
+        pytest.param("100m", 0.1, id="grpc_millis"),
+        pytest.param("2S", 2.0, id="grpc_seconds"),
+        pytest.param("1M", 60.0, id="grpc_minutes"),
+        pytest.param("-1", None, id="negative"),
+        pytest.param("foo", None, id="invalid"),
+    ],
+)
+def test_parse_timeout(value: str, expected: float | None) -> None:
+    assert parse_timeout(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize(
+    "header_values, timeout, max_timeout, expected",
+    [
+        pytest.param([None, None], None, None, None, id="none"),
+        pytest.param([None, None], 5, None, 5, id="default"),
+        pytest.param(["bad", "3S"], 5, None, 3, id="second_header"),
+        pytest.param(["30"], 5, 10, 10, id="capped"),
+        pytest.param([None], None, 10, 10, id="max_only"),
+    ],
+)
+def test_resolve_timeout(
+    header_values: list[str | None],
+    timeout: float | None,
+    max_timeout: float | None,
+    expected: float | None,
+) -> None:
+    assert resolve_timeout(header_values, timeout, max_timeout) == expected
+
+
+def test_deadline() -> None:
+    deadline = Deadline(10)
+    assert 9 < deadline.remaining <= 10
+    assert not deadline.expired
+    assert Deadline(0).expired
+
+
+@pytest.mark.parametrize(
+    "kwargs, in_request_context",
+    [
+        pytest.param({"deadlines": {"timeout": 10}}, True, id="option"),
+        pytest.param(
+            {"middlewares": [{"type": "asphalt.web.deadline:DeadlineMiddleware", "timeout": 10}]},
+            False,
+            id="outside_request_context",
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_middleware(
+    unused_tcp_port: int, kwargs: dict[str, Any], in_request_context: bool
+) -> None:
+    async with Context() as ctx, AsyncClient() as http:
+        await ASGIComponent(app=application, port=unused_tcp_port, **kwargs).start(ctx)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}")
+        response.raise_for_status()
+        assert 9 < response.json()["remaining"] <= 10
+        assert response.json()["in_request_context"] is in_request_context
+
+        response = await http.get(
+            f"http://127.0.0.1:{unused_tcp_port}", headers={"X-Request-Deadline": "3"}
+        )
+        response.raise_for_status()
+        assert 2 < response.json()["remaining"] <= 3
+
+        response = await http.get(
+            f"http://127.0.0.1:{unused_tcp_port}/slow", headers={"grpc-timeout": "100m"}
+        )
+        assert response.status_code == 504
@@ -9,6 +9,7 @@ try:
     from django.core.handlers.asgi import ASGIHandler
 
     from asphalt.web.django import DjangoComponent
+    from asphalt.web.metrics import MetricsCollector
 
     from .django_app.asgi import application
 except ModuleNotFoundError:
@@ -36,3 +37,49 @@ async def test_http(unused_tcp_port: int):
             "my resource": "foo",
             "another resource": "bar",
         }
+
+
+@pytest.mark.asyncio
+async def test_metrics(unused_tcp_port: int):
+    async with Context() as ctx, AsyncClient() as http:
+        ctx.add_resource("foo")
+        ctx.add_resource("bar", name="another")
+        await DjangoComponent(app=application, port=unused_tcp_port, metrics={}).start(ctx)
+        collector = ctx.require_resource(MetricsCollector)
+
+        response = await http.get(
+            f"http://127.0.0.1:{unused_tcp_port}", params={"param": "Hello World"}
+        )
+        response.raise_for_status()
+        assert collector.latencies[("/", "GET", 200)].count == 1
+
+
+@pytest.mark.asyncio
+async def test_tracing() -> None:
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    batches: list[list[dict]] = []
+    component = DjangoComponent(
+        app=application, listen=False, tracing={"exporter": batches.append}
+    )
+    async with Context() as ctx:
+        await component.start(ctx)
+        async with component.create_client() as http:
+            response = await http.get(
+                "/traced", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+            )
+            response.raise_for_status()
+            assert response.text == trace_id
+
+    assert [span["name"] for span in batches[0]] == ["application", "http"]
+
+
+@pytest.mark.parametrize(
+    "option, value",
+    [
+        pytest.param("profiling", {"secret": "change-me"}, id="profiling"),
+        pytest.param("leak_detection", {}, id="leak_detection"),
+    ],
+)
+def test_unsupported_option(option: str, value: dict) -> None:
+    with pytest.raises(ValueError, match=f"the {option} option is not supported with Django"):
+        DjangoComponent(app=application, **{option: value})
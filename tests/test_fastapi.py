@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import itertools
 import json
 from collections.abc import Callable, Sequence
 from typing import Any
@@ -7,8 +9,15 @@ from typing import Any
 import pytest
 import websockets
 from asgiref.typing import ASGI3Application, HTTPScope, WebSocketScope
-from asphalt.core import Component, Context, inject, require_resource, resource
-from fastapi import FastAPI
+from asphalt.core import (
+    Component,
+    Context,
+    current_context,
+    inject,
+    require_resource,
+    resource,
+)
+from fastapi import Depends, FastAPI
 from httpx import AsyncClient
 from starlette.requests import Request
 from starlette.responses import JSONResponse, PlainTextResponse, Response
@@ -144,6 +153,80 @@ async def test_missing_type_annotation():
             await component.start(ctx)
 
 
+@pytest.mark.asyncio
+async def test_shared_endpoint() -> None:
+    async def item(
+        item_id: int,
+        my_resource: str = AsphaltDepends(),
+        another_resource: str = AsphaltDepends("another"),
+    ) -> Response:
+        return PlainTextResponse(f"{item_id} {my_resource} {another_resource}")
+
+    application = FastAPI()
+    for prefix in ("items", "things"):
+        application.add_api_route(f"/{prefix}/{{item_id}}", item)
+
+    component = FastAPIComponent(app=application, listen=False)
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        ctx.add_resource("bar", name="another")
+        await component.start(ctx)
+        async with component.create_client() as http:
+            for prefix in ("items", "things"):
+                response = await http.get(f"/{prefix}/1")
+                assert response.text == "1 foo bar"
+
+
+@pytest.mark.asyncio
+async def test_resource_scopes() -> None:
+    async def add_path(request: Request) -> None:
+        current_context().add_resource(request.url.path.encode())
+
+    async def root(
+        my_resource: str = AsphaltDepends(),
+        counter: int = AsphaltDepends(),
+        scope: HTTPScope = AsphaltDepends(),
+        _: None = Depends(add_path),
+        path: bytes = AsphaltDepends(request_scoped=True),
+    ) -> Response:
+        return PlainTextResponse(f"{my_resource} {counter} {scope['path']} {path.decode()}")
+
+    counter = itertools.count(1)
+    application = FastAPI()
+    application.add_api_route("/{item}", root)
+    component = FastAPIComponent(app=application, listen=False)
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        ctx.add_resource_factory(lambda ctx: next(counter), [int])
+        await component.start(ctx)
+        async with component.create_client() as http:
+            # The factory was called twice during startup, to tell it apart from a
+            # resource shared by all requests
+            for i, path in enumerate(["/a", "/b"], 3):
+                response = await http.get(path)
+                assert response.text == f"foo {i} {path} {path}"
+
+
+@pytest.mark.asyncio
+async def test_missing_resource() -> None:
+    async def root(my_resource: str = AsphaltDepends("missing")) -> Response:
+        return PlainTextResponse(f"Hello {my_resource}")
+
+    application = FastAPI()
+    application.add_api_route("/", root)
+    component = FastAPIComponent(app=application, listen=False)
+    async with Context() as ctx:
+        # The resource is looked up during startup without waiting for it
+        with pytest.raises(
+            LookupError,
+            match=(
+                "Dependency 'my_resource' in endpoint / requires a resource of type str "
+                "named 'missing', but none is available"
+            ),
+        ):
+            await asyncio.wait_for(component.start(ctx), 1)
+
+
 @pytest.mark.parametrize("method", ["direct", "dict"])
 @pytest.mark.asyncio
 async def test_middleware(unused_tcp_port: int, method: str):
@@ -188,3 +271,19 @@ def test_bad_middleware_type():
 def test_bad_middleware_dict():
     with pytest.raises(TypeError, match=r"Middleware \(1\) is not callable"):
         FastAPIComponent(middlewares=[{"type": 1}])
+
+
+@pytest.mark.asyncio
+async def test_create_client() -> None:
+    async def root(my_resource: str = AsphaltDepends()) -> Response:
+        return PlainTextResponse(f"Hello {my_resource}")
+
+    application = FastAPI()
+    application.add_api_route("/", root)
+    component = FastAPIComponent(app=application, listen=False)
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await component.start(ctx)
+        async with component.create_client() as http:
+            response = await http.get("/")
+            assert response.text == "Hello foo"
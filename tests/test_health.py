@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from asyncio import gather, sleep
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context
+from httpx import AsyncClient
+
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.health import HealthChecker
+
+received_paths: list[str] = []
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    received_paths.append(scope["path"])
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"Hello World", "more_body": False})
+
+
+def failing_check() -> bool:
+    return False
+
+
+@pytest.mark.asyncio
+async def test_not_ready() -> None:
+    checker = HealthChecker()
+    assert await checker.is_ready() == (False, {})
+    checker.ready = True
+    assert await checker.is_ready() == (True, {})
+
+
+@pytest.mark.asyncio
+async def test_checks() -> None:
+    async def async_check() -> None:
+        await sleep(0)
+
+    def raising_check() -> None:
+        raise ConnectionError("no database")
+
+    checker = HealthChecker(
+        checks={
+            "async": async_check,
+            "raising": raising_check,
+            "false": f"{__name__}:failing_check",
+        }
+    )
+    checker.ready = True
+    assert await checker.is_ready() == (
+        False,
+        {"async": "ok", "raising": "failed: ConnectionError", "false": "failed"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_check_caching() -> None:
+    calls = 0
+
+    async def check() -> bool:
+        nonlocal calls
+        calls += 1
+        await sleep(0)
+        return True
+
+    checker = HealthChecker(checks={"counted": check}, cache_ttl=60)
+    results = await gather(*[checker.check() for _ in range(5)])
+    assert results == [{"counted": "ok"}] * 5
+    assert await checker.check() == {"counted": "ok"}
+    assert calls == 1
+
+
+def test_bad_check() -> None:
+    with pytest.raises(TypeError, match=r"Health check \(1\) is not callable"):
+        HealthChecker(checks={"bad": 1})
+
+
+@pytest.mark.asyncio
+async def test_component(unused_tcp_port: int) -> None:
+    received_paths.clear()
+    async with Context() as ctx, AsyncClient() as http:
+        component = ASGIComponent(app=application, port=unused_tcp_port, health={})
+        await component.start(ctx)
+        checker = ctx.require_resource(HealthChecker)
+        assert checker.ready
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/livez")
+        assert response.status_code == 200
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/readyz")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok", "checks": {}}
+
+        checker.add_check("false", failing_check)
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/readyz")
+        assert response.status_code == 503
+        assert response.json() == {"status": "unavailable", "checks": {"false": "failed"}}
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/foo")
+        assert response.text == "Hello World"
+        assert received_paths == ["/foo"]
+
+    assert not checker.ready
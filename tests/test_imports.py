@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+# The optional features of the web components, imported only when enabled
+FEATURE_MODULES = (
+    "asphalt.web.accesslog",
+    "asphalt.web.accounting",
+    "asphalt.web.batching",
+    "asphalt.web.bench",
+    "asphalt.web.health",
+    "asphalt.web.layertiming",
+    "asphalt.web.leaks",
+    "asphalt.web.loopmonitor",
+    "asphalt.web.memo",
+    "asphalt.web.metrics",
+    "asphalt.web.mirroring",
+    "asphalt.web.profiling",
+    "asphalt.web.recording",
+    "asphalt.web.scheduling",
+    "asphalt.web.tracing",
+)
+
+
+def get_imported_modules(module: str) -> set[str]:
+    code = f"import json, sys, {module}; print(json.dumps(list(sys.modules)))"
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return set(json.loads(output))
+
+
+@pytest.mark.parametrize(
+    "module, unwanted",
+    [
+        pytest.param("asphalt.web.asgi3", ("uvicorn", "httpx"), id="asgi3"),
+        pytest.param("asphalt.web.starlette", ("uvicorn", "httpx"), id="starlette"),
+        pytest.param("asphalt.web.fastapi", ("uvicorn", "fastapi", "pydantic"), id="fastapi"),
+        pytest.param("asphalt.web.django", ("uvicorn", "django.http"), id="django"),
+        pytest.param("asphalt.web.litestar", ("uvicorn",), id="litestar"),
+        pytest.param("asphalt.web.aiohttp", (), id="aiohttp"),
+    ],
+)
+def test_lazy_imports(module: str, unwanted: tuple[str, ...]) -> None:
+    """
+    Check that importing an integration module doesn't import anything it only needs
+    once the component is created or started.
+
+    Import times are measured by the performance regression tests in ``benchmarks``.
+
+    """
+    pytest.importorskip(module)
+    imported = get_imported_modules(module)
+    assert not imported.intersection(unwanted + FEATURE_MODULES)
+
+
+@pytest.mark.parametrize("module", ["asphalt.web.deadline", "asphalt.web.tracing"])
+def test_no_asgiref(module: str) -> None:
+    """Check that the feature modules used by the aiohttp integration don't need asgiref."""
+    assert "asgiref" not in get_imported_modules(module)
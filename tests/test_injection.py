@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Optional, Union
+
+import pytest
+from asphalt.core import Context, ResourceNotFound, resource
+
+from asphalt.web.injection import inject_resources
+
+
+@inject_resources
+async def late_handler(value: LateResource = resource()) -> LateResource:
+    return value
+
+
+class LateResource:
+    pass
+
+
+@pytest.mark.asyncio
+async def test_inject() -> None:
+    @inject_resources
+    async def handler(
+        request: str,
+        my_resource: str = resource(),
+        another: str = resource("another"),
+        counter: int = resource(),
+        missing: Optional[bytes] = resource(),  # noqa: UP045
+    ) -> tuple[str, str, str, int, bytes | None]:
+        return request, my_resource, another, counter, missing
+
+    counter = iter(range(1, 10))
+    async with Context() as root_ctx:
+        root_ctx.add_resource("foo")
+        root_ctx.add_resource("bar", "another")
+        root_ctx.add_resource_factory(lambda ctx: next(counter), [int])
+        async with Context():
+            assert await handler("request") == ("request", "foo", "bar", 1, None)
+            assert await handler("request") == ("request", "foo", "bar", 1, None)
+
+        async with Context() as ctx:
+            # Resources in the request context take precedence
+            ctx.add_resource("baz", "another")
+            assert await handler("request") == ("request", "foo", "baz", 2, None)
+
+
+@pytest.mark.asyncio
+async def test_missing_resource() -> None:
+    @inject_resources
+    async def handler(my_resource: str = resource()) -> str:
+        return my_resource
+
+    async with Context():
+        with pytest.raises(ResourceNotFound):
+            await handler()
+
+
+@pytest.mark.asyncio
+async def test_forward_reference() -> None:
+    async with Context() as ctx:
+        value = LateResource()
+        ctx.add_resource(value)
+        assert await late_handler() is value
+
+
+@pytest.mark.asyncio
+async def test_sync_function() -> None:
+    @inject_resources
+    def handler(my_resource: str = resource()) -> str:
+        return my_resource
+
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        assert handler() == "foo"
+
+
+def test_positional_only() -> None:
+    async def handler(my_resource: str = resource(), /) -> None:
+        pass
+
+    with pytest.raises(
+        TypeError, match="Cannot inject a resource to the positional-only parameter 'my_resource'"
+    ):
+        inject_resources(handler)
+
+
+def test_missing_annotation() -> None:
+    async def handler(my_resource=resource()) -> None:
+        pass
+
+    with pytest.raises(TypeError, match="Parameter 'my_resource' of .+ is missing a type"):
+        inject_resources(handler)
+
+
+def test_bad_union() -> None:
+    async def handler(my_resource: Union[str, int] = resource()) -> None:  # noqa: UP007
+        pass
+
+    with pytest.raises(TypeError, match="unions are only valid for resources"):
+        inject_resources(handler)
+
+
+@pytest.mark.asyncio
+async def test_aiohttp() -> None:
+    pytest.importorskip("aiohttp")
+    from aiohttp.web import Application, Request, Response
+
+    from asphalt.web.aiohttp import AIOHTTPComponent
+
+    @inject_resources
+    async def root(request: Request, my_resource: str = resource()) -> Response:
+        return Response(text=f"Hello {my_resource}")
+
+    application = Application()
+    application.router.add_route("GET", "/", root)
+    component = AIOHTTPComponent(app=application, listen=False)
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await component.start(ctx)
+        async with component.create_client() as client:
+            response = await client.get("/")
+            assert await response.text() == "Hello foo"
+
+
+@pytest.mark.asyncio
+async def test_starlette() -> None:
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import PlainTextResponse, Response
+
+    from asphalt.web.starlette import StarletteComponent
+
+    @inject_resources
+    async def root(request: Request, my_resource: str = resource()) -> Response:
+        return PlainTextResponse(f"Hello {my_resource}")
+
+    application = Starlette()
+    application.add_route("/", root)
+    component = StarletteComponent(app=application, listen=False)
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await component.start(ctx)
+        async with component.create_client() as http:
+            response = await http.get("/")
+            assert response.text == "Hello foo"
+
+
+@pytest.mark.asyncio
+async def test_django() -> None:
+    pytest.importorskip("django")
+    from asphalt.web.django import DjangoComponent
+
+    from .django_app.asgi import application
+
+    component = DjangoComponent(app=application, listen=False)
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await component.start(ctx)
+        async with component.create_client() as http:
+            response = await http.get("/injected")
+            assert response.text == "Hello foo"
+
+
+@pytest.mark.asyncio
+async def test_closed_context() -> None:
+    @inject_resources
+    async def handler(my_resource: str = resource()) -> str:
+        return my_resource
+
+    # A task spawned in a request context that outlives the request
+    event = asyncio.Event()
+
+    async def outliving_task() -> str:
+        await event.wait()
+        return await handler()
+
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        task = asyncio.create_task(outliving_task())
+
+    event.set()
+    with pytest.raises(RuntimeError, match="this context has already been closed"):
+        await task
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from asyncio import sleep
+from dataclasses import dataclass
+
+import pytest
+from asgiref.typing import ASGI3Application, ASGIReceiveCallable, ASGISendCallable, Scope
+from asphalt.core import Context
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from asphalt.web._utils import send_response
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.layertiming import LayerTimingReport
+from asphalt.web.starlette import StarletteComponent
+
+
+@dataclass
+class SlowMiddleware:
+    app: ASGI3Application
+    delay: float = 0.05
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        await sleep(self.delay)
+        await self.app(scope, receive, send)
+
+
+async def application(scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable) -> None:
+    await sleep(0.02)
+    await send_response(send, 200, b"Hello")
+
+
+@pytest.mark.asyncio
+async def test_inclusive_exclusive() -> None:
+    report = LayerTimingReport(max_recent=1)
+    app = report.wrap(application, "application")
+    app = report.wrap(SlowMiddleware(app, 0.05))
+    app = report.wrap(SlowMiddleware(app, 0.01), "outer")
+
+    async def send(event: object) -> None:
+        pass
+
+    for _ in range(2):
+        await app({"type": "http"}, None, send)  # type: ignore[arg-type, typeddict-item]
+
+    inner, middle, outer = report.layers
+    assert [stats.count for stats in report.layers] == [2, 2, 2]
+    assert middle.name == "tests.test_layertiming.SlowMiddleware"
+    assert inner.mean_exclusive == pytest.approx(inner.mean_inclusive)
+    assert 0.05 <= middle.mean_exclusive < middle.mean_inclusive
+    assert middle.mean_inclusive == pytest.approx(inner.mean_inclusive + middle.mean_exclusive)
+    assert outer.mean_inclusive == pytest.approx(
+        inner.mean_exclusive + middle.mean_exclusive + outer.mean_exclusive
+    )
+
+    assert len(report.recent) == 1
+    assert [name for name, *_ in report.recent[0]] == [
+        "outer",
+        "tests.test_layertiming.SlowMiddleware",
+        "application",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_asgi_component(unused_tcp_port: int) -> None:
+    component = ASGIComponent(
+        app=application,
+        port=unused_tcp_port,
+        middlewares=[{"type": SlowMiddleware, "delay": 0.05}],
+        layer_timing={"path": "/layers"},
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        report = ctx.require_resource(LayerTimingReport)
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/")
+        assert response.text == "Hello"
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/layers")
+        response.raise_for_status()
+        assert response.headers["content-type"] == "application/json"
+
+    data = response.json()
+    assert [layer["name"] for layer in data["layers"]] == [
+        "tests.test_layertiming.SlowMiddleware",
+        "asphalt.web.asgi3.AsphaltMiddleware",
+        "tests.test_layertiming.application",
+    ]
+    assert [layer["count"] for layer in data["layers"]] == [1, 1, 1]
+    assert data["layers"][0]["mean_exclusive"] >= 0.05
+    assert data["layers"][2]["mean_exclusive"] >= 0.02
+    assert len(data["recent"]) == 1
+    assert report.as_dict() == data
+
+
+@pytest.mark.asyncio
+async def test_starlette(unused_tcp_port: int) -> None:
+    async def root(request: Request) -> Response:
+        return PlainTextResponse("Hello")
+
+    application = Starlette(routes=[Route("/", root)])
+    component = StarletteComponent(
+        app=application,
+        port=unused_tcp_port,
+        middlewares=[{"type": SlowMiddleware}],
+        layer_timing={},
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/")
+        assert response.text == "Hello"
+
+    assert [layer.name for layer in reversed(component.layer_timing.layers)] == [
+        "tests.test_layertiming.SlowMiddleware",
+        "asphalt.web.starlette.AsphaltMiddleware",
+        "starlette.middleware.exceptions.ExceptionMiddleware",
+    ]
+    assert [layer.count for layer in component.layer_timing.layers] == [1, 1, 1]
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from asyncio import Event, create_task
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context, current_context
+from httpx import AsyncClient
+
+from asphalt.web._utils import send_response
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.leaks import LeakDetector, find_referrer_chains
+
+
+class Connection:
+    pass
+
+
+class Holder:
+    def __init__(self, value: object) -> None:
+        self.value = value
+
+
+leaked: list[Holder] = []
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    ctx = current_context()
+    ctx.add_resource(Connection())
+    if scope["path"] == "/leak":
+        leaked.append(Holder(ctx))
+
+    await send_response(send, 200, b"Hello")
+
+
+def test_find_referrer_chains() -> None:
+    obj = Connection()
+    holders = [Holder(obj)]
+    chains = find_referrer_chains(obj)
+    # Depending on the Python version, the instance dict may show up before the holder
+    chain = chains[0]
+    index = next(i for i, line in enumerate(chain) if line.startswith("tests.test_leaks.Holder"))
+    assert chain[index + 1].startswith("list: [<tests.test_leaks.Holder")
+    del holders
+
+
+@pytest.mark.asyncio
+async def test_asgi_component(unused_tcp_port: int, caplog: pytest.LogCaptureFixture) -> None:
+    component = ASGIComponent(
+        app=application,
+        port=unused_tcp_port,
+        leak_detection={
+            "max_age": 0,
+            "check_interval": 3600,
+            "path": "/leaks",
+            "unmatched_route": None,
+        },
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        detector = ctx.require_resource(LeakDetector)
+        for path in ("/", "/leak"):
+            # Avoid the keep-alive timer capturing the request context
+            response = await http.get(
+                f"http://127.0.0.1:{unused_tcp_port}{path}", headers={"Connection": "close"}
+            )
+            assert response.text == "Hello"
+
+        offenders = detector.check()
+        assert [(offender.kind, offender.route) for offender in offenders] == [
+            ("context", "/leak"),
+            ("resource", "/leak"),
+        ]
+        assert offenders[0].description.startswith("asphalt.core.context.Context: ")
+        assert any("tests.test_leaks.Holder" in line for line in offenders[0].referrers[0])
+        assert offenders[1].description == "tests.test_leaks.Connection"
+        assert "A request context of route /leak is still alive" in caplog.text
+        assert detector.live_contexts() == {"/leak": 1}
+
+        # The offenders are only reported once
+        assert detector.check() == []
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/leaks")
+        data = response.json()
+        assert data["leaked_contexts"] == 1
+        assert data["leaked_resources"] == 1
+        assert len(data["offenders"]) == 2
+
+        leaked.clear()
+        detector.check()
+        assert detector.live_contexts() == {}
+
+
+@pytest.mark.asyncio
+async def test_outliving_task() -> None:
+    detector = LeakDetector(max_age=0)
+    event = Event()
+    async with Context() as root_ctx:
+        async with Context() as ctx:
+            tracked = detector.track(ctx, "/")
+            task = create_task(event.wait())
+
+        detector.finish(tracked, None)
+        del ctx
+        offenders = detector.check()
+        event.set()
+        await task
+
+    assert root_ctx.parent is None
+    assert [offender.route for offender in offenders] == ["<unmatched>"]
+    assert any("Task" in line for chain in offenders[0].referrers for line in chain)
+
+
+@pytest.mark.asyncio
+async def test_resource_tracking_unavailable(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    def get_resources(ctx: Context) -> list[object]:
+        raise AttributeError("'Context' object has no attribute '_resources'")
+
+    monkeypatch.setattr("asphalt.web.leaks._get_resources", get_resources)
+    detector = LeakDetector(max_age=0)
+    async with Context():
+        contexts = []
+        for _ in range(2):
+            async with Context() as ctx:
+                ctx.add_resource(Connection())
+                tracked = detector.track(ctx, "/")
+
+            detector.finish(tracked, None)
+            contexts.append(ctx)
+
+        # The contexts are still tracked, but not their resources
+        assert not detector.track_resources
+        assert [offender.kind for offender in detector.check()] == ["context", "context"]
+        assert caplog.text.count("Cannot list the resources of request contexts") == 1
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import itertools
 import json
 from collections.abc import Callable, Sequence
 from typing import Any, Dict
@@ -7,11 +9,12 @@ from typing import Any, Dict
 import pytest
 import websockets
 from asgiref.typing import ASGI3Application, HTTPScope, WebSocketScope
-from asphalt.core import Component, Context, require_resource
+from asphalt.core import Component, Context, current_context, require_resource
 from httpx import AsyncClient
 
 try:
     from litestar import Litestar, MediaType, Request, get, websocket_listener
+    from litestar.di import Provide
 
     from asphalt.web.litestar import AsphaltProvide, LitestarComponent
 
@@ -196,6 +199,162 @@ async def test_dependency_injection(unused_tcp_port: int) -> None:
         }
 
 
+@pytest.mark.asyncio
+async def test_inferred_dependencies() -> None:
+    def add_path(app: Any) -> Any:
+        async def middleware(scope: Any, receive: Any, send: Any) -> None:
+            current_context().add_resource(scope["path"].encode())
+            await app(scope, receive, send)
+
+        return middleware
+
+    async def get_path(path: bytes) -> str:
+        return path.decode()
+
+    @get(
+        "/{item:str}",
+        dependencies={
+            "my_resource": AsphaltProvide(),
+            "another_resource": AsphaltProvide(name="another"),
+            "counter": AsphaltProvide(),
+            "http_scope": AsphaltProvide(HTTPScope),
+            "path": AsphaltProvide(request_scoped=True),
+            "request_path": Provide(get_path),
+        },
+    )
+    async def root(
+        item: str,
+        my_resource: str,
+        another_resource: str,
+        counter: int,
+        http_scope: Dict[str, Any],  # noqa: UP006
+        request_path: str,
+    ) -> str:
+        return f"{my_resource} {another_resource} {counter} {http_scope['path']} {request_path}"
+
+    counter = itertools.count(1)
+    component = LitestarComponent(
+        route_handlers=[root], config={"middleware": [add_path]}, listen=False
+    )
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        ctx.add_resource("bar", name="another")
+        ctx.add_resource_factory(lambda ctx: next(counter), [int])
+        await component.start(ctx)
+        async with component.create_client() as http:
+            # The factory was called twice during startup, to tell it apart from a
+            # resource shared by all requests
+            for i, path in enumerate(["/a", "/b"], 3):
+                response = await http.get(path)
+                assert response.text == f"foo bar {i} {path} {path}"
+
+
+@pytest.mark.asyncio
+async def test_websocket_dependency_injection(unused_tcp_port: int) -> None:
+    @websocket_listener("/ws", dependencies={"my_resource": AsphaltProvide()})
+    async def ws_root(data: str, my_resource: str) -> str:
+        return f"{data} {my_resource}"
+
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await LitestarComponent(port=unused_tcp_port, route_handlers=[ws_root]).start(ctx)
+        async with websockets.connect(f"ws://localhost:{unused_tcp_port}/ws") as ws:
+            await ws.send("Hello")
+            assert await ws.recv() == "Hello foo"
+
+
+@pytest.mark.asyncio
+async def test_missing_resource() -> None:
+    @get("/", dependencies={"my_resource": AsphaltProvide(name="missing")})
+    async def root(my_resource: str) -> str:
+        return f"Hello {my_resource}"
+
+    component = LitestarComponent(route_handlers=[root], listen=False)
+    async with Context() as ctx:
+        # The resource is looked up during startup without waiting for it
+        with pytest.raises(
+            LookupError,
+            match=(
+                "Dependency 'my_resource' in route handler / requires a resource of type "
+                "str named 'missing', but none is available"
+            ),
+        ):
+            await asyncio.wait_for(component.start(ctx), 1)
+
+
+@pytest.mark.asyncio
+async def test_missing_type_annotation() -> None:
+    @get("/", dependencies={"my_resource": AsphaltProvide()})
+    async def root() -> str:
+        return "never seen"
+
+    component = LitestarComponent(route_handlers=[root], listen=False)
+    async with Context() as ctx:
+        with pytest.raises(
+            TypeError,
+            match="Dependency 'my_resource' in route handler / is missing a type annotation",
+        ):
+            await component.start(ctx)
+
+
+@pytest.mark.asyncio
+async def test_many_route_handlers() -> None:
+    def make_handler(index: int) -> Any:
+        @get(f"/items{index}")
+        async def handler() -> str:
+            return f"{index} {require_resource(str)}"
+
+        return handler
+
+    # More handlers than are registered at once
+    component = LitestarComponent(
+        route_handlers=[make_handler(index) for index in range(150)], listen=False
+    )
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await component.start(ctx)
+        async with component.create_client() as http:
+            for index in (0, 64, 149):
+                response = await http.get(f"/items{index}")
+                assert response.text == f"{index} foo"
+
+
+@pytest.mark.asyncio
+async def test_route_handlers_sharing_paths() -> None:
+    from litestar import Router, post
+
+    def make_handler(path: str, decorator: Any = get) -> Any:
+        @decorator(path)
+        async def handler(request: Request) -> str:
+            return f"{request.method} {path}"
+
+        return handler
+
+    # The POST handlers share their paths with GET handlers that would otherwise end up
+    # in another batch, and with a route that's already on the application
+    route_handlers = [make_handler(f"/items{index}") for index in range(70)]
+    route_handlers.append(Router(path="/api", route_handlers=[make_handler("/items")]))
+    route_handlers += [make_handler("/items0", post), make_handler("/existing", post)]
+    component = LitestarComponent(
+        route_handlers=route_handlers,
+        listen=False,
+        config={"route_handlers": [make_handler("/existing")]},
+    )
+    async with Context() as ctx:
+        await component.start(ctx)
+        async with component.create_client() as http:
+            for method, path in [
+                ("GET", "/items0"),
+                ("POST", "/items0"),
+                ("GET", "/items69"),
+                ("GET", "/api/items"),
+                ("GET", "/existing"),
+                ("POST", "/existing"),
+            ]:
+                response = await http.request(method, path)
+                assert response.text == f"{method} {path.replace('/api', '')}"
+
+
 def test_bad_middleware_type():
     with pytest.raises(
         TypeError,
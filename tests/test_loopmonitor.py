@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+from asyncio import create_task, sleep
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context
+from httpx import AsyncClient
+
+from asphalt.web._utils import send_response
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.loopmonitor import LoopMonitor
+
+
+def block_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    if scope["path"] == "/block":
+        block_loop(0.3)
+
+    await send_response(send, 200, b"Hello")
+
+
+@pytest.mark.asyncio
+async def test_lag() -> None:
+    monitor = LoopMonitor(interval=0.01, threshold=0.05, buckets=[0.01, 0.1, 1])
+    task = create_task(monitor.run())
+    await sleep(0.1)
+    assert monitor.lag.count > 0
+    assert monitor.slow_callback_count == 0
+
+    block_loop(0.2)
+    await sleep(0.05)
+    task.cancel()
+
+    assert monitor.max_lag >= 0.15
+    assert monitor.slow_callback_count == 1
+    callback = monitor.slow_callbacks[0]
+    assert callback.duration == monitor.max_lag
+    assert callback.path is None
+    assert "in block_loop" in callback.stack
+
+    lines: list[str] = []
+    monitor.render_prometheus(lines)
+    assert "event_loop_slow_callbacks_total 1" in lines
+    assert f"event_loop_lag_seconds_count{{}} {monitor.lag.count}" in lines
+
+
+@pytest.mark.asyncio
+async def test_asgi_component(unused_tcp_port: int, caplog: pytest.LogCaptureFixture) -> None:
+    component = ASGIComponent(
+        app=application,
+        port=unused_tcp_port,
+        metrics={"path": "/metrics"},
+        loop_monitor={"interval": 0.01, "threshold": 0.1},
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        monitor = ctx.require_resource(LoopMonitor)
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/block")
+        assert response.text == "Hello"
+        await sleep(0.05)
+
+        assert monitor.slow_callback_count == 1
+        assert monitor.slow_callbacks[0].path == "/block"
+        assert "The event loop was blocked for" in caplog.text
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/metrics")
+        assert "event_loop_slow_callbacks_total 1" in response.text
+
+
+@pytest.mark.asyncio
+async def test_track_request() -> None:
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    task = create_task(monitor.run())
+    await sleep(0.02)
+    with monitor.track_request("/outer"):
+        with monitor.track_request("/inner"):
+            block_loop(0.2)
+            await sleep(0.05)
+
+        block_loop(0.2)
+        await sleep(0.05)
+
+    block_loop(0.2)
+    await sleep(0.05)
+    task.cancel()
+
+    assert [callback.path for callback in monitor.slow_callbacks] == ["/inner", "/outer", None]
+    assert not monitor._request_paths
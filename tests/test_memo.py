@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from asphalt.core import Context, resource
+from fastapi import Depends, FastAPI
+from starlette.responses import PlainTextResponse, Response
+
+from asphalt.web.fastapi import AsphaltDepends, FastAPIComponent
+from asphalt.web.memo import RequestMemo, RequestMemoFactory, memoize
+
+
+class Loader:
+    def __init__(self) -> None:
+        self.calls: list[int] = []
+
+    async def load(self, item_id: int, *, delay: float = 0) -> str:
+        self.calls.append(item_id)
+        await asyncio.sleep(delay)
+        if item_id < 0:
+            raise ValueError("negative item id")
+
+        return f"item {item_id}"
+
+
+@pytest.mark.asyncio
+async def test_call() -> None:
+    loader = Loader()
+    memo = RequestMemo()
+    assert await memo.call(loader.load, 1) == "item 1"
+    assert await memo.call(loader.load, 1) == "item 1"
+    assert await memo.call(loader.load, 2) == "item 2"
+    assert await memo.call(loader.load, 2, delay=0) == "item 2"
+    assert loader.calls == [1, 2, 2]
+    assert memo.hits == 1
+    assert memo.misses == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls() -> None:
+    loader = Loader()
+    memo = RequestMemo()
+    results = await asyncio.gather(*[memo.call(loader.load, 1, delay=0.05) for _ in range(3)])
+    assert results == ["item 1"] * 3
+    assert loader.calls == [1]
+    assert memo.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller() -> None:
+    loader = Loader()
+    memo = RequestMemo()
+    first = asyncio.create_task(memo.call(loader.load, 1, delay=0.05))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(memo.call(loader.load, 1, delay=0.05))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "item 1"
+    assert loader.calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_failed_call() -> None:
+    loader = Loader()
+    memo = RequestMemo()
+    for _ in range(2):
+        with pytest.raises(ValueError, match="negative item id"):
+            await memo.call(loader.load, -1)
+
+    assert loader.calls == [-1, -1]
+
+
+@pytest.mark.asyncio
+async def test_max_entries() -> None:
+    loader = Loader()
+    memo = RequestMemo(max_entries=1)
+    for item_id in (1, 2, 1, 2):
+        await memo.call(loader.load, item_id)
+
+    assert loader.calls == [1, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_close() -> None:
+    loader = Loader()
+    memo = RequestMemo()
+    task = asyncio.create_task(memo.call(loader.load, 1, delay=1))
+    await asyncio.sleep(0.01)
+    memo.close()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_bad_max_entries() -> None:
+    with pytest.raises(ValueError, match="max_entries must be a positive integer"):
+        RequestMemoFactory(request_types=[], max_entries=0)
+
+
+@pytest.mark.asyncio
+async def test_memoize_without_memo() -> None:
+    loader = Loader()
+    load = memoize(loader.load)
+    async with Context():
+        assert await load(1) == await load(1) == "item 1"
+
+    assert loader.calls == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_memoize_outside_request() -> None:
+    loader = Loader()
+    load = memoize(loader.load)
+    component = FastAPIComponent(app=FastAPI(), listen=False, request_memo={})
+    async with Context() as ctx:
+        await component.start(ctx)
+        assert await load(1) == await load(1) == "item 1"
+        async with Context() as child_ctx:
+            assert await load(1) == "item 1"
+            assert child_ctx.get_resource(RequestMemo) is None
+
+        assert ctx.get_resource(RequestMemo) is None
+
+    assert loader.calls == [1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_fastapi() -> None:
+    loader = Loader()
+    load = memoize(loader.load)
+
+    async def get_name(item_id: int) -> str:
+        return await load(item_id)
+
+    async def get_title(item_id: int, memo: RequestMemo = AsphaltDepends()) -> str:
+        return (await memo.call(loader.load, item_id)).title()
+
+    async def item(
+        name: str = Depends(get_name),
+        title: str = Depends(get_title),
+        memo: RequestMemo = AsphaltDepends(),
+    ) -> Response:
+        return PlainTextResponse(f"{name} {title} {memo.hits}")
+
+    application = FastAPI()
+    application.add_api_route("/items/{item_id}", item)
+    component = FastAPIComponent(app=application, listen=False, request_memo={})
+    async with Context() as ctx:
+        await component.start(ctx)
+        async with component.create_client() as http:
+            for _ in range(2):
+                response = await http.get("/items/1")
+                assert response.text == "item 1 Item 1 1"
+
+    # Loaded once per request
+    assert loader.calls == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_aiohttp() -> None:
+    pytest.importorskip("aiohttp")
+    from aiohttp.web import Application, Request
+
+    from asphalt.web.aiohttp import AIOHTTPComponent
+    from asphalt.web.injection import inject_resources
+
+    loader = Loader()
+
+    @inject_resources
+    async def root(request: Request, memo: RequestMemo = resource()) -> Response:
+        from aiohttp.web import Response
+
+        names = [await memo.call(loader.load, 1) for _ in range(2)]
+        return Response(text=" ".join(names))
+
+    application = Application()
+    application.router.add_route("GET", "/", root)
+    component = AIOHTTPComponent(app=application, listen=False, request_memo={})
+    async with Context() as ctx:
+        await component.start(ctx)
+        async with component.create_client() as client:
+            response = await client.get("/")
+            assert await response.text() == "item 1 item 1"
+
+    assert loader.calls == [1]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from time import time
+
+import pytest
+from asphalt.core import Context
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Mount, Route
+
+from asphalt.web.fastapi import FastAPIComponent
+from asphalt.web.metrics import Histogram, MetricsCollector, parse_request_start
+from asphalt.web.starlette import StarletteComponent
+
+
+def test_histogram() -> None:
+    histogram = Histogram([0.1, 1, 0.5])
+    for value in (0.05, 0.1, 0.3, 0.7, 5):
+        histogram.observe(value)
+
+    assert histogram.bounds == (0.1, 0.5, 1)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(6.15)
+    assert histogram.quantile(0.5) == 0.5
+    assert histogram.quantile(0.99) == 1
+    assert Histogram().quantile(0.5) == 0
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        pytest.param("1700000000.5", 1700000000.5, id="seconds"),
+        pytest.param("t=1700000000500", 1700000000.5, id="millis"),
+        pytest.param("t=1700000000500000", 1700000000.5, id="micros"),
+        pytest.param("1700000000500000000", 1700000000.5, id="nanos"),
+        pytest.param("foo", None, id="invalid"),
+    ],
+)
+def test_parse_request_start(value: str, expected: float | None) -> None:
+    assert parse_request_start(value) == pytest.approx(expected)
+
+
+def test_render_prometheus() -> None:
+    collector = MetricsCollector(buckets=[0.1, 1])
+    collector.record('/items/{"id"}', "GET", 200, 0.05, queue_time=0.2)
+    collector.record('/items/{"id"}', "GET", 200, 2)
+    assert collector.render_prometheus().splitlines() == [
+        "# HELP http_requests_total Total number of HTTP requests handled.",
+        "# TYPE http_requests_total counter",
+        'http_requests_total{route="/items/{\\"id\\"}",method="GET",status="200"} 2',
+        "# HELP http_request_duration_seconds Time spent handling HTTP requests.",
+        "# TYPE http_request_duration_seconds histogram",
+        (
+            'http_request_duration_seconds_bucket{route="/items/{\\"id\\"}",method="GET",'
+            'status="200",le="0.1"} 1'
+        ),
+        (
+            'http_request_duration_seconds_bucket{route="/items/{\\"id\\"}",method="GET",'
+            'status="200",le="1"} 1'
+        ),
+        (
+            'http_request_duration_seconds_bucket{route="/items/{\\"id\\"}",method="GET",'
+            'status="200",le="+Inf"} 2'
+        ),
+        (
+            'http_request_duration_seconds_sum{route="/items/{\\"id\\"}",method="GET",'
+            'status="200"} 2.05'
+        ),
+        (
+            'http_request_duration_seconds_count{route="/items/{\\"id\\"}",method="GET",'
+            'status="200"} 2'
+        ),
+        "# HELP http_request_queue_time_seconds Time HTTP requests spent queued upstream.",
+        "# TYPE http_request_queue_time_seconds histogram",
+        'http_request_queue_time_seconds_bucket{le="0.1"} 0',
+        'http_request_queue_time_seconds_bucket{le="1"} 1',
+        'http_request_queue_time_seconds_bucket{le="+Inf"} 1',
+        "http_request_queue_time_seconds_sum{} 0.2",
+        "http_request_queue_time_seconds_count{} 1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fastapi(unused_tcp_port: int) -> None:
+    async def item(item_id: int) -> Response:
+        return PlainTextResponse(f"Item {item_id}")
+
+    application = FastAPI()
+    application.add_api_route("/items/{item_id}", item)
+    async with Context() as ctx, AsyncClient() as http:
+        await FastAPIComponent(
+            app=application, port=unused_tcp_port, metrics={"path": "/metrics"}
+        ).start(ctx)
+        collector = ctx.require_resource(MetricsCollector)
+
+        for item_id in (1, 2):
+            response = await http.get(
+                f"http://127.0.0.1:{unused_tcp_port}/items/{item_id}",
+                headers={"X-Request-Start": f"t={int((time() - 0.1) * 1000)}"},
+            )
+            response.raise_for_status()
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/nonexistent")
+        assert response.status_code == 404
+
+        assert collector.latencies[("/items/{item_id}", "GET", 200)].count == 2
+        assert collector.latencies[("<unmatched>", "GET", 404)].count == 1
+        assert collector.queue_times.count == 2
+        assert collector.queue_times.sum >= 0.2
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/metrics")
+        response.raise_for_status()
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert (
+            'http_requests_total{route="/items/{item_id}",method="GET",status="200"} 2'
+            in response.text
+        )
+
+
+@pytest.mark.asyncio
+async def test_starlette(unused_tcp_port: int) -> None:
+    async def item(request: Request) -> Response:
+        return PlainTextResponse(f"Item {request.path_params['item_id']}")
+
+    application = Starlette(routes=[Route("/items/{item_id}", item)])
+    async with Context() as ctx, AsyncClient() as http:
+        await StarletteComponent(app=application, port=unused_tcp_port, metrics={}).start(ctx)
+        collector = ctx.require_resource(MetricsCollector)
+
+        response = await http.get(f"http://127.0.0.1:{unused_tcp_port}/items/1")
+        response.raise_for_status()
+        assert collector.latencies[("/items/{item_id}", "GET", 200)].count == 1
+
+
+@pytest.mark.asyncio
+async def test_starlette_shared_endpoint() -> None:
+    async def item(request: Request) -> Response:
+        return PlainTextResponse(f"Item {request.path_params['item_id']}")
+
+    application = Starlette(
+        routes=[
+            Route("/items/{item_id}", item),
+            Route("/products/{item_id}", item),
+            Mount("/v2", routes=[Route("/items/{item_id}", item)]),
+        ]
+    )
+    component = StarletteComponent(app=application, listen=False, metrics={})
+    async with Context() as ctx:
+        await component.start(ctx)
+        collector = ctx.require_resource(MetricsCollector)
+        async with component.create_client() as http:
+            for path in ("/products/1", "/items/1", "/v2/items/1", "/products/2"):
+                response = await http.get(path)
+                response.raise_for_status()
+
+        assert collector.latencies[("/items/{item_id}", "GET", 200)].count == 1
+        assert collector.latencies[("/products/{item_id}", "GET", 200)].count == 2
+        assert collector.latencies[("/v2/items/{item_id}", "GET", 200)].count == 1
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context, require_resource
+from fastapi import FastAPI
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+from asphalt.web._utils import send_response
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.fastapi import AsphaltDepends, FastAPIComponent
+from asphalt.web.mirroring import TrafficMirror
+
+
+async def primary(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    event = await receive()
+    await send_response(send, 200, b"primary " + event["body"])
+
+
+def make_shadow(received: list[Any], delay: float = 0) -> Any:
+    async def shadow(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+        received.append((scope["path"], (await receive())["body"], require_resource(HTTPScope)))
+        await asyncio.sleep(delay)
+        await send_response(send, 404 if scope["path"] == "/changed" else 200, b"shadow")
+
+    return shadow
+
+
+@pytest.mark.parametrize(
+    "options, message",
+    [
+        pytest.param({"sample_rate": -0.1}, "sample_rate must be between 0 and 1", id="rate"),
+        pytest.param(
+            {"max_concurrency": 0}, "max_concurrency must be a positive integer", id="concurrency"
+        ),
+    ],
+)
+def test_bad_options(options: dict[str, Any], message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        TrafficMirror(app=primary, **options)
+
+
+@pytest.mark.asyncio
+async def test_asgi_component() -> None:
+    received: list[Any] = []
+    component = ASGIComponent(
+        app=primary,
+        listen=False,
+        mirroring={"app": make_shadow(received), "sample_rate": 1, "unmatched_route": None},
+    )
+    async with Context() as ctx:
+        await component.start(ctx)
+        mirror = ctx.require_resource(TrafficMirror)
+        async with component.create_client() as http:
+            for path in ("/same", "/changed", "/same"):
+                response = await http.post(path, content=b"hello")
+                assert response.text == "primary hello"
+
+            await mirror.wait_idle()
+
+    assert [(path, body) for path, body, scope in received] == [
+        ("/same", b"hello"),
+        ("/changed", b"hello"),
+        ("/same", b"hello"),
+    ]
+    # The mirrored requests run in request contexts of their own
+    assert all(scope["path"] == path for path, body, scope in received)
+
+    same = mirror.routes[("/same", "POST")]
+    assert same.requests == 2
+    assert same.statuses == {(200, 200): 2}
+    assert same.status_mismatches == 0
+    assert mirror.routes[("/changed", "POST")].statuses == {(200, 404): 1}
+    assert mirror.as_dict()["routes"][1]["status_mismatches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bounds() -> None:
+    received: list[Any] = []
+    component = ASGIComponent(
+        app=primary,
+        listen=False,
+        mirroring={
+            "app": make_shadow(received, delay=0.5),
+            "sample_rate": 1,
+            "max_concurrency": 1,
+            "timeout": 0.1,
+            "max_body_size": 5,
+        },
+    )
+    async with Context() as ctx:
+        await component.start(ctx)
+        mirror = ctx.require_resource(TrafficMirror)
+        async with component.create_client() as http:
+            await http.post("/", content=b"hello")
+            await http.post("/", content=b"hi")
+            await http.post("/", content=b"too large")
+            await mirror.wait_idle()
+
+    assert mirror.dropped_requests == 1
+    assert mirror.skipped_requests == 1
+    comparison = mirror.routes[("<unmatched>", "POST")]
+    assert comparison.errors == 1
+    assert comparison.requests == 0
+
+
+@pytest.mark.asyncio
+async def test_fastapi() -> None:
+    async def item(item_id: int) -> Response:
+        return PlainTextResponse(f"Item {item_id}")
+
+    async def new_item(request: Request, my_resource: str = AsphaltDepends()) -> Response:
+        status = 500 if request.path_params["item_id"] == "2" else 200
+        return PlainTextResponse(f"New item {my_resource}", status)
+
+    application = FastAPI()
+    application.add_api_route("/items/{item_id}", item)
+    shadow = FastAPI()
+    shadow.add_api_route("/items/{item_id}", new_item)
+    component = FastAPIComponent(
+        app=application,
+        listen=False,
+        metrics={"path": "/metrics"},
+        mirroring={"app": shadow, "sample_rate": 1},
+    )
+    async with Context() as ctx:
+        ctx.add_resource("foo")
+        await component.start(ctx)
+        mirror = ctx.require_resource(TrafficMirror)
+        async with component.create_client() as http:
+            for item_id in (1, 2, 3):
+                response = await http.get(f"/items/{item_id}")
+                assert response.text == f"Item {item_id}"
+
+            await mirror.wait_idle()
+            comparison = mirror.routes[("/items/{item_id}", "GET")]
+            assert comparison.statuses == {(200, 200): 2, (200, 500): 1}
+            assert comparison.errors == 0
+
+            response = await http.get("/metrics")
+            assert (
+                'http_mirrored_requests_total{route="/items/{item_id}",method="GET",'
+                'primary_status="200",shadow_status="500"} 1'
+            ) in response.text
+            assert (
+                'http_mirrored_request_duration_seconds_count{route="/items/{item_id}",'
+                'method="GET",app="shadow"} 3'
+            ) in response.text
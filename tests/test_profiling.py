@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from asphalt.core import Context, current_context
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+from asphalt.web.fastapi import FastAPIComponent
+from asphalt.web.profiling import RequestProfiler
+
+
+def test_no_trigger() -> None:
+    with pytest.raises(ValueError, match="either secret or allowed_clients must be specified"):
+        RequestProfiler()
+
+
+def test_tokens(tmp_path: Path) -> None:
+    profiler = RequestProfiler(secret="secret", allowed_clients=["10.0.0.1"], directory=tmp_path)
+    token = profiler.create_token()
+    assert profiler.is_authorized(token, "127.0.0.1")
+    assert profiler.is_authorized("foo", "10.0.0.1")
+    assert not profiler.is_authorized("foo", "127.0.0.1")
+    assert not profiler.is_authorized(token[:-1] + "x", "127.0.0.1")
+    assert not profiler.is_authorized(profiler.create_token(-1), "127.0.0.1")
+
+    other = RequestProfiler(secret="other", directory=tmp_path)
+    assert not other.is_authorized(token, "127.0.0.1")
+
+
+def test_ring(tmp_path: Path) -> None:
+    profiler = RequestProfiler(allowed_clients=["127.0.0.1"], directory=tmp_path, max_profiles=2)
+    profile_ids = []
+    for _ in range(3):
+        with profiler.profile() as profile_id:
+            assert profile_id is not None
+            with profiler.profile() as nested_id:
+                assert nested_id is None
+
+        profile_ids.append(profile_id)
+
+    assert profiler.profile_ids == profile_ids[1:]
+    assert sorted(path.stem for path in tmp_path.iterdir()) == sorted(profile_ids[1:])
+    assert "function calls" in profiler.render(profile_ids[2])
+    assert profiler.render(profile_ids[0]) is None
+
+    # A new profiler picks up the existing profiles
+    profiler = RequestProfiler(allowed_clients=["127.0.0.1"], directory=tmp_path, max_profiles=1)
+    assert profiler.profile_ids == profile_ids[2:]
+
+
+@pytest.mark.asyncio
+async def test_fastapi(unused_tcp_port: int, tmp_path: Path) -> None:
+    async def root(request: Request) -> Response:
+        current_context().require_resource(Request)
+        return PlainTextResponse("Hello")
+
+    application = FastAPI()
+    application.add_api_route("/", root)
+    component = FastAPIComponent(
+        app=application,
+        port=unused_tcp_port,
+        profiling={"secret": "secret", "directory": tmp_path, "path": "/profiles"},
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        profiler = ctx.require_resource(RequestProfiler)
+        url = f"http://127.0.0.1:{unused_tcp_port}"
+
+        response = await http.get(f"{url}/")
+        assert response.text == "Hello"
+        assert "x-profile-id" not in response.headers
+
+        response = await http.get(f"{url}/", headers={"X-Profile": "1.invalid"})
+        assert "x-profile-id" not in response.headers
+
+        headers = {"X-Profile": profiler.create_token()}
+        response = await http.get(f"{url}/", headers=headers)
+        assert response.text == "Hello"
+        profile_id = response.headers["x-profile-id"]
+        assert (tmp_path / f"{profile_id}.prof").is_file()
+
+        response = await http.get(f"{url}/profiles", headers=headers)
+        assert response.json() == [profile_id]
+
+        response = await http.get(f"{url}/profiles/{profile_id}", headers=headers)
+        response.raise_for_status()
+        assert "function calls" in response.text
+
+        response = await http.get(f"{url}/profiles/nonexistent", headers=headers)
+        assert response.status_code == 404
+
+        response = await http.get(f"{url}/profiles")
+        assert response.status_code == 404
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context
+from httpx import AsyncClient
+
+from asphalt.web._utils import send_response
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.cli import main
+from asphalt.web.recording import (
+    RecordedRequest,
+    TrafficRecorder,
+    decode_request,
+    encode_request,
+    load_recording,
+    replay,
+    replay_into,
+)
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    event = await receive()
+    if scope["path"] == "/missing":
+        await send_response(send, 404)
+    else:
+        await send_response(send, 200, b"Hello " + event["body"])
+
+
+def make_request(timestamp: float, body: bytes | None = b"") -> RecordedRequest:
+    return RecordedRequest(timestamp, "GET", "/", "", [], body, 200, 0.001)
+
+
+def test_bad_sample_rate(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="sample_rate must be between 0 and 1"):
+        TrafficRecorder(file=tmp_path / "traffic.jsonl", sample_rate=2)
+
+
+@pytest.mark.parametrize(
+    "body", [pytest.param(b"\x00\xff", id="body"), pytest.param(None, id="none")]
+)
+def test_encode_decode(body: bytes | None) -> None:
+    request = RecordedRequest(
+        1700000000.0, "POST", "/items", "a=1", [("content-type", "text/plain")], body, 201, 0.5
+    )
+    assert decode_request(encode_request(request)) == request
+
+
+@pytest.mark.asyncio
+async def test_replay_timing() -> None:
+    sent: list[str] = []
+
+    async def send(request: RecordedRequest) -> int:
+        sent.append(request.path)
+        return 500
+
+    requests = [make_request(100.0), make_request(100.2, None), make_request(100.4)]
+    result = await replay(send, requests, speed=4)
+    assert result.elapsed >= 0.1
+    assert result.requests == 2
+    assert result.skipped == 1
+    assert result.status_mismatches == 2
+
+
+@pytest.mark.asyncio
+async def test_asgi_component(unused_tcp_port: int, tmp_path: Path) -> None:
+    recording = tmp_path / "traffic.jsonl.gz"
+    component = ASGIComponent(
+        app=application, port=unused_tcp_port, recording={"file": str(recording)}
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        assert ctx.require_resource(TrafficRecorder) is component.recorder
+        for path in ("/hello", "/missing"):
+            await http.post(
+                f"http://127.0.0.1:{unused_tcp_port}{path}",
+                params={"foo": "bar"},
+                content=b"world",
+                headers={"Authorization": "Bearer secret"},
+            )
+
+    # The requests are written when the server shuts down at the latest
+    requests = list(load_recording(recording))
+    assert [request.path for request in requests] == ["/hello", "/missing"]
+    assert [request.status for request in requests] == [200, 404]
+    assert requests[0].method == "POST"
+    assert requests[0].query_string == "foo=bar"
+    assert requests[0].body == b"world"
+    assert requests[0].duration > 0
+    assert "authorization" not in dict(requests[0].headers)
+
+    component = ASGIComponent(app=application, listen=False)
+    async with Context() as ctx:
+        await component.start(ctx)
+        result = await replay_into(component, requests, concurrency=2)
+
+    assert result.requests == 2
+    assert result.errors == result.status_mismatches == 0
+    assert result.as_dict()["original_latency"]["max"] == max(
+        request.duration for request in requests
+    )
+
+
+def test_cli(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("component:\n  type: asgi3\n  app: tests.test_recording:application\n")
+    recording = tmp_path / "traffic.jsonl"
+    recording.write_text("".join(encode_request(make_request(100.0 + i)) + "\n" for i in range(5)))
+    json_path = tmp_path / "results.json"
+    main(["replay", str(config_path), "-r", str(recording), "--json", str(json_path)])
+    assert capsys.readouterr().out.startswith("5 requests in ")
+    results = json.loads(json_path.read_text())
+    assert results["requests"] == 5
+    assert results["status_mismatches"] == 0
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from asyncio import CancelledError, Event, create_task, sleep
+
+import pytest
+from asgiref.typing import ASGIReceiveCallable, ASGISendCallable, HTTPScope
+from asphalt.core import Context
+from httpx import AsyncClient
+
+from asphalt.web.asgi3 import ASGIComponent
+from asphalt.web.scheduling import FairScheduler, SchedulerOverloaded
+
+
+async def application(scope: HTTPScope, receive: ASGIReceiveCallable, send: ASGISendCallable):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain")],
+        }
+    )
+    await send({"type": "http.response.body", "body": b"Hello World", "more_body": False})
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        pytest.param("path", "batch", id="path"),
+        pytest.param("header", "tenant1", id="header"),
+        pytest.param("client", "127.0.0.1", id="client"),
+    ],
+)
+def test_classify(key: str, expected: str) -> None:
+    scheduler = FairScheduler(key=key, prefixes={"/api": "api", "/api/batch": "batch"})
+    assert scheduler.classify("/api/batch/jobs", "tenant1", "127.0.0.1") == expected
+
+
+def test_classify_default() -> None:
+    scheduler = FairScheduler(key="header")
+    assert scheduler.classify("/", None, None) == "default"
+
+
+def test_bad_key() -> None:
+    with pytest.raises(ValueError, match="key must be one of"):
+        FairScheduler(key="foo")
+
+
+@pytest.mark.asyncio
+async def test_weighted_admission_order() -> None:
+    scheduler = FairScheduler(max_concurrency=1, weights={"interactive": 4})
+    admitted: list[str] = []
+    release = Event()
+
+    async def request(request_class: str, hold: bool = False) -> None:
+        async with scheduler.admit(request_class):
+            admitted.append(request_class)
+            if hold:
+                await release.wait()
+
+    tasks = [create_task(request("batch", hold=True))]
+    await sleep(0)
+    tasks += [create_task(request("batch")) for _ in range(4)]
+    tasks += [create_task(request("interactive")) for _ in range(2)]
+    await sleep(0)
+    assert scheduler.stats["batch"].queued == 4
+    assert scheduler.stats["interactive"].queued == 2
+
+    release.set()
+    for task in tasks:
+        await task
+
+    assert admitted == ["batch", "interactive", "interactive"] + ["batch"] * 4
+    assert scheduler.stats["batch"].admitted == 5
+    assert scheduler.stats["interactive"].max_wait > 0
+    assert scheduler.stats["batch"].active == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_full() -> None:
+    scheduler = FairScheduler(max_concurrency=1, max_queue_depth=1)
+    release = Event()
+
+    async def request() -> None:
+        async with scheduler.admit("default"):
+            await release.wait()
+
+    tasks = [create_task(request()), create_task(request())]
+    await sleep(0)
+    with pytest.raises(SchedulerOverloaded):
+        async with scheduler.admit("default"):
+            pass
+
+    assert scheduler.stats["default"].rejected == 1
+    release.set()
+    for task in tasks:
+        await task
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued() -> None:
+    scheduler = FairScheduler(max_concurrency=1)
+    release = Event()
+
+    async def request() -> None:
+        async with scheduler.admit("default"):
+            await release.wait()
+
+    holder = create_task(request())
+    waiter = create_task(request())
+    await sleep(0)
+    waiter.cancel()
+    with pytest.raises(CancelledError):
+        await waiter
+
+    assert scheduler.stats["default"].queued == 0
+    release.set()
+    await holder
+
+    # The cancelled request must not have consumed a slot
+    async with scheduler.admit("default"):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_component(unused_tcp_port: int) -> None:
+    async with Context() as ctx, AsyncClient() as http:
+        component = ASGIComponent(
+            app=application,
+            port=unused_tcp_port,
+            scheduling={"key": "header", "header": "X-Tenant-ID"},
+        )
+        await component.start(ctx)
+        scheduler = ctx.require_resource(FairScheduler)
+        assert scheduler is component.scheduler
+
+        response = await http.get(
+            f"http://127.0.0.1:{unused_tcp_port}", headers={"X-Tenant-ID": "tenant1"}
+        )
+        response.raise_for_status()
+        assert response.text == "Hello World"
+        assert scheduler.stats["tenant1"].admitted == 1
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+from asphalt.core import Context, current_context
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from asphalt.web.starlette import StarletteComponent
+from asphalt.web.tracing import Span, Tracer, add_request_span, current_span, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class Connection:
+    pass
+
+
+def test_no_exporter() -> None:
+    with pytest.raises(ValueError, match="either file or exporter must be specified"):
+        Tracer()
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        pytest.param(f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True), id="sampled"),
+        pytest.param(
+            f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False), id="not_sampled"
+        ),
+        pytest.param("garbage", None, id="invalid"),
+    ],
+)
+def test_parse_traceparent(value: str, expected: tuple[str, str, bool] | None) -> None:
+    assert parse_traceparent(value) == expected
+
+
+def test_sampling() -> None:
+    tracer = Tracer(sample_rate=0, exporter=print)
+    assert tracer.start_trace("http") is None
+    assert tracer.start_trace("http", f"00-{TRACE_ID}-{PARENT_ID}-00") is None
+
+    # The client's sampling decision overrides the sample rate
+    span = tracer.start_trace("http", f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert span is not None
+    assert span.trace_id == TRACE_ID
+    assert span.parent_id == PARENT_ID
+
+
+@pytest.mark.asyncio
+async def test_spans() -> None:
+    batches: list[list[dict[str, Any]]] = []
+    tracer = Tracer(exporter=batches.append, batch_size=2)
+    with tracer.span("orphan") as orphan:
+        assert orphan is None
+
+    root = tracer.start_trace("http")
+    assert root is not None
+    with tracer.activate(root):
+        assert current_span() is root
+        async with Context() as ctx:
+            assert add_request_span(ctx) is root
+            assert ctx.require_resource(Span) is root
+
+        with tracer.span("child", foo="bar") as child:
+            assert current_span() is child
+
+        with pytest.raises(RuntimeError), tracer.span("failing"):
+            raise RuntimeError
+
+    assert current_span() is None
+    async with Context() as ctx:
+        assert add_request_span(ctx) is None
+
+    tracer.export()
+    assert [len(batch) for batch in batches] == [2, 1]
+    child_dict, failing_dict, root_dict = batches[0] + batches[1]
+    assert child_dict["parent_id"] == root.span_id
+    assert child_dict["attributes"] == {"foo": "bar"}
+    assert not child_dict["error"]
+    assert failing_dict["error"]
+    assert root_dict["end_time"] >= child_dict["end_time"]
+
+
+@pytest.mark.asyncio
+async def test_full_buffer() -> None:
+    tracer = Tracer(exporter=print, max_buffer=1)
+    root = tracer.start_trace("http")
+    assert root is not None
+    with tracer.activate(root):
+        with tracer.span("child"):
+            pass
+
+    assert tracer.dropped_spans == 1
+
+
+@pytest.mark.asyncio
+async def test_starlette(unused_tcp_port: int, tmp_path: Path) -> None:
+    def connection_factory(ctx: Context) -> Connection:
+        return Connection()
+
+    request_contexts: list[Context] = []
+
+    async def item(request: Request) -> Response:
+        ctx = current_context()
+        request_contexts.append(ctx)
+        tracer = ctx.require_resource(Tracer)
+        ctx.add_resource_factory(tracer.traced("connection")(connection_factory))
+        ctx.require_resource(Connection)
+        return PlainTextResponse(f"Item {request.path_params['item_id']}")
+
+    span_file = tmp_path / "spans.jsonl"
+    application = Starlette(routes=[Route("/items/{item_id}", item)])
+    component = StarletteComponent(
+        app=application, port=unused_tcp_port, tracing={"file": str(span_file)}
+    )
+    async with Context() as ctx, AsyncClient() as http:
+        await component.start(ctx)
+        response = await http.get(
+            f"http://127.0.0.1:{unused_tcp_port}/items/1",
+            headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+        )
+        assert response.text == "Item 1"
+        # The span must be added to the request context instead of a context of its own
+        assert request_contexts[0].parent is ctx
+        assert request_contexts[0].require_resource(Span).trace_id == TRACE_ID
+
+    spans = {span["name"]: span for span in map(json.loads, span_file.read_text().splitlines())}
+    assert spans.keys() == {"http", "application", "connection"}
+    assert all(span["trace_id"] == TRACE_ID for span in spans.values())
+    assert spans["http"]["parent_id"] == PARENT_ID
+    assert spans["http"]["attributes"] == {
+        "http.method": "GET",
+        "http.target": "/items/1",
+        "http.route": "/items/{item_id}",
+        "http.status_code": 200,
+    }
+    assert spans["application"]["parent_id"] == spans["http"]["span_id"]
+    assert spans["connection"]["parent_id"] == spans["application"]["span_id"]